@@ -5,6 +5,26 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Profil de déploiement ASGI (listes et recherche en vues asynchrones) :
+    pip install "uvicorn[standard]"
+    uvicorn gestion_patients.asgi:application --workers 4 --host 0.0.0.0 --port 8000
+ou, sous gunicorn (gestion des processus, redémarrage des workers) :
+    pip install gunicorn "uvicorn[standard]"
+    gunicorn gestion_patients.asgi:application -k uvicorn.workers.UvicornWorker --workers 4
+ou avec daphne (un seul processus, plusieurs instances derrière le proxy) :
+    pip install daphne
+    daphne -b 0.0.0.0 -p 8000 gestion_patients.asgi:application
+- Un worker ASGI sert en même temps toutes les requêtes en attente de la base ou du cache ;
+  un worker WSGI une seule à la fois (mesure : python manage.py benchmark_asgi --latence-sql 20)
+- Les vues synchrones (formulaires, détails) restent servies, chacune dans un thread
+- Base : BASE_DE_DONNEES=postgresql avec POSTGRES_POOL=1 (settings.py) ; les connexions
+  persistantes (CONN_MAX_AGE) ne sont pas réutilisées entre requêtes en ASGI
+- Fichiers statiques : servis par le proxy (collectstatic), pas par l'application
+- Impressions en arrière-plan : un seul `python manage.py rendu_pdf` par machine, à côté
+  des workers (ils ne font qu'enregistrer les tâches)
+Le chemin WSGI (wsgi.py) reste possible : les vues asynchrones y sont exécutées
+par async_to_sync, sans le gain de concurrence.
 """
 
 import os
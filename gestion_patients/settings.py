@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'website.middleware.MesuresMiddleware',  # en premier : mesure aussi les autres middlewares
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,16 +77,68 @@ WSGI_APPLICATION = 'gestion_patients.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-        'USER':'root',
-        'PASSWORD':'password123',
-        'HOST':'localhost',
-        'PORT':'3306',
+# Choix par variables d'environnement :
+#   BASE_DE_DONNEES=sqlite (défaut) : fichier db.sqlite3, pour le développement
+#   BASE_DE_DONNEES=postgresql : production (plusieurs postes qui écrivent en même temps)
+#       POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_PORT
+#       POSTGRES_POOL=1 (défaut) : pool de connexions psycopg (pip install "psycopg[binary,pool]")
+#           POSTGRES_POOL_MIN / POSTGRES_POOL_MAX : taille du pool par processus
+#       POSTGRES_POOL=0 : connexions persistantes (CONN_MAX_AGE) vérifiées avant réutilisation
+# Tests sur un PostgreSQL local :
+#   BASE_DE_DONNEES=postgresql POSTGRES_USER=... POSTGRES_PASSWORD=... python manage.py test
+
+BASE_DE_DONNEES = os.environ.get('BASE_DE_DONNEES', 'sqlite')
+
+# SQLite avec plusieurs postes (mesure : python manage.py benchmark_ecritures)
+# Journal WAL (lectures et écriture en parallèle ; fichiers db.sqlite3-wal / -shm) : activé une fois
+# par la migration 0023_sqlite_wal (python manage.py migrate), car enregistré dans le fichier de la base.
+# Ici, seulement les pragmas propres à chaque connexion :
+SQLITE_PRAGMAS = [
+    'synchronous=NORMAL',    # pas de fsync à chaque commit en WAL (sûr en cas de crash de l'application)
+    'mmap_size=268435456',   # lecture du fichier par mémoire mappée (256 Mo)
+    'cache_size=-32000',     # cache de pages de 32 Mo par connexion (valeur négative = en Ko)
+]
+
+if BASE_DE_DONNEES == 'postgresql':
+    POSTGRES_POOL = os.environ.get('POSTGRES_POOL', '1') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'patient_app'),
+            'USER': os.environ.get('POSTGRES_USER', 'patient_app'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Le pool gère lui-même la durée de vie des connexions (incompatible avec CONN_MAX_AGE)
+            'CONN_MAX_AGE': 0 if POSTGRES_POOL else int(os.environ.get('POSTGRES_CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': not POSTGRES_POOL,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('POSTGRES_POOL_MIN', '2')),
+                    'max_size': int(os.environ.get('POSTGRES_POOL_MAX', '10')),
+                    'timeout': 10,  # secondes d'attente d'une connexion libre avant erreur
+                },
+            } if POSTGRES_POOL else {},
+        }
     }
-}
+elif BASE_DE_DONNEES == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Exécuté à chaque nouvelle connexion (voir SQLITE_PRAGMAS)
+                'init_command': ';'.join(f'PRAGMA {pragma}' for pragma in SQLITE_PRAGMAS),
+                # Verrou d'écriture pris dès le début de transaction.atomic() : pas d'échec
+                # immédiat "database is locked" quand deux transactions lisent puis écrivent
+                'transaction_mode': 'IMMEDIATE',
+                # Secondes d'attente du verrou d'écriture avant "database is locked"
+                'timeout': 20,
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"BASE_DE_DONNEES inconnue : {BASE_DE_DONNEES!r} (sqlite ou postgresql)")
 
 
 # Password validation
@@ -130,6 +186,63 @@ STATICFILES_DIRS = [                   # dossiers sources
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendu PDF en arrière-plan (website/utils/rendu_pdf.py) : tâches rendues par `manage.py rendu_pdf`
+DOSSIER_RENDUS_PDF = BASE_DIR / 'rendus_pdf'   # fichiers produits, supprimés après RENDU_PDF_CONSERVATION secondes
+RENDU_PDF_PROCESSUS = None                     # taille du pool de la commande (None = nombre de cœurs - 1)
+RENDU_PDF_CONSERVATION = 24 * 3600
+RENDU_PDF_SYNCHRONE = False                    # True = rendu dans la requête, sans commande (tests, débogage)
+
+# Cache des PDF d'ordonnance (website/utils/cache_pdf.py)
+DOSSIER_CACHE_PDF = BASE_DIR / 'cache_pdf'
+CACHE_PDF_TAILLE_MAX = 200 * 1024 * 1024       # octets ; au-delà, éviction des moins récemment servis
+
+# Cache applicatif : listes et totaux (website/utils/cache_versionne.py), total de la pagination
+# Les numéros de version qui invalident le cache doivent être vus par tous les processus
+# (workers du serveur, commandes manage.py comme import_records) :
+#   CACHE=fichier (défaut) : fichiers dans DOSSIER_CACHE, partagés par tous les processus de la machine
+#   CACHE=memoire : mémoire du processus ; cache applicatif désactivé (lecture directe en base),
+#       une modification faite par un autre processus n'y serait jamais vue
+# Données de santé : le cache fichier contient les tableaux rendus (noms, téléphones, diagnostics)
+# en clair dans DOSSIER_CACHE (fichiers 0600, dossiers 0700, propriétaire : l'utilisateur du serveur).
+# Le placer sur un disque chiffré, hors des sauvegardes, et le vider (manage.py shell -c
+# "from django.core.cache import cache; cache.clear()") en cas de changement de serveur.
+CACHE = os.environ.get('CACHE', 'fichier')
+DOSSIER_CACHE = BASE_DIR / 'cache'
+
+if CACHE == 'fichier':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': DOSSIER_CACHE,
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+elif CACHE == 'memoire':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'patient_app',
+            'OPTIONS': {'MAX_ENTRIES': 5000},  # au-delà, un tiers des entrées est évincé
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"CACHE inconnu : {CACHE!r} (memoire ou fichier)")
+
+# Instrumentation des requêtes (website/middleware.py, métriques sur /metrics)
+METRIQUES_SEUIL_LENT = 1.0                     # secondes ; au-delà, la requête est journalisée
+METRIQUES_REQUETES_JOURNALISEES = 5            # requêtes SQL les plus longues dans le journal
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'website.performances': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -88,6 +88,7 @@ class PatientForm(forms.ModelForm):
 from django import forms
 from django.utils import timezone
 from .models import Consultations, Patient
+from .utils.reservation import STATUTS_LIBERANT_CRENEAU, conflit, prochains_creneaux
 
 class ConsultationForm(forms.ModelForm):
     """
@@ -185,23 +186,31 @@ class ConsultationForm(forms.ModelForm):
         cleaned_data = super().clean()
         patient = cleaned_data.get('patient')
         date_consultation = cleaned_data.get('date_consultation')
-        
-        # Validation : un patient ne peut pas avoir 2 consultations à la même heure
-        if patient and date_consultation:
-            existing_consultation = Consultations.objects.filter(
-                patient=patient,
-                date_consultation=date_consultation
-            )
-            
-            # Si on modifie une consultation existante, l'exclure de la vérification
-            if self.instance.pk:
-                existing_consultation = existing_consultation.exclude(pk=self.instance.pk)
-            
-            if existing_consultation.exists():
-                raise forms.ValidationError(
-                    f"Le patient {patient} a déjà une consultation programmée à cette date et heure."
+        type_ = cleaned_data.get('type')
+        statut = cleaned_data.get('statut')
+
+        # Validation : le créneau (date + durée du type) ne chevauche aucune autre consultation,
+        # de ce patient ou d'un autre (utils/reservation.py)
+        # En modification, seulement si le créneau change : les anciennes données restent modifiables
+        creneau_modifie = not self.instance.pk or {'date_consultation', 'type', 'statut'} & set(self.changed_data)
+        if patient and date_consultation and type_ and statut not in STATUTS_LIBERANT_CRENEAU and creneau_modifie:
+            occupee = conflit(date_consultation, type_, exclure=self.instance.pk)
+            if occupee is not None:
+                horaire = (
+                    f"{timezone.localtime(occupee.date_consultation):%d/%m/%Y %H:%M}"
+                    f" – {timezone.localtime(occupee.date_fin):%H:%M}"
                 )
-        
+                if occupee.patient_id == patient.pk:
+                    message = f"Le patient {patient} a déjà une consultation sur ce créneau ({horaire})."
+                else:
+                    message = f"Créneau déjà occupé par une autre consultation ({horaire})."
+                libres = prochains_creneaux(max(date_consultation, timezone.now()), type_)
+                if libres:
+                    message += " Prochains créneaux libres : " + ", ".join(
+                        f"{timezone.localtime(debut):%d/%m %H:%M}" for debut, _ in libres
+                    ) + "."
+                raise forms.ValidationError(message)
+
         return cleaned_data
     
     def save(self, commit=True):
@@ -0,0 +1,154 @@
+"""
+Benchmark reproductible des pages principales et du rendu PDF
+Usage :
+    python manage.py benchmark --patients 10000
+    python manage.py benchmark --patients 100000 --repetitions 50 --sortie avant.json
+    python manage.py benchmark --patients 100000 --sortie apres.json --comparer avant.json
+
+La base de benchmark est une base à part (celle des tests Django, nommée d'après l'échelle :
+fichier benchmark_<patients>.sqlite3 avec SQLite) : la base réelle n'est jamais touchée.
+Elle est conservée entre deux exécutions et n'est peuplée qu'une fois par échelle
+(10k patients : ~1 min ; 1M patients : compter une heure et plusieurs Go).
+
+Scénarios mesurés (p50 / p95 en ms, nombre de requêtes SQL) :
+liste_patients, liste_consultations, liste_ordonnances (avec et sans recherche),
+detail_patient, consultation_form (GET) et rendu PDF d'une ordonnance.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from website.models import Consultations, Ordonnance, Patient
+from website.utils.benchmark import executer_scenarios, peupler
+
+
+def commit_git():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Mesure latences (p50/p95) et nombre de requêtes des pages principales sur une base synthétique."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=10000, help="Taille de la base (10000, 100000, 1000000...)")
+        parser.add_argument('--consultations-par-patient', type=int, default=5, help="Moyenne par patient")
+        parser.add_argument('--taux-ordonnances', type=float, default=0.6, help="Part des consultations avec ordonnance")
+        parser.add_argument('--repetitions', type=int, default=30, help="Mesures par scénario")
+        parser.add_argument('--scenario', help="Ne mesurer que les scénarios dont le nom contient ce texte")
+        parser.add_argument('--sortie', help="Fichier JSON des résultats (défaut : benchmark_<patients>.json)")
+        parser.add_argument('--comparer', help="Fichier JSON d'une exécution précédente à comparer")
+        parser.add_argument('--repeupler', action='store_true', help="Recréer la base de benchmark")
+
+    def handle(self, *args, **options):
+        patients = options['patients']
+        sortie = options['sortie'] or f"benchmark_{patients}.json"
+
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(settings.BASE_DIR, f"benchmark_{patients}.sqlite3")
+        else:
+            connection.settings_dict['TEST']['NAME'] = f"benchmark_{patients}"
+
+        setup_test_environment()
+        self.nom_base = connection.settings_dict['NAME']
+        try:
+            self.preparer_base(options)
+            resultats = executer_scenarios(
+                repetitions=options['repetitions'],
+                filtre=options['scenario'],
+                progression=self.afficher,
+            )
+            volumes = {
+                'patients': Patient.objects.count(),
+                'consultations': Consultations.objects.count(),
+                'ordonnances': Ordonnance.objects.count(),
+            }
+        finally:
+            connection.creation.destroy_test_db(self.nom_base, verbosity=0, keepdb=True)
+            teardown_test_environment()
+
+        rapport = {
+            'meta': {
+                'date': timezone.now().isoformat(),
+                'commit': commit_git(),
+                'base': connection.vendor,
+                'volumes': volumes,
+                'repetitions': options['repetitions'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'resultats': resultats,
+        }
+        with open(sortie, 'w', encoding='utf-8') as fichier:
+            json.dump(rapport, fichier, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {sortie}"))
+
+        if options['comparer']:
+            self.comparer(options['comparer'], resultats)
+
+    def preparer_base(self, options):
+        """Base de benchmark conservée entre les exécutions ; peuplée si vide ou d'une autre taille"""
+        creation = connection.creation
+        creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=not options['repeupler'])
+        if Patient.objects.count() == options['patients']:
+            return
+
+        if Patient.objects.exists():
+            creation.destroy_test_db(self.nom_base, verbosity=0, keepdb=False)
+            creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=False)
+
+        debut = time.monotonic()
+
+        def progression(inseres):
+            duree = time.monotonic() - debut
+            self.stdout.write(f"  {inseres}/{options['patients']} patients ({inseres / duree:.0f}/s)")
+
+        self.stdout.write(f"Création de la base de benchmark ({options['patients']} patients)...")
+        peupler(
+            options['patients'],
+            consultations_par_patient=options['consultations_par_patient'],
+            taux_ordonnances=options['taux_ordonnances'],
+            taille_lot=max(1000, min(10000, options['patients'] // 20)),
+            progression=progression,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')  # statistiques à jour pour le planificateur
+
+    def afficher(self, nom, mesures):
+        self.stdout.write(
+            f"{nom:<32} p50 {mesures['p50_ms']:8.2f} ms   p95 {mesures['p95_ms']:8.2f} ms   "
+            f"{mesures['requetes']:3d} requêtes"
+        )
+
+    def comparer(self, chemin, resultats):
+        try:
+            with open(chemin, encoding='utf-8') as fichier:
+                precedents = json.load(fichier)['resultats']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Impossible de lire {chemin} : {e}")
+
+        self.stdout.write(f"\nComparaison avec {chemin} (p50) :")
+        for nom, mesures in resultats.items():
+            if nom not in precedents:
+                continue
+            avant, apres = precedents[nom]['p50_ms'], mesures['p50_ms']
+            ecart = (apres - avant) / avant * 100 if avant else 0
+            style = self.style.ERROR if ecart > 10 else self.style.SUCCESS if ecart < -10 else str
+            self.stdout.write(style(
+                f"{nom:<32} {avant:8.2f} → {apres:8.2f} ms ({ecart:+.0f} %)   "
+                f"requêtes {precedents[nom]['requetes']} → {mesures['requetes']}"
+            ))
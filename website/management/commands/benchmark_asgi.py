@@ -0,0 +1,223 @@
+"""
+Test de charge de la recherche au fil de la frappe : chemin ASGI (vues asynchrones) contre WSGI
+Usage : python manage.py benchmark_asgi [--patients 10000] [--workers 2] [--clients 32] [--latence-sql 2]
+
+Chaque client tape un nom lettre par lettre : une requête à l'API de suggestion par frappe
+("b", "be", "ben"...), puis la recherche dans la liste des patients et des consultations.
+Il envoie la requête suivante dès la réponse reçue (aucune pause).
+- WSGI : `workers` threads, chacun ne traite qu'une requête à la fois (les autres attendent)
+- ASGI : `workers` boucles asyncio, chacune traite en même temps toutes les requêtes de ses clients
+Les deux chemins appellent les vrais points d'entrée (get_wsgi_application / get_asgi_application),
+middlewares compris, sur la base de benchmark de la commande `benchmark` (la base réelle n'est pas touchée),
+avec la session d'un utilisateur connecté (l'API de suggestion est réservée aux utilisateurs connectés).
+--latence-sql ajoute une attente à chaque requête SQL, dans le thread qui l'exécute :
+une base distante (PostgreSQL sur le réseau) plutôt que le fichier SQLite local.
+"""
+
+import asyncio
+import random
+import statistics
+import sys
+import threading
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from website.utils.benchmark import NOMS, centile
+
+from .benchmark import Command as CommandeBenchmark
+
+
+def parcours_frappe(aleatoire):
+    """URLs (chemin, paramètres) d'un client qui tape un nom de patient"""
+    nom = aleatoire.choice(NOMS).lower()
+    urls = [(reverse('suggestion_patients'), f'q={nom[:i]}') for i in range(1, len(nom) + 1)]
+    urls.append((reverse('liste_patients'), f'search={nom}'))
+    urls.append((reverse('liste_consultations'), f'search={nom}'))
+    return urls
+
+
+def cookie_session():
+    """En-tête Cookie d'une session connectée (utilisateur créé dans la base de benchmark au besoin)"""
+    utilisateur, _ = User.objects.get_or_create(username='benchmark')
+    client = Client()
+    client.force_login(utilisateur)
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def appel_wsgi(application, chemin, requete, cookie):
+    statut = []
+    environ = {
+        'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': chemin, 'QUERY_STRING': requete,
+        'HTTP_COOKIE': cookie, 'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'testserver',
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    reponse = application(environ, lambda etat, entetes: statut.append(int(etat.split()[0])))
+    try:
+        b''.join(reponse)
+    finally:
+        reponse.close()  # request_finished : fermeture de la connexion à la base
+    return statut[0]
+
+
+async def appel_asgi(application, chemin, requete, cookie):
+    statut = []
+    fini = asyncio.Event()
+    corps_envoye = False
+
+    async def receive():
+        nonlocal corps_envoye
+        if not corps_envoye:
+            corps_envoye = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await fini.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statut.append(message['status'])
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            fini.set()
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': chemin, 'raw_path': chemin.encode(), 'query_string': requete.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())], 'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+    }
+    await application(scope, receive, send)
+    return statut[0]
+
+
+class Command(CommandeBenchmark):
+    help = "Compare débit et latences de la recherche au fil de la frappe servie en ASGI et en WSGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=10000, help="Taille de la base de benchmark")
+        parser.add_argument('--consultations-par-patient', type=int, default=5, help="Moyenne par patient")
+        parser.add_argument('--taux-ordonnances', type=float, default=0.6, help="Part des consultations avec ordonnance")
+        parser.add_argument('--repeupler', action='store_true', help="Recréer la base de benchmark")
+        parser.add_argument('--workers', type=int, default=2, help="Workers de chaque chemin (threads WSGI / boucles ASGI)")
+        parser.add_argument('--clients', type=int, default=32, help="Clients qui tapent en même temps")
+        parser.add_argument('--parcours', type=int, default=4, help="Noms tapés par client")
+        parser.add_argument('--latence-sql', type=float, default=0, help="Attente ajoutée à chaque requête SQL (ms)")
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = str(settings.BASE_DIR / f"benchmark_{options['patients']}.sqlite3")
+        else:
+            connection.settings_dict['TEST']['NAME'] = f"benchmark_{options['patients']}"
+
+        setup_test_environment()
+        self.nom_base = connection.settings_dict['NAME']
+        latence = options['latence_sql'] / 1000
+
+        def attendre(execute, sql, params, many, context):
+            time.sleep(latence)
+            return execute(sql, params, many, context)
+
+        def ajouter_latence(sender, connection, **kwargs):
+            connection.execute_wrappers.append(attendre)
+
+        if latence:
+            connection_created.connect(ajouter_latence)
+        try:
+            self.preparer_base(options)
+            self.cookie = cookie_session()
+            connection.close()  # chaque requête ouvre sa propre connexion, comme en production
+            aleatoire = random.Random(42)
+            parcours = [
+                [url for _ in range(options['parcours']) for url in parcours_frappe(aleatoire)]
+                for _ in range(options['clients'])
+            ]
+            # Journal des requêtes lentes désactivé : la file d'attente les rend toutes "lentes"
+            with override_settings(METRIQUES_SEUIL_LENT=float('inf')):
+                resultats = {
+                    'WSGI': self.mesurer_wsgi(parcours, options['workers']),
+                    'ASGI': self.mesurer_asgi(parcours, options['workers']),
+                }
+        finally:
+            connection_created.disconnect(ajouter_latence)
+            connection.creation.destroy_test_db(self.nom_base, verbosity=0, keepdb=True)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"{options['clients']} clients, {options['workers']} workers, "
+            f"latence SQL ajoutée {options['latence_sql']:g} ms"
+        )
+        for nom, mesures in resultats.items():
+            self.afficher_charge(nom, mesures)
+        wsgi, asgi = resultats['WSGI'], resultats['ASGI']
+        self.stdout.write(self.style.SUCCESS(
+            f"ASGI / WSGI : débit x{asgi['requetes_par_s'] / wsgi['requetes_par_s']:.2f}, "
+            f"p95 {wsgi['p95_ms']:.0f} → {asgi['p95_ms']:.0f} ms"
+        ))
+
+    def mesurer_wsgi(self, parcours, workers):
+        application = get_wsgi_application()
+        places = threading.Semaphore(workers)  # une requête à la fois par worker
+        durees, erreurs = [], []
+
+        def client(urls):
+            for chemin, requete in urls:
+                debut = time.perf_counter()
+                with places:
+                    statut = appel_wsgi(application, chemin, requete, self.cookie)
+                durees.append(time.perf_counter() - debut)
+                if statut != 200:
+                    erreurs.append(statut)
+
+        return self.executer([threading.Thread(target=client, args=(urls,)) for urls in parcours], durees, erreurs)
+
+    def mesurer_asgi(self, parcours, workers):
+        application = get_asgi_application()
+        durees, erreurs = [], []
+
+        async def client(urls):
+            for chemin, requete in urls:
+                debut = time.perf_counter()
+                statut = await appel_asgi(application, chemin, requete, self.cookie)
+                durees.append(time.perf_counter() - debut)
+                if statut != 200:
+                    erreurs.append(statut)
+
+        async def boucle(lot):
+            await asyncio.gather(*(client(urls) for urls in lot))
+
+        # Les clients sont répartis entre les boucles (un worker = une boucle asyncio)
+        lots = [parcours[i::workers] for i in range(workers)]
+        return self.executer([threading.Thread(target=asyncio.run, args=(boucle(lot),)) for lot in lots], durees, erreurs)
+
+    def executer(self, threads, durees, erreurs):
+        cache.clear()  # mêmes conditions pour les deux chemins (listes en cache)
+        debut = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duree = time.perf_counter() - debut
+        return {
+            'requetes': len(durees),
+            'requetes_par_s': len(durees) / duree,
+            'p50_ms': statistics.median(durees) * 1000,
+            'p95_ms': centile(durees, 95) * 1000,
+            'p99_ms': centile(durees, 99) * 1000,
+            'erreurs': len(erreurs),
+        }
+
+    def afficher_charge(self, nom, mesures):
+        self.stdout.write(
+            f"{nom}  {mesures['requetes_par_s']:7.0f} requêtes/s   p50 {mesures['p50_ms']:7.1f} ms   "
+            f"p95 {mesures['p95_ms']:7.1f} ms   p99 {mesures['p99_ms']:7.1f} ms   "
+            f"{mesures['requetes']} requêtes, {mesures['erreurs']} erreurs"
+        )
@@ -0,0 +1,145 @@
+"""
+Benchmark des écritures concurrentes sur SQLite
+Usage : python manage.py benchmark_ecritures [--threads 8] [--ecritures 200] [--lecteurs 2]
+
+Plusieurs threads créent des consultations en même temps (numérotation par patient,
+transaction.atomic()) pendant que d'autres lisent l'historique des patients. Compare :
+- "défaut" : journal rollback, transactions DEFERRED, attente du verrou 5 s
+- "configuré" : journal WAL (migration 0023_sqlite_wal) et OPTIONS de settings.DATABASES
+  (synchronous=NORMAL, BEGIN IMMEDIATE...)
+Chaque mode tourne sur une copie d'une base temporaire migrée : la base réelle n'est pas touchée.
+Les échecs "database is locked" ne sont pas retentés, ils sont comptés.
+"""
+
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from website.models import Consultations, Patient
+from website.utils.benchmark import centile
+
+
+class Command(BaseCommand):
+    help = "Compare le débit d'écritures concurrentes SQLite avec et sans la configuration WAL / IMMEDIATE."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Threads qui écrivent")
+        parser.add_argument('--ecritures', type=int, default=200, help="Consultations créées par thread")
+        parser.add_argument('--lecteurs', type=int, default=2, help="Threads qui lisent pendant les écritures")
+        parser.add_argument('--patients', type=int, default=20, help="Patients sur lesquels les écritures se répartissent")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Ce benchmark ne concerne que SQLite.")
+
+        # Les connexions des threads sont créées à partir de ce dictionnaire
+        reglages = connections.settings['default']
+        origine = {'NAME': reglages['NAME'], 'OPTIONS': reglages.get('OPTIONS', {})}
+        # (nom, OPTIONS, mode de journal) : le journal est enregistré dans le fichier, pas dans OPTIONS
+        modes = [("défaut", {}, 'DELETE'), ("configuré", dict(origine['OPTIONS']), 'WAL')]
+
+        resultats = {}
+        with tempfile.TemporaryDirectory() as dossier:
+            try:
+                modele = os.path.join(dossier, 'modele.sqlite3')
+                self.utiliser(reglages, modele, {})
+                call_command('migrate', verbosity=0)
+                patients = [Patient.objects.create(nom=f'Patient{i}').pk for i in range(options['patients'])]
+
+                for i, (nom, options_base, journal) in enumerate(modes):
+                    chemin = os.path.join(dossier, f'mode{i}.sqlite3')
+                    connection.close()
+                    shutil.copy(modele, chemin)
+                    self.utiliser(reglages, chemin, options_base)
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'PRAGMA journal_mode={journal}')
+                    resultats[nom] = self.mesurer(patients, options)
+                    self.afficher(nom, resultats[nom])
+            finally:
+                connection.close()
+                reglages.update(origine)
+
+        avant, apres = resultats["défaut"], resultats["configuré"]
+        if avant['ecritures_par_s']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Débit : x{apres['ecritures_par_s'] / avant['ecritures_par_s']:.1f}, "
+                f"échecs « database is locked » : {avant['verrouillages']} → {apres['verrouillages']}"
+            ))
+
+    def utiliser(self, reglages, chemin, options_base):
+        connection.close()
+        reglages['NAME'] = chemin
+        reglages['OPTIONS'] = options_base
+
+    def mesurer(self, patients, options):
+        depart = threading.Barrier(options['threads'] + options['lecteurs'] + 1)
+        fini = threading.Event()
+        ecritures, lectures, verrouillages = [], [], []
+
+        def ecrire(indice):
+            try:
+                depart.wait()
+                for i in range(options['ecritures']):
+                    debut = time.perf_counter()
+                    try:
+                        Consultations.objects.create(patient_id=patients[(indice + i) % len(patients)], type='controle')
+                    except OperationalError:
+                        verrouillages.append(1)
+                    else:
+                        ecritures.append(time.perf_counter() - debut)
+            finally:
+                connection.close()
+
+        def lire(indice):
+            try:
+                depart.wait()
+                i = 0
+                while not fini.is_set():
+                    debut = time.perf_counter()
+                    try:
+                        list(Consultations.objects.filter(patient_id=patients[(indice + i) % len(patients)])
+                             .order_by('-date_consultation')[:20])
+                    except OperationalError:
+                        verrouillages.append(1)
+                    else:
+                        lectures.append(time.perf_counter() - debut)
+                    i += 1
+            finally:
+                connection.close()
+
+        ecrivains = [threading.Thread(target=ecrire, args=(i,)) for i in range(options['threads'])]
+        lecteurs = [threading.Thread(target=lire, args=(i,)) for i in range(options['lecteurs'])]
+        for thread in ecrivains + lecteurs:
+            thread.start()
+        depart.wait()
+        debut = time.perf_counter()
+        for thread in ecrivains:
+            thread.join()
+        duree = time.perf_counter() - debut
+        fini.set()
+        for thread in lecteurs:
+            thread.join()
+
+        return {
+            'duree_s': duree,
+            'ecritures_par_s': len(ecritures) / duree,
+            'verrouillages': len(verrouillages),
+            'ecriture_p50_ms': statistics.median(ecritures) * 1000 if ecritures else 0,
+            'ecriture_p95_ms': centile(ecritures, 95) * 1000 if ecritures else 0,
+            'lecture_p95_ms': centile(lectures, 95) * 1000 if lectures else 0,
+        }
+
+    def afficher(self, nom, mesures):
+        self.stdout.write(
+            f"{nom:<10} {mesures['ecritures_par_s']:7.0f} écritures/s   "
+            f"écriture p50 {mesures['ecriture_p50_ms']:7.2f} ms  p95 {mesures['ecriture_p95_ms']:7.2f} ms   "
+            f"lecture p95 {mesures['lecture_p95_ms']:7.2f} ms   "
+            f"{mesures['verrouillages']} échecs « database is locked »"
+        )
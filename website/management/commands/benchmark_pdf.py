@@ -0,0 +1,79 @@
+"""
+Micro-benchmark du rendu PDF d'une ordonnance
+Usage : python manage.py benchmark_pdf [--iterations 50] [--pages 1] [--images DOSSIER]
+
+Compare le temps par rendu :
+- "ressources par rendu" : styles et images header / footer reconstruits à chaque ordonnance
+- "ressources partagées" : registre du processus (ressources_partagees), comme en production
+Sans --images, des images header / footer de taille réaliste sont générées dans un dossier temporaire.
+Aucune donnée n'est lue ni écrite en base.
+"""
+
+import os
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+
+from website.models import Ordonnance, Patient
+from website.utils.pdf_generator import OrdonnancePDFGenerator, RessourcesPDF, ressources_partagees
+
+
+def creer_images(dossier):
+    """entete.png (2000x330) et bas.png (2000x220), avec un peu de contenu pour une compression réaliste"""
+    from PIL import Image, ImageDraw
+
+    for nom, hauteur in (('entete.png', 330), ('bas.png', 220)):
+        image = Image.new('RGB', (2000, hauteur), 'white')
+        dessin = ImageDraw.Draw(image)
+        for i in range(0, 2000, 40):
+            dessin.rectangle([i, 20, i + 25, hauteur - 20], fill=(i % 255, 90, 160))
+        dessin.text((40, hauteur // 2), "Cabinet de psychiatrie - Casablanca", fill='black')
+        image.save(os.path.join(dossier, nom))
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps de rendu PDF d'une ordonnance, avec et sans ressources partagées."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help="Nombre de rendus par scénario")
+        parser.add_argument('--pages', type=int, default=1, help="Longueur de l'ordonnance (en pages environ)")
+        parser.add_argument('--images', help="Dossier contenant entete.png et bas.png (défaut : images générées)")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as temporaire:
+            dossier = options['images']
+            if not dossier:
+                creer_images(temporaire)
+                dossier = temporaire
+            entete = os.path.join(dossier, 'entete.png')
+            bas = os.path.join(dossier, 'bas.png')
+
+            # Objets non enregistrés : rien n'est écrit en base
+            patient = Patient(nom='Benani', prenom='Sara')
+            lignes = ["Paroxétine 20 mg", "- 1 comprimé le matin pendant 3 mois", ""] * (14 * options['pages'])
+            ordonnance = Ordonnance(patient=patient, numero=1, description='\n'.join(lignes))
+
+            scenarios = [
+                ("ressources par rendu", lambda: RessourcesPDF(entete, bas)),
+                ("ressources partagées", lambda: ressources_partagees(entete, bas)),
+            ]
+            resultats = {}
+            for nom, ressources in scenarios:
+                ressources_partagees(entete, bas)  # échauffement (import, polices)
+                durees = []
+                for _ in range(options['iterations']):
+                    debut = time.perf_counter()
+                    OrdonnancePDFGenerator(ordonnance, ressources()).create_pdf(BytesIO())
+                    durees.append((time.perf_counter() - debut) * 1000)
+                resultats[nom] = durees
+                self.stdout.write(
+                    f"{nom:<22} moyenne {statistics.mean(durees):7.2f} ms   "
+                    f"p50 {statistics.median(durees):7.2f} ms   "
+                    f"p95 {statistics.quantiles(durees, n=20)[-1]:7.2f} ms"
+                )
+
+        gain = statistics.median(resultats["ressources par rendu"]) / statistics.median(resultats["ressources partagées"])
+        self.stdout.write(self.style.SUCCESS(f"Ressources partagées : x{gain:.1f} plus rapide (médiane)"))
@@ -0,0 +1,309 @@
+"""
+Import en masse de patients, consultations ou ordonnances depuis un fichier CSV ou JSONL
+Usage :
+    python manage.py import_records patients anciens_patients.csv
+    python manage.py import_records consultations historique.jsonl --batch-size 2000
+    python manage.py import_records ordonnances ordonnances.csv --rejets ordonnances_rejetees.jsonl
+
+Le fichier est lu ligne par ligne (jamais chargé en entier), validé par lots,
+et écrit avec bulk_create dans une transaction par lot.
+Les numéros C1, C2, ... / ORD #1, #2, ... sont réservés par patient en une requête par lot.
+Les lignes invalides sont écrites dans un fichier de rejets (JSONL) avec leurs erreurs.
+
+Colonnes attendues :
+    patients      : nom, prenom, date_naissance, sexe, telephone, email, adresse, profession, notes
+    consultations : patient_id, type, date_consultation, diagnostic, statut
+    ordonnances   : patient_id, consultation_id, description
+"""
+
+import csv
+import json
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from website.models import Consultations, Ordonnance, Patient
+from website.utils.cache_versionne import invalider
+from website.utils.statistiques import ajouter_consultations
+
+
+# === LECTURE EN FLUX ===
+
+def lire_csv(chemin):
+    with open(chemin, newline='', encoding='utf-8-sig') as fichier:
+        for numero, ligne in enumerate(csv.DictReader(fichier), start=2):  # ligne 1 = en-têtes
+            yield numero, ligne
+
+
+def lire_jsonl(chemin):
+    with open(chemin, encoding='utf-8') as fichier:
+        for numero, texte in enumerate(fichier, start=1):
+            if not texte.strip():
+                continue
+            try:
+                ligne = json.loads(texte)
+            except ValueError as e:
+                yield numero, {'__erreur__': f"JSON invalide : {e}"}
+                continue
+            yield numero, ligne if isinstance(ligne, dict) else {'__erreur__': "Objet JSON attendu"}
+
+
+def par_lots(lignes, taille):
+    """Découpe un itérateur en listes de `taille` éléments"""
+    lignes = iter(lignes)
+    while True:
+        lot = list(islice(lignes, taille))
+        if not lot:
+            return
+        yield lot
+
+
+def valeur_id(valeur):
+    """'12' / 12 → 12, '' / None → None, sinon ValueError"""
+    if valeur in (None, ''):
+        return None
+    return int(valeur)
+
+
+# === IMPORTEURS (un par type d'enregistrement) ===
+
+class Importeur:
+    """
+    Construit et valide les objets d'un lot, puis les écrit
+    Les sous-classes définissent le modèle, les champs et les contrôles propres au type.
+    """
+    modele = None
+    champs = ()
+    exclus_validation = ()
+
+    def construire(self, ligne):
+        """
+        Ligne brute (dict de textes) → instance non enregistrée
+        Lève ValidationError si un champ est invalide (contrôles sans requête SQL).
+        """
+        if '__erreur__' in ligne:
+            raise ValidationError(ligne['__erreur__'])
+
+        objet = self.modele()
+        for champ in self.champs:
+            valeur = ligne.get(champ)
+            if valeur not in (None, ''):
+                setattr(objet, champ, valeur.strip() if isinstance(valeur, str) else valeur)
+        self.completer(objet, ligne)
+        objet.clean_fields(exclude=self.exclus_validation)
+        return objet
+
+    def completer(self, objet, ligne):
+        """Champs calculés ou relations (à surcharger)"""
+
+    def valider_lot(self, objets):
+        """
+        Contrôles qui demandent la base, faits en une requête pour tout le lot
+        Returns: dict {index: message d'erreur} des objets à rejeter
+        """
+        return {}
+
+    def preparer_lot(self, objets):
+        """Dernières valeurs avant insertion (ex. numéros séquentiels), dans la transaction du lot"""
+
+    def enregistrer(self, objets):
+        with transaction.atomic():
+            self.preparer_lot(objets)
+            self.modele.objects.bulk_create(objets)
+            invalider(self.modele)  # bulk_create : pas de signaux
+
+
+class ImporteurPatients(Importeur):
+    modele = Patient
+    champs = ('nom', 'prenom', 'date_naissance', 'sexe', 'telephone', 'email', 'adresse', 'profession', 'notes')
+
+    def completer(self, objet, ligne):
+        # bulk_create ne passe pas par save() : on calcule les champs de recherche ici
+        objet.mettre_a_jour_recherche()
+
+
+class ImporteurAvecPatient(Importeur):
+    """Enregistrements rattachés à un patient existant (patient_id)"""
+    compteur = None
+    exclus_validation = ('patient', 'consultation')
+
+    def completer(self, objet, ligne):
+        try:
+            objet.patient_id = valeur_id(ligne.get('patient_id'))
+        except (TypeError, ValueError):
+            raise ValidationError({'patient_id': "Identifiant de patient invalide."})
+        if objet.patient_id is None:
+            raise ValidationError({'patient_id': "Ce champ est obligatoire."})
+
+    def valider_lot(self, objets):
+        ids = {objet.patient_id for objet in objets}
+        existants = set(Patient.objects.filter(id__in=ids).values_list('id', flat=True))
+        return {
+            index: f"Patient {objet.patient_id} introuvable."
+            for index, objet in enumerate(objets)
+            if objet.patient_id not in existants
+        }
+
+    def preparer_lot(self, objets):
+        # Une réservation par patient pour tout le lot : numéros consécutifs dans l'ordre du fichier
+        par_patient = defaultdict(list)
+        for objet in objets:
+            par_patient[objet.patient_id].append(objet)
+        for patient_id, liste in par_patient.items():
+            dernier = Patient.reserver_numeros(patient_id, self.compteur, len(liste))
+            for numero, objet in enumerate(liste, start=dernier - len(liste) + 1):
+                objet.numero = numero
+
+
+class ImporteurConsultations(ImporteurAvecPatient):
+    modele = Consultations
+    champs = ('type', 'date_consultation', 'diagnostic', 'statut')
+    compteur = 'dernier_numero_consultation'
+
+    def construire(self, ligne):
+        objet = super().construire(ligne)
+        if timezone.is_naive(objet.date_consultation):
+            objet.date_consultation = timezone.make_aware(objet.date_consultation)
+        # bulk_create ne passe pas par save() : prix et fin du créneau calculés ici
+        objet.prix = Consultations.PRIX_PAR_TYPE.get(objet.type, 0)
+        objet.date_fin = objet.date_consultation + objet.duree
+        return objet
+
+    def enregistrer(self, objets):
+        with transaction.atomic():
+            super().enregistrer(objets)
+            # Ni save() ni signaux : statistiques du tableau de bord mises à jour pour le lot
+            ajouter_consultations(objets)
+
+
+class ImporteurOrdonnances(ImporteurAvecPatient):
+    modele = Ordonnance
+    champs = ('description',)
+    compteur = 'dernier_numero_ordonnance'
+
+    def completer(self, objet, ligne):
+        super().completer(objet, ligne)
+        try:
+            objet.consultation_id = valeur_id(ligne.get('consultation_id'))
+        except (TypeError, ValueError):
+            raise ValidationError({'consultation_id': "Identifiant de consultation invalide."})
+
+    def valider_lot(self, objets):
+        erreurs = super().valider_lot(objets)
+
+        ids = {objet.consultation_id for objet in objets if objet.consultation_id}
+        patients = dict(Consultations.objects.filter(id__in=ids).values_list('id', 'patient_id'))
+        deja_liees = set(
+            Ordonnance.objects.filter(consultation_id__in=ids).values_list('consultation_id', flat=True)
+        )
+
+        vues = set()
+        for index, objet in enumerate(objets):
+            if index in erreurs or not objet.consultation_id:
+                continue
+            if objet.consultation_id not in patients:
+                erreurs[index] = f"Consultation {objet.consultation_id} introuvable."
+            elif patients[objet.consultation_id] != objet.patient_id:
+                erreurs[index] = f"La consultation {objet.consultation_id} n'appartient pas au patient {objet.patient_id}."
+            elif objet.consultation_id in deja_liees or objet.consultation_id in vues:
+                erreurs[index] = f"La consultation {objet.consultation_id} a déjà une ordonnance."
+            vues.add(objet.consultation_id)
+        return erreurs
+
+
+IMPORTEURS = {
+    'patients': ImporteurPatients,
+    'consultations': ImporteurConsultations,
+    'ordonnances': ImporteurOrdonnances,
+}
+
+
+# === COMMANDE ===
+
+class Command(BaseCommand):
+    help = "Importe des patients, consultations ou ordonnances depuis un fichier CSV ou JSONL (par lots)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('type', choices=sorted(IMPORTEURS), help="Type d'enregistrements à importer")
+        parser.add_argument('fichier', help="Fichier .csv ou .jsonl")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Format du fichier (déduit de l'extension par défaut)")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Nombre de lignes par lot / transaction")
+        parser.add_argument('--rejets', help="Fichier JSONL des lignes rejetées (défaut : <fichier>.rejets.jsonl)")
+
+    def handle(self, *args, **options):
+        chemin = options['fichier']
+        format_fichier = options['format'] or ('jsonl' if chemin.endswith(('.jsonl', '.ndjson')) else 'csv')
+        lecteur = lire_jsonl if format_fichier == 'jsonl' else lire_csv
+        chemin_rejets = options['rejets'] or f"{chemin}.rejets.jsonl"
+        importeur = IMPORTEURS[options['type']]()
+
+        self.importees = 0
+        self.rejetees = 0
+        debut = time.monotonic()
+
+        try:
+            lignes = lecteur(chemin)
+            with open(chemin_rejets, 'w', encoding='utf-8') as self.fichier_rejets:
+                for lot in par_lots(lignes, options['batch_size']):
+                    self.traiter_lot(importeur, lot)
+                    duree = time.monotonic() - debut
+                    self.stdout.write(
+                        f"{self.importees} importées, {self.rejetees} rejetées "
+                        f"({(self.importees + self.rejetees) / duree:.0f} lignes/s)"
+                    )
+        except OSError as e:
+            raise CommandError(f"Impossible de lire {chemin} : {e}")
+
+        duree = time.monotonic() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"Terminé en {duree:.1f} s : {self.importees} {options['type']} importé(e)s, "
+            f"{self.rejetees} rejeté(e)s ({self.importees / duree if duree else 0:.0f} lignes/s)."
+        ))
+        if self.rejetees:
+            self.stdout.write(self.style.WARNING(f"Lignes rejetées : {chemin_rejets}"))
+
+    def traiter_lot(self, importeur, lot):
+        # 1. Construction + validation champ par champ (sans requête)
+        objets, origines = [], []
+        for numero, ligne in lot:
+            try:
+                objets.append(importeur.construire(ligne))
+                origines.append((numero, ligne))
+            except ValidationError as e:
+                self.rejeter(numero, ligne, e)
+
+        # 2. Validation en base pour tout le lot (patients / consultations existants)
+        erreurs = importeur.valider_lot(objets)
+        for index, message in erreurs.items():
+            self.rejeter(*origines[index], ValidationError(message))
+        objets = [objet for index, objet in enumerate(objets) if index not in erreurs]
+        origines = [origine for index, origine in enumerate(origines) if index not in erreurs]
+        if not objets:
+            return
+
+        # 3. Écriture du lot ; en cas d'erreur SQL on rejoue ligne par ligne pour isoler les fautives
+        try:
+            importeur.enregistrer(objets)
+            self.importees += len(objets)
+        except DatabaseError:
+            for objet, origine in zip(objets, origines):
+                objet.pk = None
+                try:
+                    importeur.enregistrer([objet])
+                    self.importees += 1
+                except DatabaseError as e:
+                    self.rejeter(*origine, e)
+
+    def rejeter(self, numero, ligne, erreur):
+        if isinstance(erreur, ValidationError):
+            erreurs = erreur.message_dict if hasattr(erreur, 'error_dict') else {'__all__': erreur.messages}
+        else:
+            erreurs = {'__all__': [str(erreur)]}
+        ligne = {cle: valeur for cle, valeur in ligne.items() if cle != '__erreur__'}
+        self.fichier_rejets.write(json.dumps({'ligne': numero, 'donnees': ligne, 'erreurs': erreurs}, ensure_ascii=False) + '\n')
+        self.rejetees += 1
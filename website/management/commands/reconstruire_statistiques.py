@@ -0,0 +1,23 @@
+"""
+Recalcule les agrégats quotidiens du tableau de bord (StatistiqueJour)
+Usage : python manage.py reconstruire_statistiques
+À lancer après une modification directe en base (QuerySet.update(), SQL) qui ne passe
+pas par les signaux de Consultations ; sans effet si les agrégats sont déjà justes.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.utils.statistiques import reconstruire
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques journalières (nombre et chiffre d'affaires par jour, type et statut)."
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+        lignes = reconstruire()
+        self.stdout.write(self.style.SUCCESS(
+            f"{lignes} lignes de statistiques recalculées en {time.monotonic() - debut:.1f} s."
+        ))
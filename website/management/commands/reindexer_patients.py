@@ -0,0 +1,48 @@
+"""
+Recalcule les champs de recherche normalisés des patients
+Usage : python manage.py reindexer_patients [--batch-size 1000]
+À lancer après un import direct en base (qui ne passe pas par Patient.save()).
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from website.models import Patient
+from website.utils.cache_versionne import invalider
+
+
+CHAMPS_RECHERCHE = ['nom_recherche', 'prenom_recherche', 'telephone_recherche', 'email_recherche']
+
+
+class Command(BaseCommand):
+    help = "Recalcule les champs de recherche normalisés (nom, prénom, téléphone, email) de tous les patients."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Nombre de patients mis à jour par lot")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        self.nb_modifies = 0
+        modifies = []
+
+        patients = Patient.objects.only('id', 'nom', 'prenom', 'telephone', 'email', *CHAMPS_RECHERCHE)
+        for patient in patients.iterator(chunk_size=batch_size):
+            total += 1
+            # On n'écrit que les patients dont l'index n'est plus à jour
+            if patient.mettre_a_jour_recherche():
+                modifies.append(patient)
+            if len(modifies) >= batch_size:
+                self.enregistrer(modifies)
+                modifies = []
+
+        if modifies:
+            self.enregistrer(modifies)
+
+        self.stdout.write(self.style.SUCCESS(f"{total} patients parcourus, {self.nb_modifies} mis à jour."))
+
+    def enregistrer(self, patients):
+        with transaction.atomic():
+            Patient.objects.bulk_update(patients, CHAMPS_RECHERCHE)
+            invalider(Patient)  # résultats de recherche en cache
+        self.nb_modifies += len(patients)
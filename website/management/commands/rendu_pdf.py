@@ -0,0 +1,79 @@
+"""
+Worker du rendu PDF en arrière-plan (file d'attente TacheRendu, voir website/utils/rendu_pdf.py)
+Usage : python manage.py rendu_pdf [--processus 3] [--une-fois]
+
+Un seul par machine, à lancer à côté du serveur web (systemd, supervisor) :
+    python manage.py rendu_pdf
+Il réclame les tâches en attente, les rend dans son pool de processus (settings.RENDU_PDF_PROCESSUS)
+et enregistre le résultat. Arrêt (Ctrl+C, SIGTERM) : les tâches en cours retournent dans la file.
+"""
+
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from website.utils.rendu_pdf import (
+    enregistrer_resultat, executeur, fermer_executeur, lancer_rendu, liberer_taches, nombre_processus, reclamer_tache,
+)
+
+
+# Attente entre deux interrogations de la file vide (secondes)
+ATTENTE = 1
+
+
+def arreter(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = "Rend les tâches d'impression PDF en attente (file TacheRendu), dans un pool de processus."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processus', type=int, help="Taille du pool (défaut : settings.RENDU_PDF_PROCESSUS)")
+        parser.add_argument('--une-fois', action='store_true', help="S'arrêter quand la file est vide")
+
+    def handle(self, *args, **options):
+        precedent = signal.signal(signal.SIGTERM, arreter)
+        with override_settings(RENDU_PDF_PROCESSUS=options['processus'] or nombre_processus()):
+            taille = nombre_processus()
+            self.stdout.write(f"Rendu PDF : {taille} processus, en attente de tâches...")
+            en_cours = {}  # future → id de la tâche
+            try:
+                self.boucle(en_cours, taille, options['une_fois'])
+            except KeyboardInterrupt:
+                self.stdout.write("Arrêt : tâches en cours remises dans la file.")
+            finally:
+                liberer_taches(list(en_cours.values()))
+                fermer_executeur()
+                signal.signal(signal.SIGTERM, precedent)
+
+    def boucle(self, en_cours, taille, une_fois):
+        pool = executeur()
+        while True:
+            # Pas plus de tâches réclamées que de processus : les autres restent aux autres commandes
+            while len(en_cours) < taille and (tache := reclamer_tache()) is not None:
+                try:
+                    en_cours[lancer_rendu(pool, tache)] = tache.pk
+                except BrokenProcessPool:
+                    pool = executeur(recreer=True)
+                    en_cours[lancer_rendu(pool, tache)] = tache.pk
+
+            if not en_cours:
+                if une_fois:
+                    return
+                time.sleep(ATTENTE)
+                continue
+
+            termines, _ = wait(en_cours, timeout=ATTENTE, return_when=FIRST_COMPLETED)
+            for future in termines:
+                tache_id = en_cours.pop(future)
+                erreur = future.exception()
+                enregistrer_resultat(tache_id, taille=None if erreur else future.result(), erreur=erreur)
+                self.stdout.write(f"Tâche {tache_id} : {'erreur (' + str(erreur) + ')' if erreur else 'terminée'}")
+                if isinstance(erreur, BrokenProcessPool):
+                    # Un processus du pool est mort (ex. manque de mémoire) : on repart d'un pool neuf
+                    pool = executeur(recreer=True)
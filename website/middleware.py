@@ -0,0 +1,149 @@
+# middleware.py
+"""
+Instrumentation des requêtes : où passe le temps ?
+Pour chaque requête, par nom de vue : durée totale, nombre et durée des requêtes SQL
+(connection.execute_wrapper), temps de rendu des gabarits et taille de la réponse.
+- Les valeurs alimentent les histogrammes de utils/metriques.py, exposés sur /metrics
+- Au-delà de settings.METRIQUES_SEUIL_LENT secondes, la requête est journalisée
+  (logger 'website.performances') avec ses requêtes SQL les plus longues
+Les réponses en flux (exports CSV, fichiers) sont mesurées jusqu'au début de l'envoi :
+le SQL exécuté pendant l'itération du flux n'est pas compté.
+Synchrone et asynchrone : sous ASGI, les vues asynchrones ne sont pas ramenées dans un thread.
+"""
+
+import contextvars
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.template.backends.django import Template
+
+from .utils.metriques import registre
+
+
+logger = logging.getLogger('website.performances')
+
+# Mesure de la requête en cours (par thread / tâche asynchrone)
+_mesure_courante = contextvars.ContextVar('mesure_courante', default=None)
+
+
+class Mesure:
+    def __init__(self):
+        self.requetes = []  # (durée en secondes, sql)
+        self.duree_sql = 0
+        self.duree_gabarits = 0
+        self.profondeur_gabarits = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Wrapper de connection.execute_wrapper : chronomètre chaque requête SQL"""
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duree = time.perf_counter() - debut
+            self.duree_sql += duree
+            self.requetes.append((duree, sql))
+
+
+def brancher(mesure):
+    """Mesure ajoutée à la connexion du thread courant (voir __acall__)"""
+    connection.execute_wrappers.append(mesure)
+
+
+def debrancher(mesure):
+    connection.execute_wrappers.remove(mesure)
+
+
+def instrumenter_gabarits():
+    """
+    Chronomètre Template.render du moteur Django (render(), render_to_string...)
+    Les gabarits inclus passent par le moteur interne : seul le rendu de plus haut niveau est compté.
+    """
+    if getattr(Template.render, 'instrumente', False):
+        return
+    render = Template.render
+
+    def render_mesure(self, context=None, request=None):
+        mesure = _mesure_courante.get()
+        if mesure is None:
+            return render(self, context, request)
+        mesure.profondeur_gabarits += 1
+        debut = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            mesure.profondeur_gabarits -= 1
+            if mesure.profondeur_gabarits == 0:
+                mesure.duree_gabarits += time.perf_counter() - debut
+
+    render_mesure.instrumente = True
+    Template.render = render_mesure
+
+
+class MesuresMiddleware:
+    """À placer en tête de MIDDLEWARE : la durée mesurée couvre alors tous les autres middlewares"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asynchrone = iscoroutinefunction(get_response)
+        if self.asynchrone:
+            markcoroutinefunction(self)
+        instrumenter_gabarits()
+
+    def __call__(self, request):
+        if self.asynchrone:
+            return self.__acall__(request)
+        mesure = Mesure()
+        jeton = _mesure_courante.set(mesure)
+        debut = time.perf_counter()
+        try:
+            with connection.execute_wrapper(mesure):
+                response = self.get_response(request)
+        finally:
+            _mesure_courante.reset(jeton)
+        return self.enregistrer(request, response, mesure, time.perf_counter() - debut)
+
+    async def __acall__(self, request):
+        # Connexions propres à chaque thread : le SQL de la requête s'exécute dans son thread
+        # sync_to_async (le même pour toute la requête), pas dans celui de la boucle asyncio
+        mesure = Mesure()
+        jeton = _mesure_courante.set(mesure)
+        debut = time.perf_counter()
+        await sync_to_async(brancher)(mesure)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(debrancher)(mesure)
+            _mesure_courante.reset(jeton)
+        return self.enregistrer(request, response, mesure, time.perf_counter() - debut)
+
+    def enregistrer(self, request, response, mesure, duree):
+        match = getattr(request, 'resolver_match', None)
+        vue = match.view_name if match else 'non_resolue'
+        taille = None if response.streaming else len(response.content)
+
+        registre.enregistrer(vue, response.status_code, {
+            'patient_app_requete_duree_secondes': duree,
+            'patient_app_requete_sql_duree_secondes': mesure.duree_sql,
+            'patient_app_requete_sql_requetes': len(mesure.requetes),
+            'patient_app_requete_gabarit_duree_secondes': mesure.duree_gabarits,
+            'patient_app_reponse_taille_octets': taille,
+        })
+
+        if duree >= getattr(settings, 'METRIQUES_SEUIL_LENT', 1.0):
+            self.journaliser(request, vue, duree, mesure)
+        return response
+
+    def journaliser(self, request, vue, duree, mesure):
+        plus_longues = sorted(mesure.requetes, key=lambda requete: requete[0], reverse=True)
+        plus_longues = plus_longues[:getattr(settings, 'METRIQUES_REQUETES_JOURNALISEES', 5)]
+        details = ''.join(f"\n  {d * 1000:8.1f} ms  {sql[:500]}" for d, sql in plus_longues)
+        logger.warning(
+            "Requête lente : %s %s (%s) %.0f ms, %d requêtes SQL (%.0f ms), gabarits %.0f ms%s",
+            request.method, request.path, vue, duree * 1000,
+            len(mesure.requetes), mesure.duree_sql * 1000, mesure.duree_gabarits * 1000, details,
+        )
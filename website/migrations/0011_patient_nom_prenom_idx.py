@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0010_consultations_numero_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['nom', 'prenom'], name='patient_nom_prenom_idx'),
+        ),
+    ]
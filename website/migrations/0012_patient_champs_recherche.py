@@ -0,0 +1,52 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:03
+
+from django.db import migrations, models
+
+from website.utils.recherche import normaliser_telephone, normaliser_texte
+
+
+def remplir_champs_recherche(apps, schema_editor):
+    Patient = apps.get_model('website', 'Patient')
+    patients = []
+    for patient in Patient.objects.only('id', 'nom', 'prenom', 'telephone', 'email').iterator(chunk_size=1000):
+        patient.nom_recherche = normaliser_texte(patient.nom)
+        patient.prenom_recherche = normaliser_texte(patient.prenom)
+        patient.telephone_recherche = normaliser_telephone(patient.telephone)
+        patient.email_recherche = normaliser_texte(patient.email)
+        patients.append(patient)
+        if len(patients) >= 1000:
+            Patient.objects.bulk_update(patients, ['nom_recherche', 'prenom_recherche', 'telephone_recherche', 'email_recherche'])
+            patients = []
+    if patients:
+        Patient.objects.bulk_update(patients, ['nom_recherche', 'prenom_recherche', 'telephone_recherche', 'email_recherche'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0011_patient_nom_prenom_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='email_recherche',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='nom_recherche',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='prenom_recherche',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='telephone_recherche',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(remplir_champs_recherche, migrations.RunPython.noop),
+    ]
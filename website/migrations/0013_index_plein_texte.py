@@ -0,0 +1,25 @@
+# Index plein texte sur Consultations.diagnostic et Ordonnance.description
+# (FTS5 + triggers sur SQLite, GIN to_tsvector sur PostgreSQL)
+
+from django.db import migrations
+
+from website.utils.plein_texte import creer_index_plein_texte, supprimer_index_plein_texte
+
+
+def creer(apps, schema_editor):
+    creer_index_plein_texte(schema_editor)
+
+
+def supprimer(apps, schema_editor):
+    supprimer_index_plein_texte(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0012_patient_champs_recherche'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer, supprimer),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0013_index_plein_texte'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultations',
+            index=models.Index(fields=['date_consultation', 'id'], name='consultation_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordonnance',
+            index=models.Index(fields=['date_creation', 'id'], name='ordonnance_creation_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['date_creation', 'id'], name='patient_creation_id_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:07
+
+from django.db import migrations, models
+from django.db.models import Exists, Max, OuterRef, Subquery
+
+
+def initialiser_compteurs(apps, schema_editor):
+    """Compteurs = plus grand numéro déjà attribué pour chaque patient"""
+    Patient = apps.get_model('website', 'Patient')
+    Consultations = apps.get_model('website', 'Consultations')
+    Ordonnance = apps.get_model('website', 'Ordonnance')
+
+    for modele, compteur in ((Consultations, 'dernier_numero_consultation'), (Ordonnance, 'dernier_numero_ordonnance')):
+        maximum = (
+            modele.objects
+            .filter(patient=OuterRef('pk'), numero__isnull=False)
+            .values('patient')
+            .annotate(m=Max('numero'))
+            .values('m')
+        )
+        Patient.objects.filter(Exists(maximum)).update(**{compteur: Subquery(maximum)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0014_index_pagination_curseur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='dernier_numero_consultation',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='dernier_numero_ordonnance',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(initialiser_compteurs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0015_compteurs_numeros_patient'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheRendu',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('termine', 'Terminé'), ('erreur', 'Erreur')], default='en_attente', max_length=20)),
+                ('format', models.CharField(choices=[('pdf', 'PDF'), ('zip', 'ZIP')], default='pdf', max_length=3)),
+                ('nom_fichier', models.CharField(help_text='Nom proposé au téléchargement (sans extension)', max_length=150)),
+                ('nombre_ordonnances', models.PositiveIntegerField(default=0)),
+                ('taille', models.PositiveBigIntegerField(blank=True, help_text='Taille du fichier produit (octets)', null=True)),
+                ('erreur', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='taches_rendu', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tâche de rendu PDF',
+                'verbose_name_plural': 'Tâches de rendu PDF',
+                'ordering': ['-date_creation'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0016_taches_rendu_pdf'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultations',
+            index=models.Index(fields=['patient', 'date_consultation'], name='consultation_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultations',
+            index=models.Index(fields=['statut', 'date_consultation'], name='consultation_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultations',
+            index=models.Index(fields=['type', 'date_consultation'], name='consultation_type_date_idx'),
+        ),
+    ]
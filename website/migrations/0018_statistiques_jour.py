@@ -0,0 +1,51 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:36
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def calculer_statistiques(apps, schema_editor):
+    """Agrégats des consultations déjà présentes (même calcul que utils/statistiques.reconstruire)"""
+    Consultations = apps.get_model('website', 'Consultations')
+    StatistiqueJour = apps.get_model('website', 'StatistiqueJour')
+
+    agregats = (
+        Consultations.objects
+        .annotate(jour=TruncDate('date_consultation'))
+        .values('jour', 'type', 'statut')
+        .annotate(nombre=Count('id'), chiffre_affaires=Sum('prix'))
+        .order_by()
+    )
+    StatistiqueJour.objects.bulk_create(
+        (StatistiqueJour(**agregat) for agregat in agregats.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0017_index_acces_consultations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('type', models.CharField(choices=[('consultation', 'Consultation'), ('controle', 'Contrôle'), ('seance_psycho', 'Séance Psychotérapique')], max_length=50)),
+                ('statut', models.CharField(choices=[('planifie', 'Planifié'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('rapporte', 'Reporté'), ('annule', 'Annulé')], max_length=20)),
+                ('nombre', models.IntegerField(default=0)),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Statistique journalière',
+                'verbose_name_plural': 'Statistiques journalières',
+                'ordering': ['jour', 'type', 'statut'],
+                'constraints': [models.UniqueConstraint(fields=('jour', 'type', 'statut'), name='uniq_statistique_jour_type_statut')],
+            },
+        ),
+        migrations.RunPython(calculer_statistiques, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0018_statistiques_jour'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['date_naissance', 'id'], name='patient_naissance_id_idx'),
+        ),
+    ]
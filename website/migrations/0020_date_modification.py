@@ -0,0 +1,50 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:47
+
+from django.db import migrations, models
+from django.db.models import F
+
+from website.utils.plein_texte import creer_index_plein_texte, supprimer_index_plein_texte
+
+
+def dater_existants(apps, schema_editor):
+    """Lignes existantes : date de création comme dernière modification connue (consultations : date de la migration)"""
+    for modele in ('Patient', 'Ordonnance'):
+        apps.get_model('website', modele).objects.update(date_modification=F('date_creation'))
+
+
+def recreer_index_plein_texte(apps, schema_editor):
+    """
+    SQLite : l'ajout d'une colonne à valeur par défaut non constante reconstruit la table,
+    sans ses triggers FTS5 (idem au retrait de la colonne)
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        supprimer_index_plein_texte(schema_editor)
+        creer_index_plein_texte(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0019_index_date_naissance'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recreer_index_plein_texte),
+        migrations.AddField(
+            model_name='consultations',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='ordonnance',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, help_text='Date et heure de la dernière modification (remplie automatiquement).'),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(dater_existants, migrations.RunPython.noop),
+        migrations.RunPython(recreer_index_plein_texte, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0020_date_modification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultations',
+            index=models.Index(fields=['date_consultation', 'statut'], name='consultation_date_statut_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.3 on 2026-10-18 05:02
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F
+
+# Durées (minutes) au moment de la migration (Consultations.DUREE_PAR_TYPE)
+DUREE_PAR_TYPE = {'consultation': 30, 'controle': 15, 'seance_psycho': 60}
+DUREE_DEFAUT = 30
+
+
+def calculer_fins(apps, schema_editor):
+    """Consultations existantes : fin du créneau = date + durée du type (un UPDATE par type)"""
+    Consultations = apps.get_model('website', 'Consultations')
+
+    def fin(minutes):
+        return ExpressionWrapper(F('date_consultation') + timedelta(minutes=minutes), output_field=models.DateTimeField())
+
+    for type_, minutes in DUREE_PAR_TYPE.items():
+        Consultations.objects.filter(type=type_).update(date_fin=fin(minutes))
+    Consultations.objects.exclude(type__in=DUREE_PAR_TYPE).update(date_fin=fin(DUREE_DEFAUT))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0021_index_agenda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consultations',
+            name='date_fin',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(calculer_fins, migrations.RunPython.noop),
+    ]
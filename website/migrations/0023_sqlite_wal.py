@@ -0,0 +1,32 @@
+# Generated by Django 5.1.3 on 2026-10-18 05:20
+
+from django.db import migrations
+
+
+def activer_wal(apps, schema_editor):
+    """
+    SQLite : journal WAL (lectures et écriture en parallèle), enregistré dans le fichier de la base
+    Une fois pour toutes ici plutôt qu'à chaque connexion (settings.SQLITE_PRAGMAS) :
+    une simple commande manage.py ne réécrit pas l'en-tête de db.sqlite3
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA journal_mode=WAL')
+
+
+def desactiver_wal(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA journal_mode=DELETE')
+
+
+class Migration(migrations.Migration):
+
+    # Le mode de journal ne peut pas changer à l'intérieur d'une transaction
+    atomic = False
+
+    dependencies = [
+        ('website', '0022_date_fin_consultation'),
+    ]
+
+    operations = [
+        migrations.RunPython(activer_wal, desactiver_wal),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-18 05:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0023_sqlite_wal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tacherendu',
+            name='date_debut',
+            field=models.DateTimeField(blank=True, help_text='Réclamée par la commande rendu_pdf', null=True),
+        ),
+        migrations.AddField(
+            model_name='tacherendu',
+            name='ordonnances',
+            field=models.JSONField(default=list, help_text="Identifiants des ordonnances à rendre, dans l'ordre"),
+        ),
+        migrations.AddField(
+            model_name='tacherendu',
+            name='tentatives',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Nombre de fois où la tâche a été réclamée'),
+        ),
+        migrations.AlterField(
+            model_name='tacherendu',
+            name='statut',
+            field=models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('erreur', 'Erreur')], default='en_attente', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='tacherendu',
+            index=models.Index(fields=['statut', 'date_creation'], name='tache_rendu_file_idx'),
+        ),
+    ]
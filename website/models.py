@@ -1,7 +1,15 @@
 # models.py
-from django.db import models
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import F
 from django.utils import timezone
 
+from .utils.age import calculer_age
+from .utils.recherche import normaliser_telephone, normaliser_texte
+
 class Patient(models.Model):
     # === INFORMATIONS DE BASE (comme avant) ===
     nom = models.CharField(max_length=100)  # Nom obligatoire
@@ -28,27 +36,113 @@ class Patient(models.Model):
     
     # === INFORMATIONS SYSTEME ===
     date_creation = models.DateTimeField(auto_now_add=True)
+    date_modification = models.DateTimeField(auto_now=True)  # ETag / Last-Modified des pages (utils/revalidation.py)
     notes = models.TextField(blank=True, null=True, help_text="Notes privées du praticien")
     profession = models.CharField(max_length=100, blank=True, null=True)
 
+    # === COMPTEURS (numérotation séquentielle par patient) ===
+    # Dernier numéro attribué : C1, C2, ... et ORD #1, #2, ... (incrémentés atomiquement)
+    dernier_numero_consultation = models.PositiveIntegerField(default=0, editable=False)
+    dernier_numero_ordonnance = models.PositiveIntegerField(default=0, editable=False)
+
+    # === INDEX DE RECHERCHE (calculés automatiquement dans save()) ===
+    # Versions normalisées (minuscules, sans accents / chiffres seuls) pour la recherche par préfixe
+    nom_recherche = models.CharField(max_length=100, blank=True, default='', editable=False, db_index=True)
+    prenom_recherche = models.CharField(max_length=100, blank=True, default='', editable=False, db_index=True)
+    telephone_recherche = models.CharField(max_length=20, blank=True, default='', editable=False, db_index=True)
+    email_recherche = models.CharField(max_length=254, blank=True, default='', editable=False, db_index=True)
+
     
     # === METHODES ===
     def __str__(self):
         return f"{self.nom} {self.prenom or ''}".strip()
+
+    def mettre_a_jour_recherche(self):
+        """
+        Recalcule les champs de recherche normalisés à partir des champs saisis.
+        Retourne la liste des champs modifiés.
+        """
+        valeurs = {
+            'nom_recherche': normaliser_texte(self.nom),
+            'prenom_recherche': normaliser_texte(self.prenom),
+            'telephone_recherche': normaliser_telephone(self.telephone),
+            'email_recherche': normaliser_texte(self.email),
+        }
+        modifies = [champ for champ, valeur in valeurs.items() if getattr(self, champ) != valeur]
+        for champ in modifies:
+            setattr(self, champ, valeurs[champ])
+        return modifies
+
+    def save(self, *args, **kwargs):
+        """
+        Garde les champs de recherche synchronisés à chaque sauvegarde
+        """
+        modifies = self.mettre_a_jour_recherche()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and modifies:
+            kwargs['update_fields'] = set(update_fields) | set(modifies)
+        super().save(*args, **kwargs)
     
+    @classmethod
+    def reserver_numeros(cls, patient_id, compteur, nombre=1):
+        """
+        Réserve `nombre` numéros dans le compteur `compteur` du patient, en UNE requête :
+        UPDATE ... SET compteur = compteur + nombre ... RETURNING compteur
+        La ligne du patient reste verrouillée jusqu'à la fin de la transaction :
+        deux créations simultanées ne peuvent pas obtenir le même numéro,
+        et si la transaction est annulée le compteur revient en arrière (pas de trou).
+
+        Returns:
+            Le dernier numéro réservé (les numéros réservés vont de dernier - nombre + 1 à dernier)
+        """
+        colonne = cls._meta.get_field(compteur).column
+        with transaction.atomic():
+            if connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert:
+                table = connection.ops.quote_name(cls._meta.db_table)
+                colonne = connection.ops.quote_name(colonne)
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'UPDATE {table} SET {colonne} = {colonne} + %s WHERE id = %s RETURNING {colonne}',
+                        [nombre, patient_id],
+                    )
+                    ligne = cursor.fetchone()
+                if ligne is None:
+                    raise cls.DoesNotExist(f"Patient {patient_id} introuvable")
+                return ligne[0]
+
+            # Moteurs sans UPDATE ... RETURNING : mise à jour puis relecture (ligne verrouillée par l'UPDATE)
+            if not cls.objects.filter(pk=patient_id).update(**{compteur: F(compteur) + nombre}):
+                raise cls.DoesNotExist(f"Patient {patient_id} introuvable")
+            return cls.objects.filter(pk=patient_id).values_list(compteur, flat=True).get()
+
     @property
     def age(self):
-        # Calcul automatique de l'âge
-        if self.date_naissance:
-            today = timezone.now().date()
-            return today.year - self.date_naissance.year - (
-                (today.month, today.day) < (self.date_naissance.month, self.date_naissance.day)
-            )
-        return None
+        """
+        Âge en années, calculé une fois par instance (une instance = une requête)
+        Reprend l'âge annoté par la base s'il est présent (utils/age.annoter_age).
+        Recalculé si date_naissance change.
+        """
+        memo = self.__dict__.get('_age_memo')
+        if memo is None or memo[0] != self.date_naissance:
+            age = self.__dict__.get('age_calcule') if memo is None else None
+            if age is None:
+                age = calculer_age(self.date_naissance)
+            memo = self._age_memo = (self.date_naissance, age)
+        return memo[1]
+
+    class Meta:
+        indexes = [
+            # Autocomplétion / tri alphabétique : recherche par préfixe sur (nom, prenom)
+            models.Index(fields=['nom', 'prenom'], name='patient_nom_prenom_idx'),
+            # Pagination par curseur de la liste (tri par date de création)
+            models.Index(fields=['date_creation', 'id'], name='patient_creation_id_idx'),
+            # Tranches d'âge (plages de dates de naissance) et tri / pagination par âge
+            models.Index(fields=['date_naissance', 'id'], name='patient_naissance_id_idx'),
+        ]
     
 
 #------------------------------CONSULTATION--------------------------------------------------------------------------------
-from django.db import models, transaction, IntegrityError
+from django.db import models, transaction
 
 
 class Consultations(models.Model):
@@ -80,26 +174,25 @@ class Consultations(models.Model):
     diagnostic = models.TextField(blank=True, null=True)
     prix = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     statut = models.CharField(max_length=20, choices=STATUT_CONSULTATION, default='planifie')
+    date_modification = models.DateTimeField(auto_now=True)  # ETag / Last-Modified des pages (utils/revalidation.py)
+    # Fin du créneau (date + durée du type), calculée à l'enregistrement : détection des chevauchements
+    date_fin = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Prix selon le type de consultation
+    PRIX_PAR_TYPE = {
+        'consultation': 400,      # Consultation = 400 DH
+        'controle': 0,           # Contrôle = gratuit
+        'seance_psycho': 700,    # Séance psycho = 700 DH
+    }
+
+    # Durée du créneau (minutes) selon le type de consultation
+    DUREE_PAR_TYPE = {
+        'consultation': 30,
+        'controle': 15,
+        'seance_psycho': 60,
+    }
+    DUREE_DEFAUT = 30
 
-    # === NOUVELLES METHODES (ajoutées sans casser l'existant) ===
-    def save(self, *args, **kwargs):
-        """
-        NOUVEAU : Calcul automatique des prix selon le type
-        Cette méthode s'exécute à chaque sauvegarde
-        """
-        # Dictionnaire des prix selon le type
-        prix_par_type = {
-            'consultation': 400,      # Consultation = 400 DH
-            'controle': 0,           # Contrôle = gratuit
-            'seance_psycho': 700,    # Séance psycho = 700 DH
-        }
-        
-        # Attribuer le prix automatiquement selon le type
-        self.prix = prix_par_type.get(self.type, 0)
-        
-        # Sauvegarder normalement
-        super().save(*args, **kwargs)
-    
     def __str__(self):
         """
         AMELIORE : Affichage plus informatif
@@ -128,40 +221,50 @@ class Consultations(models.Model):
                 name="uniq_numero_consultation_par_patient",
             )
         ]
+        indexes = [
+            # Pagination par curseur de la liste (tri par date de consultation)
+            models.Index(fields=['date_consultation', 'id'], name='consultation_date_id_idx'),
+            # Historique d'un patient, trié par date
+            models.Index(fields=['patient', 'date_consultation'], name='consultation_patient_date_idx'),
+            # Filtres de la liste (statut / type) combinés au tri ou à une plage de dates
+            models.Index(fields=['statut', 'date_consultation'], name='consultation_statut_date_idx'),
+            models.Index(fields=['type', 'date_consultation'], name='consultation_type_date_idx'),
+            # Agenda et filtres de dates : plage [début, fin[ sur la date, statut lu dans l'index
+            models.Index(fields=['date_consultation', 'statut'], name='consultation_date_statut_idx'),
+        ]
 
     @property
     def code(self):
         """Renvoie 'C1', 'C2', ..."""
         return f"C{self.numero}" if self.numero is not None else None
 
+    @property
+    def duree(self):
+        """Durée du créneau (timedelta) selon le type"""
+        return timedelta(minutes=self.DUREE_PAR_TYPE.get(self.type, self.DUREE_DEFAUT))
+
     def save(self, *args, **kwargs):
         """
-        Attribue automatiquement un numero séquentiel PAR patient à la création.
-        Simple + robuste : on tente, et en cas de collision (rare, concurrence), on ré-essaie.
+        - Calcul automatique du prix et de la fin du créneau selon le type
+        - Attribue automatiquement un numero séquentiel PAR patient à la création,
+          via le compteur du patient (voir Patient.reserver_numeros)
         """
-        is_creation = self.pk is None
-        if is_creation and self.numero is None:
-            for _ in range(3):  # petite boucle de retry en cas de course
-                try:
-                    with transaction.atomic():
-                        dernier = (
-                            Consultations.objects
-                            .select_for_update()
-                            .filter(patient=self.patient)
-                            .aggregate(m=Max("numero"))["m"]
-                        ) or 0
-                        self.numero = dernier + 1
-                        return super().save(*args, **kwargs)
-                except IntegrityError:
-                    # quelqu’un a pris le même numero entre-temps → on retente
-                    self.numero = None
-            # dernier essai sans verrou si besoin
+        # Attribuer le prix et la fin du créneau automatiquement selon le type
+        self.prix = self.PRIX_PAR_TYPE.get(self.type, 0)
+        self.date_fin = self.date_consultation + self.duree
+
+        if self.pk is None and self.numero is None:
+            # Même transaction : si l'insertion échoue, le numéro réservé est rendu
+            with transaction.atomic():
+                self.numero = Patient.reserver_numeros(self.patient_id, 'dernier_numero_consultation')
+                super().save(*args, **kwargs)
+            return
+
         super().save(*args, **kwargs)
 
 
 #-----------------------ORDONNANCE--------------------------------------------------------------------------------
 
-from django.db.models import Max 
 # === ORDONNANCE (minimale + compteur + liaison simple à une consultation) =====
 class Ordonnance(models.Model):
     """
@@ -203,6 +306,12 @@ class Ordonnance(models.Model):
         help_text="Date et heure de création (remplie automatiquement)."
     )
 
+    # Date/heure de la dernière modification (revalidation des pages : utils/revalidation.py)
+    date_modification = models.DateTimeField(
+        auto_now=True,
+        help_text="Date et heure de la dernière modification (remplie automatiquement)."
+    )
+
     # Texte libre où le médecin décrit toute la prescription
     description = models.TextField(
         help_text="Contenu libre de l’ordonnance : médicaments, posologies, durées, consignes."
@@ -216,6 +325,10 @@ class Ordonnance(models.Model):
                 name="uniq_numero_ordonnance_par_patient",
             )
         ]
+        indexes = [
+            # Pagination par curseur de la liste (tri par date de création)
+            models.Index(fields=['date_creation', 'id'], name='ordonnance_creation_id_idx'),
+        ]
         ordering = ["-date_creation", "-numero", "-id"]
         verbose_name = "Ordonnance"
         verbose_name_plural = "Ordonnances"
@@ -225,20 +338,18 @@ class Ordonnance(models.Model):
         S’exécute à chaque sauvegarde (création ou modification).
         Logique ici :
           - Si c’est une CRÉATION (pas encore d’id) ET que le numéro n’est pas encore posé,
-            on calcule le prochain numéro pour CE patient en regardant le max existant.
+            on prend le prochain numéro dans le compteur de CE patient.
           - Ensuite on appelle super().save() pour laisser Django écrire en base.
         """
         is_creation = self.pk is None  # True si l’objet n’a pas encore été enregistré en base
 
         if is_creation and self.numero is None:
-            # Récupérer le plus grand 'numero' déjà utilisé pour ce patient
-            dernier_num = (
-                Ordonnance.objects
-                .filter(patient=self.patient)
-                .aggregate(m=Max("numero"))["m"]
-            ) or 0
-            # Attribuer le prochain numéro
-            self.numero = dernier_num + 1
+            # Réserver le prochain numéro dans le compteur du patient (atomique, sans agrégat Max)
+            # et insérer dans la même transaction : pas de doublon ni de trou en cas d'erreur
+            with transaction.atomic():
+                self.numero = Patient.reserver_numeros(self.patient_id, 'dernier_numero_ordonnance')
+                super().save(*args, **kwargs)
+            return
 
         # Appel à la vraie sauvegarde Django (très important)
         super().save(*args, **kwargs)
@@ -249,4 +360,82 @@ class Ordonnance(models.Model):
         Ex : "ORD #3 - DUPONT Amina - 27/08/2025 14:32"
         """
         nom = f"{self.patient.nom} {self.patient.prenom or ''}".strip()
-        return f"ORD #{self.numero} - {nom} - {self.date_creation.strftime('%d/%m/%Y %H:%M')}"
\ No newline at end of file
+        return f"ORD #{self.numero} - {nom} - {self.date_creation.strftime('%d/%m/%Y %H:%M')}"
+
+#-----------------------RENDU PDF EN ARRIÈRE-PLAN--------------------------------------------------------------------------------
+
+class TacheRendu(models.Model):
+    """
+    File d'attente des rendus PDF (voir utils/rendu_pdf.py)
+    Une ligne par demande, réclamée puis rendue par la commande rendu_pdf : le statut est
+    consulté par polling, le fichier produit est écrit dans settings.DOSSIER_RENDUS_PDF puis téléchargé.
+    """
+
+    STATUT_TACHE = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminé'),
+        ('erreur', 'Erreur'),
+    ]
+
+    FORMAT_RENDU = [
+        ('pdf', 'PDF'),
+        ('zip', 'ZIP'),
+    ]
+
+    utilisateur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="taches_rendu")
+    statut = models.CharField(max_length=20, choices=STATUT_TACHE, default='en_attente')
+    format = models.CharField(max_length=3, choices=FORMAT_RENDU, default='pdf')
+    nom_fichier = models.CharField(max_length=150, help_text="Nom proposé au téléchargement (sans extension)")
+    ordonnances = models.JSONField(default=list, help_text="Identifiants des ordonnances à rendre, dans l'ordre")
+    nombre_ordonnances = models.PositiveIntegerField(default=0)
+    taille = models.PositiveBigIntegerField(null=True, blank=True, help_text="Taille du fichier produit (octets)")
+    erreur = models.TextField(blank=True)
+    tentatives = models.PositiveSmallIntegerField(default=0, help_text="Nombre de fois où la tâche a été réclamée")
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True, help_text="Réclamée par la commande rendu_pdf")
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-date_creation']
+        verbose_name = "Tâche de rendu PDF"
+        verbose_name_plural = "Tâches de rendu PDF"
+        indexes = [
+            # Réclamation par la commande rendu_pdf : plus anciennes tâches en attente
+            models.Index(fields=['statut', 'date_creation'], name='tache_rendu_file_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nom_fichier}.{self.format} ({self.get_statut_display()})"
+
+    @property
+    def chemin_fichier(self):
+        return os.path.join(settings.DOSSIER_RENDUS_PDF, f"{self.pk}.{self.format}")
+
+#-----------------------STATISTIQUES--------------------------------------------------------------------------------
+
+class StatistiqueJour(models.Model):
+    """
+    Agrégats quotidiens des consultations (voir utils/statistiques.py)
+    Une ligne par (jour, type, statut) : nombre de consultations et somme des prix.
+    Tenue à jour par les signaux de Consultations ; reconstruction complète :
+    python manage.py reconstruire_statistiques
+    """
+
+    jour = models.DateField()
+    type = models.CharField(max_length=50, choices=Consultations.TYPE_CONSULTATION)
+    statut = models.CharField(max_length=20, choices=Consultations.STATUT_CONSULTATION)
+    nombre = models.IntegerField(default=0)
+    chiffre_affaires = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['jour', 'type', 'statut']
+        verbose_name = "Statistique journalière"
+        verbose_name_plural = "Statistiques journalières"
+        constraints = [
+            # Sert aussi d'index pour les lectures par plage de jours
+            models.UniqueConstraint(fields=['jour', 'type', 'statut'], name='uniq_statistique_jour_type_statut'),
+        ]
+
+    def __str__(self):
+        return f"{self.jour:%d/%m/%Y} - {self.get_type_display()} - {self.get_statut_display()} : {self.nombre}"
@@ -0,0 +1,59 @@
+# signals.py
+"""
+Invalidation des caches et agrégats tenus à jour quand les données changent
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Consultations, Ordonnance, Patient
+from .utils import cache_versionne
+from .utils.cache_pdf import invalider
+from .utils.statistiques import cle_statistique, remplacer_consultation
+
+
+@receiver(post_save, sender=Ordonnance)
+@receiver(post_delete, sender=Ordonnance)
+def invalider_pdf_ordonnance(sender, instance, **kwargs):
+    """PDF en cache de l'ordonnance modifiée / supprimée"""
+    invalider(instance.pk)
+
+
+#-----------------------CACHE DES LISTES (utils/cache_versionne.py)-----------------------
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+@receiver(post_save, sender=Consultations)
+@receiver(post_delete, sender=Consultations)
+@receiver(post_save, sender=Ordonnance)
+@receiver(post_delete, sender=Ordonnance)
+def invalider_cache_modele(sender, **kwargs):
+    """Nouvelle version du modèle : les listes et totaux qui en dépendent sont recalculés"""
+    cache_versionne.invalider(sender)
+
+
+#-----------------------STATISTIQUES (utils/statistiques.py)-----------------------
+
+@receiver(pre_save, sender=Consultations)
+def memoriser_consultation(sender, instance, **kwargs):
+    """Version enregistrée avant la modification, pour la retirer des agrégats"""
+    instance._statistique_avant = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._statistique_avant = (
+            Consultations.objects.filter(pk=instance.pk)
+            .only('date_consultation', 'type', 'statut', 'prix')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Consultations)
+def statistiques_consultation_enregistree(sender, instance, **kwargs):
+    avant = getattr(instance, '_statistique_avant', None)
+    if avant is not None and (cle_statistique(avant), avant.prix) == (cle_statistique(instance), instance.prix):
+        return  # ex. seul le diagnostic a changé
+    remplacer_consultation(avant, instance)
+
+
+@receiver(post_delete, sender=Consultations)
+def statistiques_consultation_supprimee(sender, instance, **kwargs):
+    remplacer_consultation(instance, None)
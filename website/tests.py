@@ -1,3 +1,1592 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import importlib
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, datetime, time as dt_time, timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import views
+from .forms import ConsultationForm
+from .models import Consultations, Ordonnance, Patient, StatistiqueJour, TacheRendu
+from .management.commands.benchmark_pdf import creer_images
+from .utils.age import annoter_age, calculer_age, filtre_tranche_age
+from .utils import cache_pdf
+from .utils.agenda import bornes_jour, filtre_periode
+from .utils.reservation import creneaux_libres, occupations
+from .utils.benchmark import executer_scenarios, peupler
+from .utils.cache_versionne import JETON_CSRF, invalider
+from .utils.metriques import registre
+from .utils.pdf_generator import OrdonnancePDFGenerator, ressources_partagees
+from .utils.recherche import normaliser_telephone, normaliser_texte
+from .utils.statistiques import reconstruire
+
+
+# Cache applicatif dans un dossier temporaire : ni lecture ni effacement du cache du serveur
+_dossier_cache = tempfile.TemporaryDirectory()
+_reglages_cache = override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': _dossier_cache.name,
+}})
+
+
+def setUpModule():
+    _reglages_cache.enable()
+
+
+def tearDownModule():
+    _reglages_cache.disable()
+    _dossier_cache.cleanup()
+
+
+#-----------------------------------Patients ----------------------------------------------------------
+
+class SuggestionPatientsTests(TestCase):
+    """API d'autocomplétion /api/patients/suggest"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Patient.objects.create(nom='Benani', prenom='Sara')
+        Patient.objects.create(nom='Benali', prenom='Youssef')
+        Patient.objects.create(nom='Alaoui', prenom='Benoit')
+        for i in range(30):
+            Patient.objects.create(nom=f'Zaki{i:02d}', prenom='Test')
+        cls.medecin = User.objects.create_user('medecin', password='x')
+
+    def setUp(self):
+        self.client.force_login(self.medecin)
+
+    def suggest(self, **params):
+        return self.client.get(reverse('suggestion_patients'), params).json()
+
+    def test_requete_vide(self):
+        self.assertEqual(self.suggest(q='')['results'], [])
+
+    def test_prefixe_nom_ou_prenom(self):
+        noms = [p['fullName'] for p in self.suggest(q='ben')['results']]
+        self.assertEqual(noms, ['Alaoui Benoit', 'Benali Youssef', 'Benani Sara'])
+
+    def test_nom_et_prenom(self):
+        noms = [p['fullName'] for p in self.suggest(q='benani sa')['results']]
+        self.assertEqual(noms, ['Benani Sara'])
+
+    def test_resultats_bornes_et_pagines(self):
+        page1 = self.suggest(q='zaki', limit=100)
+        self.assertEqual(len(page1['results']), 25)
+        self.assertTrue(page1['has_more'])
+
+        page2 = self.suggest(q='zaki', limit=25, page=2)
+        self.assertEqual(len(page2['results']), 5)
+        self.assertFalse(page2['has_more'])
+
+    def test_reserve_aux_utilisateurs_connectes(self):
+        self.client.logout()
+        response = self.client.get(reverse('suggestion_patients'), {'q': 'ben'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(settings.LOGIN_URL))
+        self.assertNotIn('Benani', response.content.decode())
+
+    def test_formulaires_sans_liste_de_patients(self):
+        response = self.client.get(reverse('ajouter_consultation'))
+        self.assertNotContains(response, 'Zaki00')
+        self.assertNotIn('patients', response.context)
+
+
+class RecherchePatientsTests(TestCase):
+    """Recherche normalisée dans liste_patients"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sara = Patient.objects.create(nom='Bénani', prenom='Sara', telephone='06 12 34 56 78', email='Sara.B@exemple.com')
+        cls.karim = Patient.objects.create(nom='El Amrani', prenom='Karim', telephone='0700112233')
+
+    def setUp(self):
+        cache.clear()  # pages de résultats lues dans le contexte : pas de tableau en cache
+
+    def rechercher(self, texte):
+        response = self.client.get(reverse('liste_patients'), {'search': texte})
+        return {p.id for p in response.context['patients']}
+
+    def test_normalisation(self):
+        self.assertEqual(normaliser_texte('  Bénani   SARA '), 'benani sara')
+        self.assertEqual(normaliser_telephone('06 12-34.56 78'), '0612345678')
+        self.assertEqual(self.sara.nom_recherche, 'benani')
+        self.assertEqual(self.sara.telephone_recherche, '0612345678')
+
+    def test_sans_accents_ni_casse(self):
+        self.assertEqual(self.rechercher('benani'), {self.sara.id})
+        self.assertEqual(self.rechercher('SARA'), {self.sara.id})
+
+    def test_telephone(self):
+        self.assertEqual(self.rechercher('0612'), {self.sara.id})
+        self.assertEqual(self.rechercher('06 12 34'), {self.sara.id})
+        self.assertEqual(self.rechercher('07'), {self.karim.id})
+
+    def test_email_et_nom_compose(self):
+        self.assertEqual(self.rechercher('sara.b@'), {self.sara.id})
+        self.assertEqual(self.rechercher('el amrani'), {self.karim.id})
+
+    def test_synchronise_a_la_sauvegarde(self):
+        self.sara.nom = 'Idrissi'
+        self.sara.save(update_fields=['nom'])
+        self.assertEqual(self.rechercher('idrissi'), {self.sara.id})
+        self.assertEqual(self.rechercher('benani'), set())
+
+    def test_commande_reindexer(self):
+        Patient.objects.filter(id=self.karim.id).update(nom='Ziani', nom_recherche='')
+        call_command('reindexer_patients', stdout=StringIO())
+        self.assertEqual(self.rechercher('ziani'), {self.karim.id})
+
+
+#------------------------Consultations / Ordonnances -------------------------------------------------
+
+class AgePatientsTests(TestCase):
+    """Âge mémorisé par instance, calculé par la base, tranches d'âge et tri par âge"""
+
+    AUJOURD_HUI = date(2026, 3, 15)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_user('medecin', password='x')
+        # (nom, date de naissance) autour des limites de tranches au 15/03/2026
+        naissances = {
+            'Mineur': date(2008, 3, 16),        # 18 ans demain
+            'Majeur': date(2008, 3, 15),        # 18 ans aujourd'hui
+            'Actif': date(1961, 3, 16),         # 64 ans, 65 demain
+            'Senior': date(1961, 3, 15),        # 65 ans aujourd'hui
+            'Bissextile': date(2008, 2, 29),
+            'Inconnu': None,
+        }
+        cls.patients = {nom: Patient.objects.create(nom=nom, date_naissance=naissance) for nom, naissance in naissances.items()}
+
+    def test_age_calcule_une_fois(self):
+        patient = Patient.objects.get(nom='Majeur')
+        with mock.patch('website.models.calculer_age', wraps=calculer_age) as calcul:
+            ages = {patient.age, patient.age, patient.age}
+            self.assertEqual(calcul.call_count, 1)
+            patient.date_naissance = date(2000, 1, 1)
+            patient.age
+            self.assertEqual(calcul.call_count, 2)
+        self.assertEqual(len(ages), 1)
+
+    def test_age_annote_identique(self):
+        for jour in (self.AUJOURD_HUI, date(2026, 2, 28), date(2028, 2, 29), date(2026, 12, 31)):
+            for patient in annoter_age(Patient.objects.all(), jour):
+                self.assertEqual(patient.age_calcule, calculer_age(patient.date_naissance, jour), (patient.nom, jour))
+
+    def test_tranches_age(self):
+        def noms(tranche):
+            return set(Patient.objects.filter(filtre_tranche_age(tranche, self.AUJOURD_HUI)).values_list('nom', flat=True))
+
+        self.assertEqual(noms('moins_18'), {'Mineur'})
+        self.assertEqual(noms('18_64'), {'Majeur', 'Actif', 'Bissextile'})
+        self.assertEqual(noms('65_plus'), {'Senior'})
+        self.assertIsNone(filtre_tranche_age('inconnue'))
+        # 29/02/2008 : 18 ans le 01/03/2026, pas le 28/02
+        self.assertNotIn('Bissextile', set(Patient.objects.filter(
+            filtre_tranche_age('18_64', date(2026, 2, 28))).values_list('nom', flat=True)))
+
+    def test_liste_filtre_et_tri(self):
+        cache.clear()
+        self.client.force_login(self.utilisateur)
+        response = self.client.get(reverse('liste_patients'), {'tri': '-age'})
+        noms = [p.nom for p in response.context['patients']]
+        self.assertEqual(noms[:2], ['Senior', 'Actif'])
+        self.assertNotIn('Inconnu', noms)
+
+        response = self.client.get(reverse('liste_patients'), {'age_filter': '65_plus', 'tri': 'age'})
+        self.assertTrue(all(p.age >= 65 for p in response.context['patients']))
+
+    @skipUnless(connection.vendor == 'sqlite', "plans d'exécution propres à SQLite")
+    def test_index_date_naissance(self):
+        plan = Patient.objects.filter(filtre_tranche_age('18_64')).order_by('date_naissance', 'id').explain()
+        self.assertIn('patient_naissance_id_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+class RecherchePleinTexteTests(TestCase):
+    """Recherche plein texte sur diagnostic et description"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = Patient.objects.create(nom='Tazi', prenom='Omar')
+        cls.autre = Patient.objects.create(nom='Hypernoff', prenom='Anna')
+        cls.hta = Consultations.objects.create(patient=cls.patient, type='consultation', diagnostic='Hypertension artérielle sévère')
+        cls.migraine = Consultations.objects.create(patient=cls.patient, type='controle', diagnostic='Migraine, hypertension légère')
+        cls.vide = Consultations.objects.create(patient=cls.autre, type='controle', diagnostic='RAS')
+        cls.ordonnance = Ordonnance.objects.create(patient=cls.patient, description='Amlodipine 5mg - 1 comprimé le matin')
+
+    def setUp(self):
+        cache.clear()  # pages de résultats lues dans le contexte : pas de tableau en cache
+
+    def consultations(self, texte):
+        response = self.client.get(reverse('liste_consultations'), {'search': texte})
+        return [c.id for c in response.context['consultations']]
+
+    def ordonnances(self, texte):
+        response = self.client.get(reverse('liste_ordonnances'), {'search': texte})
+        return [o.id for o in response.context['ordonnances']]
+
+    def test_plusieurs_mots_sans_accents(self):
+        self.assertEqual(self.consultations('arterielle hyper'), [self.hta.id])
+
+    def test_classement_et_patient(self):
+        # "hyper" : les deux diagnostics + le patient "Hypernoff" (sans diagnostic correspondant, en dernier)
+        resultats = self.consultations('hyper')
+        self.assertEqual(set(resultats[:2]), {self.hta.id, self.migraine.id})
+        self.assertEqual(resultats[2], self.vide.id)
+
+    def test_index_synchronise(self):
+        self.hta.diagnostic = 'Diabète de type 2'
+        self.hta.save()
+        self.assertEqual(self.consultations('diabete'), [self.hta.id])
+        self.assertEqual(self.consultations('arterielle'), [])
+
+        self.hta.delete()
+        self.assertEqual(self.consultations('diabete'), [])
+
+    def test_ordonnances(self):
+        self.assertEqual(self.ordonnances('amlodipine matin'), [self.ordonnance.id])
+        self.assertEqual(self.ordonnances(str(self.ordonnance.numero)), [self.ordonnance.id])
+        self.assertEqual(self.ordonnances('tazi'), [self.ordonnance.id])
+
+
+#------------------------Nombre de requêtes (N+1) -------------------------------------------------
+
+class NombreRequetesMixin:
+    """
+    Vérifie qu'une page fait un nombre de requêtes SQL borné,
+    identique quelle que soit la quantité de lignes affichées (pas de N+1).
+    """
+
+    def compter_requetes(self, url, params=None):
+        cache.clear()  # mesurer sans le total estimé en cache (pire cas)
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(requetes)
+
+    def assertRequetesBornees(self, url, maximum, creer_lignes, params=None):
+        """
+        Mesure la page avec 1 ligne puis avec plusieurs pages de lignes :
+        le nombre de requêtes doit être le même et ne pas dépasser `maximum`.
+        """
+        creer_lignes(1)
+        peu = self.compter_requetes(url, params)
+        creer_lignes(40)
+        beaucoup = self.compter_requetes(url, params)
+
+        self.assertEqual(peu, beaucoup, f"{url} : le nombre de requêtes dépend du nombre de lignes (N+1)")
+        self.assertLessEqual(beaucoup, maximum, f"{url} : {beaucoup} requêtes (maximum {maximum})")
+
+
+class NombreRequetesListesTests(NombreRequetesMixin, TestCase):
+    """Listes : COUNT + page, jamais une requête par ligne"""
+
+    def creer_patients(self, nombre):
+        for i in range(nombre):
+            Patient.objects.create(nom=f'Patient{i}', prenom='Test')
+
+    def creer_consultations(self, nombre):
+        patient = Patient.objects.create(nom='Idrissi', prenom='Nadia')
+        for _ in range(nombre):
+            Consultations.objects.create(patient=patient, type='consultation', diagnostic='Hypertension')
+
+    def creer_ordonnances(self, nombre):
+        for i in range(nombre):
+            patient = Patient.objects.create(nom=f'Patient{i}')
+            consultation = Consultations.objects.create(patient=patient, type='controle')
+            Ordonnance.objects.create(patient=patient, consultation=consultation, description='Paracétamol 1g')
+
+    def test_liste_patients(self):
+        self.assertRequetesBornees(reverse('liste_patients'), 2, self.creer_patients)
+
+    def test_liste_patients_recherche(self):
+        self.assertRequetesBornees(reverse('liste_patients'), 2, self.creer_patients, {'search': 'patient'})
+
+    def test_liste_consultations(self):
+        self.assertRequetesBornees(reverse('liste_consultations'), 2, self.creer_consultations)
+
+    def test_liste_consultations_recherche(self):
+        self.assertRequetesBornees(reverse('liste_consultations'), 2, self.creer_consultations, {'search': 'hyper'})
+
+    def test_liste_ordonnances(self):
+        self.assertRequetesBornees(reverse('liste_ordonnances'), 2, self.creer_ordonnances)
+
+    def test_liste_ordonnances_recherche(self):
+        self.assertRequetesBornees(reverse('liste_ordonnances'), 2, self.creer_ordonnances, {'search': 'paracetamol'})
+
+
+
+class HistoriquePatientTests(NombreRequetesMixin, TestCase):
+    """Fiche patient : en-tête agrégé, historique paginé, ordonnances sans requête par ligne"""
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_user('medecin', password='x')
+        self.client.force_login(self.utilisateur)
+        self.patient = Patient.objects.create(nom='Tazi', prenom='Omar')
+
+    def creer_consultations(self, nombre):
+        debut = timezone.now() - timedelta(days=400)
+        for i in range(nombre):
+            consultation = Consultations.objects.create(
+                patient=self.patient, type='seance_psycho', date_consultation=debut + timedelta(days=i)
+            )
+            if i % 2:
+                Ordonnance.objects.create(patient=self.patient, consultation=consultation, description='Repos')
+
+    def test_nombre_requetes_borne(self):
+        url = reverse('detail_patient', args=[self.patient.id])
+        # + 1 : état de la page pour l'ETag (utils/revalidation.py)
+        self.assertRequetesBornees(url, 6, self.creer_consultations)
+
+    def test_entete_et_premiere_page(self):
+        self.creer_consultations(30)
+        Consultations.objects.create(patient=self.patient, type='consultation', statut='annule')
+        Consultations.objects.create(
+            patient=self.patient, type='consultation', date_consultation=timezone.now() + timedelta(days=7)
+        )
+        response = self.client.get(reverse('detail_patient', args=[self.patient.id]))
+
+        statistiques = response.context['statistiques']
+        self.assertEqual(statistiques['nombre'], 32)
+        self.assertEqual(statistiques['total_facture'], 30 * 700 + 400)  # annulée non facturée
+        self.assertLessEqual(statistiques['derniere_visite'], timezone.now())  # RDV futur ignoré
+        self.assertEqual(len(response.context['consultations']), 20)
+        self.assertIsNotNone(response.context['suivant'])
+
+    def test_pages_suivantes(self):
+        self.creer_consultations(45)
+        response = self.client.get(reverse('detail_patient', args=[self.patient.id]))
+        vues = [c.id for c in response.context['consultations']]
+        url = response.context['suivant']
+        while url:
+            with CaptureQueriesContext(connection) as requetes:
+                response = self.client.get(url)
+            self.assertLessEqual(len(requetes), 4)
+            vues += [c.id for c in response.context['consultations']]
+            url = response.get('X-Suivant')
+
+        attendues = list(self.patient.consultations.order_by('-date_consultation', '-id').values_list('id', flat=True))
+        self.assertEqual(vues, attendues)
+
+    def test_format_json(self):
+        self.creer_consultations(3)
+        donnees = self.client.get(
+            reverse('historique_consultations', args=[self.patient.id]), {'format': 'json'}
+        ).json()
+        self.assertIsNone(donnees['suivant'])
+        self.assertEqual([c['code'] for c in donnees['consultations']], ['C3', 'C2', 'C1'])
+        self.assertEqual(donnees['consultations'][1]['ordonnance']['numero'], 1)
+        self.assertIsNone(donnees['consultations'][0]['ordonnance'])
+
+#------------------------Pagination par curseur -------------------------------------------------
+
+def jeton_brut(contenu):
+    """Jeton de curseur encodé comme ceux de l'application, avec un contenu arbitraire"""
+    return base64.urlsafe_b64encode(json.dumps(contenu).encode()).decode().rstrip('=')
+
+
+class PaginationCurseurTests(TestCase):
+    """Pagination keyset des listes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        patient = Patient.objects.create(nom='Berrada', prenom='Leila')
+        debut = timezone.now() - timedelta(days=30)
+        # Dates en double pour vérifier le départage par id
+        for i in range(25):
+            Consultations.objects.create(patient=patient, type='controle', date_consultation=debut + timedelta(hours=i // 2))
+        cls.attendu = list(Consultations.objects.order_by('date_consultation', 'id').values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def page(self, **params):
+        response = self.client.get(reverse('liste_consultations'), params)
+        return response.context['consultations']
+
+    def test_parcours_avant_puis_arriere(self):
+        pages = [self.page()]
+        while pages[-1].has_next():
+            pages.append(self.page(curseur=pages[-1].curseur_suivant))
+
+        self.assertEqual([c.id for p in pages for c in p], self.attendu)
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[0].has_previous())
+
+        retour = self.page(curseur=pages[-1].curseur_precedent)
+        self.assertEqual([c.id for c in retour], [c.id for c in pages[1]])
+        self.assertTrue(retour.has_next())
+
+    def test_filtres_conserves_et_total_exact(self):
+        page = self.page(statut_filter='planifie')
+        self.assertEqual(page.parametres, 'statut_filter=planifie')
+        response = self.client.get(reverse('liste_consultations'))
+        self.assertEqual(response.context['total_consultations'], 25)
+        self.assertEqual(response.context['total_precision'], 'exact')
+        self.assertContains(response, '<h4 class="mb-0">25</h4>', html=True)
+
+    def test_total_plafonne(self):
+        with mock.patch('website.utils.pagination.LIMITE_COMPTAGE', 20), \
+                CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('liste_consultations'))
+        self.assertEqual(response.context['total_consultations'], 20)
+        self.assertEqual(response.context['total_precision'], 'plafonne')
+        self.assertContains(response, '<h4 class="mb-0">20+</h4>', html=True)
+        comptage = [q['sql'] for q in requetes if 'COUNT(' in q['sql']]
+        self.assertEqual(len(comptage), 1)
+        self.assertIn('LIMIT 21', comptage[0])
+
+    def test_jeton_invalide_premiere_page(self):
+        self.assertEqual([c.id for c in self.page(curseur='n1mporte-quoi')], self.attendu[:10])
+
+        # Jetons bien formés, valeur inutilisable : première page, jamais d'erreur 500
+        jetons = [
+            jeton_brut(['suivant', 'garbage', 1]),
+            jeton_brut(['precedent', 'garbage', 1]),
+            jeton_brut(['suivant', ['liste'], 1]),
+            jeton_brut(['suivant', 12, 1]),
+            jeton_brut(['suivant', timezone.now().isoformat(), 2 ** 70]),
+        ]
+        patient = Patient.objects.get()
+        Ordonnance.objects.create(patient=patient, description='Repos')
+        self.client.force_login(User.objects.create_user('medecin', password='x'))
+        for nom_url, args, params, nom_page in (
+            ('liste_patients', [], {}, 'patients'),
+            ('liste_patients', [], {'tri': 'age'}, 'patients'),
+            ('liste_consultations', [], {}, 'consultations'),
+            ('liste_ordonnances', [], {}, 'ordonnances'),
+            ('historique_consultations', [patient.pk], {}, 'consultations'),
+        ):
+            premiere = self.client.get(reverse(nom_url, args=args), params).context[nom_page]
+            for jeton in jetons:
+                with self.subTest(vue=nom_url, params=params, jeton=jeton):
+                    cache.clear()
+                    response = self.client.get(reverse(nom_url, args=args), {**params, 'curseur': jeton})
+                    self.assertEqual(response.status_code, 200)
+                    page = response.context[nom_page]
+                    self.assertEqual([objet.id for objet in page], [objet.id for objet in premiere])
+                    self.assertFalse(page.has_previous())
+
+    def test_anciens_liens_page(self):
+        page = self.page(page=2)
+        self.assertFalse(getattr(page, 'est_curseur', False))
+        self.assertEqual([c.id for c in page], self.attendu[10:20])
+
+
+#------------------------Numérotation par patient -------------------------------------------------
+
+class NumerotationTests(TestCase):
+    """Numéros séquentiels C1, C2, ... / ORD #1, #2, ... par patient"""
+
+    def test_numeros_par_patient_et_prix(self):
+        a = Patient.objects.create(nom='Alami')
+        b = Patient.objects.create(nom='Bennis')
+        c1 = Consultations.objects.create(patient=a, type='seance_psycho')
+        Consultations.objects.create(patient=b, type='controle')
+        c2 = Consultations.objects.create(patient=a, type='consultation')
+        o1 = Ordonnance.objects.create(patient=a, description='Repos')
+
+        self.assertEqual((c1.code, c2.code, o1.numero), ('C1', 'C2', 1))
+        self.assertEqual((c1.prix, c2.prix), (700, 400))
+        a.refresh_from_db()
+        self.assertEqual((a.dernier_numero_consultation, a.dernier_numero_ordonnance), (2, 1))
+
+    def test_une_requete_pour_le_numero(self):
+        patient = Patient.objects.create(nom='Alami')
+        # UPDATE ... RETURNING + INSERT (+ savepoint)
+        with CaptureQueriesContext(connection) as requetes:
+            Ordonnance.objects.create(patient=patient, description='Repos')
+        self.assertFalse([q for q in requetes if 'MAX(' in q['sql'].upper()])
+        self.assertLessEqual(len([q for q in requetes if not q['sql'].upper().startswith(('SAVEPOINT', 'RELEASE'))]), 2)
+
+
+class NumerotationConcurrenteTests(TransactionTestCase):
+    """Créations simultanées depuis plusieurs threads : ni doublon ni trou"""
+
+    NB_THREADS = 8
+    PAR_THREAD = 250  # 2000 consultations + 2000 ordonnances
+
+    def creer_en_boucle(self, patients, erreurs):
+        try:
+            for i in range(self.PAR_THREAD):
+                patient = patients[i % len(patients)]
+                for modele, champs in ((Consultations, {'type': 'controle'}), (Ordonnance, {'description': 'Test'})):
+                    while True:
+                        try:
+                            modele.objects.create(patient=patient, **champs)
+                            break
+                        except OperationalError:
+                            # Base SQLite de test verrouillée par un autre thread : on retente
+                            time.sleep(0.001)
+        except Exception as e:  # pragma: no cover - remonté au thread principal
+            erreurs.append(e)
+        finally:
+            connection.close()
+
+    def test_numerotation_sans_doublon_ni_trou(self):
+        patients = [Patient.objects.create(nom=f'Patient{i}') for i in range(3)]
+        erreurs = []
+        threads = [
+            threading.Thread(target=self.creer_en_boucle, args=(patients, erreurs))
+            for _ in range(self.NB_THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erreurs, [])
+        for modele, compteur in ((Consultations, 'dernier_numero_consultation'), (Ordonnance, 'dernier_numero_ordonnance')):
+            for patient in patients:
+                numeros = sorted(modele.objects.filter(patient=patient).values_list('numero', flat=True))
+                self.assertEqual(numeros, list(range(1, len(numeros) + 1)))
+                patient.refresh_from_db()
+                self.assertEqual(getattr(patient, compteur), len(numeros))
+            self.assertEqual(modele.objects.count(), self.NB_THREADS * self.PAR_THREAD)
+
+
+
+@skipUnless(connection.vendor == 'sqlite', "configuration propre à SQLite")
+class ConfigurationSQLiteTests(TransactionTestCase):
+    """Pragmas appliqués à chaque connexion et transactions BEGIN IMMEDIATE"""
+
+    def pragma(self, nom):
+        with connection.cursor() as cursor:
+            return cursor.execute(f'PRAGMA {nom}').fetchone()[0]
+
+    def test_pragmas(self):
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('cache_size'), -32000)
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+
+    def test_journal_wal_active_par_migration_seulement(self):
+        # Une connexion ne modifie pas le fichier de la base (db.sqlite3 suivi par git)
+        self.assertNotIn('journal_mode', connection.settings_dict['OPTIONS']['init_command'])
+        activer_wal = importlib.import_module('website.migrations.0023_sqlite_wal').activer_wal
+        with tempfile.TemporaryDirectory() as dossier:
+            base = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(dossier, 'base.sqlite3')})
+            try:
+                with base.cursor() as cursor:
+                    self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+                with base.schema_editor(atomic=False) as schema_editor:
+                    activer_wal(None, schema_editor)
+                with base.cursor() as cursor:
+                    self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            finally:
+                base.close()
+
+    def test_transactions_immediate(self):
+        with CaptureQueriesContext(connection) as requetes:
+            Consultations.objects.create(patient=Patient.objects.create(nom='Benani'), type='controle')
+        self.assertIn('BEGIN IMMEDIATE', [q['sql'] for q in requetes])
+
+#------------------------Import en masse -------------------------------------------------
+
+class ImportRecordsTests(TestCase):
+    """Commande import_records"""
+
+    def setUp(self):
+        self.dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dossier.cleanup)
+
+    def fichier(self, nom, contenu):
+        chemin = os.path.join(self.dossier.name, nom)
+        with open(chemin, 'w', encoding='utf-8') as f:
+            f.write(contenu)
+        return chemin
+
+    def importer(self, type_, chemin):
+        call_command('import_records', type_, chemin, batch_size=2, stdout=StringIO())
+        with open(f"{chemin}.rejets.jsonl", encoding='utf-8') as f:
+            return [json.loads(ligne) for ligne in f]
+
+    def test_patients_csv(self):
+        chemin = self.fichier('patients.csv', (
+            "nom,prenom,date_naissance,telephone,email\n"
+            "Bénani,Sara,1990-04-12,06 12 34 56 78,sara@exemple.com\n"
+            "Tazi,Omar,pas-une-date,,\n"
+            "Alami,,,,\n"
+        ))
+        rejets = self.importer('patients', chemin)
+
+        self.assertEqual(list(Patient.objects.order_by('nom').values_list('nom', flat=True)), ['Alami', 'Bénani'])
+        self.assertEqual([r['ligne'] for r in rejets], [3])
+        self.assertIn('date_naissance', rejets[0]['erreurs'])
+        # Champs de recherche calculés malgré bulk_create
+        self.assertEqual(Patient.objects.get(nom='Bénani').telephone_recherche, '0612345678')
+
+    def test_consultations_jsonl_numerotation(self):
+        patient = Patient.objects.create(nom='Idrissi')
+        Consultations.objects.create(patient=patient, type='controle')  # C1 existe déjà
+        lignes = [
+            {'patient_id': patient.id, 'type': 'seance_psycho', 'date_consultation': '2024-01-0%d 10:00' % i}
+            for i in range(1, 6)
+        ]
+        lignes.insert(2, {'patient_id': 9999, 'type': 'controle'})
+        lignes.insert(3, {'patient_id': patient.id, 'type': 'inconnu'})
+        chemin = self.fichier('consultations.jsonl', '\n'.join(json.dumps(l) for l in lignes) + '\nnot json\n')
+
+        rejets = self.importer('consultations', chemin)
+
+        self.assertEqual(len(rejets), 3)
+        numeros = list(patient.consultations.order_by('numero').values_list('numero', flat=True))
+        self.assertEqual(numeros, [1, 2, 3, 4, 5, 6])
+        self.assertEqual(set(patient.consultations.filter(numero__gt=1).values_list('prix', flat=True)), {700})
+        patient.refresh_from_db()
+        self.assertEqual(patient.dernier_numero_consultation, 6)
+
+    def test_ordonnances_consultation_deja_liee(self):
+        patient = Patient.objects.create(nom='Idrissi')
+        autre = Patient.objects.create(nom='Tazi')
+        consultation = Consultations.objects.create(patient=patient, type='controle')
+        chemin = self.fichier('ordonnances.csv', (
+            "patient_id,consultation_id,description\n"
+            f"{patient.id},{consultation.id},Paracétamol\n"
+            f"{patient.id},{consultation.id},Doublon\n"
+            f"{autre.id},{consultation.id},Mauvais patient\n"
+            f"{autre.id},,Repos\n"
+        ))
+        rejets = self.importer('ordonnances', chemin)
+
+        self.assertEqual([r['ligne'] for r in rejets], [3, 4])
+        self.assertEqual(Ordonnance.objects.get(consultation=consultation).description, 'Paracétamol')
+        self.assertEqual(Ordonnance.objects.get(patient=autre).numero, 1)
+
+
+#------------------------Export CSV -------------------------------------------------
+
+class ExportCSVTests(TestCase):
+    """Exports CSV en flux"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('docteur', password='motdepasse-test')
+        cls.patient = Patient.objects.create(nom='Tazi', prenom='Omar', telephone='0612345678')
+        Consultations.objects.create(patient=cls.patient, type='seance_psycho', statut='termine', diagnostic='Anxiété')
+        Consultations.objects.create(patient=cls.patient, type='controle', statut='planifie')
+        Ordonnance.objects.create(patient=cls.patient, description='Repos\nHydratation')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def exporter(self, nom, **params):
+        response = self.client.get(reverse(nom), params)
+        self.assertTrue(response.streaming)
+        texte = b''.join(response.streaming_content).decode('utf-8-sig')
+        delimiter = ';' if params.get('format') == 'excel' else ','
+        return list(csv.reader(StringIO(texte), delimiter=delimiter))
+
+    def test_consultations_avec_filtres(self):
+        lignes = self.exporter('export_consultations', statut_filter='termine')
+        self.assertEqual(lignes[0][:3], ['ID', 'Code', 'Date'])
+        self.assertEqual(len(lignes), 2)
+        self.assertEqual(lignes[1][3:8], ['Tazi', 'Omar', 'Séance Psychotérapique', 'Terminé', '700.00'])
+
+    def test_recherche_et_format_excel(self):
+        lignes = self.exporter('export_consultations', search='anxiete', format='excel')
+        self.assertEqual(len(lignes), 2)
+
+    def test_patients_et_ordonnances(self):
+        self.assertEqual(self.exporter('export_patients', search='0612')[1][1:3], ['Tazi', 'Omar'])
+        ordonnances = self.exporter('export_ordonnances')
+        self.assertEqual(ordonnances[1][-1], 'Repos\nHydratation')
+
+    def test_connexion_obligatoire(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('export_patients')).status_code, 302)
+
+
+#---------------------------IMPRESSION PAR LOT-----------------------------------------------
+
+class ImpressionOrdonnancesTests(TestCase):
+    """Impression des ordonnances du jour en un seul PDF / ZIP"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('docteur', password='motdepasse-test')
+        patient = Patient.objects.create(nom='Tazi', prenom='Omar')
+        Ordonnance.objects.create(patient=patient, description='Repos')
+        Ordonnance.objects.create(patient=patient, description='Hydratation\n- 1,5 L par jour')
+        # Créée la veille mais liée à une consultation du jour
+        consultation = Consultations.objects.create(patient=patient, type='controle')
+        ancienne = Ordonnance.objects.create(patient=patient, consultation=consultation, description='Contrôle')
+        Ordonnance.objects.filter(pk=ancienne.pk).update(date_creation=timezone.now() - timedelta(days=1))
+        # Hors de la journée
+        hier = Ordonnance.objects.create(patient=patient, description='Hier')
+        Ordonnance.objects.filter(pk=hier.pk).update(date_creation=timezone.now() - timedelta(days=1))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_pdf_fusionne_une_page_par_ordonnance(self):
+        response = self.client.get(reverse('impression_ordonnances'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        pdf = b''.join(response.streaming_content)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(int(response['Content-Length']), len(pdf))
+        self.assertEqual(len(re.findall(rb'/Type /Page\b', pdf)), 3)
+
+    def test_zip_un_pdf_par_ordonnance(self):
+        response = self.client.get(reverse('impression_ordonnances'), {'format': 'zip'})
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 3)
+        self.assertTrue(all(archive.read(nom).startswith(b'%PDF') for nom in archive.namelist()))
+
+    def test_ordonnance_seule_sans_buffer_intermediaire(self):
+        ordonnance = Ordonnance.objects.select_related('patient').first()
+        response = OrdonnancePDFGenerator(ordonnance).generate_pdf_response()
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+
+    def test_journee_sans_ordonnance(self):
+        response = self.client.get(reverse('impression_ordonnances'), {'date': '2001-01-01'})
+        self.assertRedirects(response, reverse('liste_ordonnances'))
+
+    def test_connexion_obligatoire(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('impression_ordonnances')).status_code, 302)
+
+
+class RenduArrierePlanTests(TestCase):
+    """Rendu PDF en arrière-plan : tâche, statut, téléchargement"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('docteur', password='motdepasse-test')
+        patient = Patient.objects.create(nom='Tazi', prenom='Omar')
+        Ordonnance.objects.create(patient=patient, description='Repos')
+        Ordonnance.objects.create(patient=patient, description='Hydratation')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        reglages = override_settings(DOSSIER_RENDUS_PDF=dossier.name, RENDU_PDF_SYNCHRONE=True)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+    def test_tache_statut_telechargement(self):
+        response = self.client.post(reverse('rendu_ordonnances_du_jour') + '?format=zip')
+        self.assertEqual(response.status_code, 202)
+        tache = self.client.get(response.json()['url_statut']).json()
+        self.assertEqual(tache['statut'], 'termine')
+
+        fichier = self.client.get(tache['url_telechargement'])
+        archive = zipfile.ZipFile(BytesIO(b''.join(fichier.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 2)
+
+    def test_tache_reservee_a_son_auteur(self):
+        url_statut = self.client.post(reverse('rendu_ordonnances_du_jour')).json()['url_statut']
+        self.client.force_login(User.objects.create_user('autre', password='motdepasse-test'))
+        self.assertEqual(self.client.get(url_statut).status_code, 404)
+
+    def test_file_rendue_par_la_commande(self):
+        with override_settings(RENDU_PDF_SYNCHRONE=False):
+            url_statut = self.client.post(reverse('rendu_ordonnances_du_jour')).json()['url_statut']
+            self.assertEqual(self.client.get(url_statut).json()['statut'], 'en_attente')
+            # Serveur web redémarré : la tâche est toujours dans la file
+            call_command('rendu_pdf', une_fois=True, processus=1, stdout=StringIO())
+        tache = self.client.get(url_statut).json()
+        self.assertEqual(tache['statut'], 'termine')
+        pdf = b''.join(self.client.get(tache['url_telechargement']).streaming_content)
+        self.assertEqual(len(re.findall(rb'/Type /Page\b', pdf)), 2)
+
+    def test_reclamation_unique_et_reprise(self):
+        from .utils.rendu_pdf import DUREE_MAX_RENDU, TENTATIVES_MAX, liberer_taches, reclamer_tache, soumettre_rendu
+
+        with override_settings(RENDU_PDF_SYNCHRONE=False):
+            tache = soumettre_rendu(Ordonnance.objects.order_by('id'))
+        self.assertEqual(tache.ordonnances, list(Ordonnance.objects.order_by('id').values_list('pk', flat=True)))
+        reclamee = reclamer_tache()
+        self.assertEqual((reclamee.pk, reclamee.statut, reclamee.tentatives), (tache.pk, 'en_cours', 1))
+        self.assertIsNone(reclamer_tache())  # déjà réclamée par une autre commande
+
+        # Commande arrêtée proprement : retour dans la file sans tentative comptée
+        liberer_taches([tache.pk])
+        self.assertEqual(reclamer_tache().tentatives, 1)
+
+        # Commande tuée pendant le rendu : reprise après DUREE_MAX_RENDU, puis abandon
+        for tentative in range(2, TENTATIVES_MAX + 1):
+            TacheRendu.objects.filter(pk=tache.pk).update(date_debut=timezone.now() - DUREE_MAX_RENDU - timedelta(seconds=1))
+            self.assertEqual(reclamer_tache().tentatives, tentative)
+        TacheRendu.objects.filter(pk=tache.pk).update(date_debut=timezone.now() - DUREE_MAX_RENDU - timedelta(seconds=1))
+        self.assertIsNone(reclamer_tache())
+        self.assertEqual(TacheRendu.objects.get(pk=tache.pk).statut, 'erreur')
+
+    def test_rendu_dans_le_pool_de_processus(self):
+        from .utils import rendu_pdf, rendu_processus
+
+        self.addCleanup(rendu_pdf.fermer_executeur)
+        chemin = os.path.join(settings.DOSSIER_RENDUS_PDF, 'lot.pdf')
+        ordonnances = list(Ordonnance.objects.select_related('patient'))
+        taille = rendu_pdf.executeur().submit(rendu_processus.rendre_fichier, ordonnances, 'pdf', chemin).result(timeout=60)
+        with open(chemin, 'rb') as fichier:
+            pdf = fichier.read()
+        self.assertEqual(len(pdf), taille)
+        self.assertEqual(len(re.findall(rb'/Type /Page\b', pdf)), 2)
+
+
+class CachePDFTests(TestCase):
+    """Cache disque des PDF d'ordonnance (ETag, invalidation, éviction)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_user('medecin', password='x')
+        cls.patient = Patient.objects.create(nom='Tazi', prenom='Omar')
+        cls.ordonnance = Ordonnance.objects.create(patient=cls.patient, description='Repos')
+
+    def setUp(self):
+        self.client.force_login(self.utilisateur)
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.dossier = dossier.name
+        reglages = override_settings(DOSSIER_CACHE_PDF=self.dossier)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        compteur = mock.patch.object(cache_pdf, '_octets_ecrits', 0)
+        compteur.start()
+        self.addCleanup(compteur.stop)
+
+    def fichiers(self):
+        return sorted(nom for nom in os.listdir(self.dossier) if nom.endswith('.pdf'))
+
+    def telecharger(self, ordonnance, **entetes):
+        return self.client.get(reverse('generer_ordonnance', args=[ordonnance.pk]), **entetes)
+
+    def test_reserve_aux_utilisateurs_connectes(self):
+        self.client.logout()
+        response = self.telecharger(self.ordonnance)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(settings.LOGIN_URL))
+        self.assertEqual(self.fichiers(), [])
+
+    def test_reimpression_servie_depuis_le_cache(self):
+        response = self.telecharger(self.ordonnance)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(len(self.fichiers()), 1)
+
+        with mock.patch('website.utils.pdf_generator.OrdonnancePDFGenerator.create_pdf') as rendu:
+            response = self.telecharger(self.ordonnance)
+            b''.join(response.streaming_content)
+        rendu.assert_not_called()
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.telecharger(self.ordonnance, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalidation_a_la_modification(self):
+        etag = self.telecharger(self.ordonnance)['ETag']
+        self.ordonnance.description = 'Repos\nHydratation'
+        self.ordonnance.save()
+        self.assertEqual(self.fichiers(), [])
+
+        response = self.telecharger(self.ordonnance, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        self.ordonnance.delete()
+        self.assertEqual(self.fichiers(), [])
+
+    def test_eviction_des_moins_recemment_servis(self):
+        autres = [Ordonnance.objects.create(patient=self.patient, description=f'Ligne {i}') for i in range(3)]
+        self.telecharger(self.ordonnance)
+        taille = os.path.getsize(os.path.join(self.dossier, self.fichiers()[0]))
+        for ordonnance in autres:
+            time.sleep(0.01)
+            self.telecharger(ordonnance)
+            self.telecharger(self.ordonnance)  # toujours le plus récemment servi
+
+        with override_settings(CACHE_PDF_TAILLE_MAX=taille * 2.5):
+            time.sleep(0.01)
+            self.telecharger(Ordonnance.objects.create(patient=self.patient, description='Nouvelle'))
+        restants = {int(nom.split('-')[0]) for nom in self.fichiers()}
+        self.assertIn(self.ordonnance.pk, restants)
+        self.assertLessEqual(len(restants), 2)
+
+    def test_dossier_parcouru_seulement_apres_assez_d_ecritures(self):
+        self.telecharger(self.ordonnance)
+        taille = os.path.getsize(os.path.join(self.dossier, self.fichiers()[0]))
+        # Seuil : PART_AVANT_EVICTION de la taille maximale, soit trois fichiers environ
+        with override_settings(CACHE_PDF_TAILLE_MAX=taille * 2.9 / cache_pdf.PART_AVANT_EVICTION), \
+                mock.patch('website.utils.cache_pdf.evincer', wraps=cache_pdf.evincer) as parcours:
+            for i in range(5):
+                self.telecharger(Ordonnance.objects.create(patient=self.patient, description=f'Ligne {i}'))
+        # Six fichiers écrits : deux parcours du dossier au lieu de six
+        self.assertEqual(parcours.call_count, 2)
+
+    def test_une_seule_eviction_a_la_fois(self):
+        self.telecharger(self.ordonnance)
+        verrou = os.path.join(self.dossier, cache_pdf.NOM_VERROU)
+        open(verrou, 'w').close()  # éviction en cours dans un autre processus
+        with override_settings(CACHE_PDF_TAILLE_MAX=1):
+            cache_pdf.evincer()
+            self.assertEqual(len(self.fichiers()), 1)
+
+            # Verrou abandonné par un processus interrompu : ignoré
+            ancien = time.time() - cache_pdf.DUREE_MAX_VERROU - 1
+            os.utime(verrou, (ancien, ancien))
+            cache_pdf.evincer()
+            self.assertEqual(self.fichiers(), [])
+        self.assertFalse(os.path.exists(verrou))
+
+
+class RessourcesPDFTests(TestCase):
+    """Registre des ressources PDF (styles, images décodées une fois par processus)"""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        creer_images(dossier.name)
+        self.entete = os.path.join(dossier.name, 'entete.png')
+        self.bas = os.path.join(dossier.name, 'bas.png')
+        patient = Patient(nom='Tazi', prenom='Omar')
+        self.ordonnance = Ordonnance(patient=patient, numero=1, description='Repos\n- 3 jours\n' * 60)
+
+    def rendu(self):
+        buffer = BytesIO()
+        OrdonnancePDFGenerator(self.ordonnance, ressources_partagees(self.entete, self.bas)).create_pdf(buffer)
+        return buffer.getvalue()
+
+    def test_ressources_partagees_par_le_processus(self):
+        self.assertIs(ressources_partagees(self.entete, self.bas), ressources_partagees(self.entete, self.bas))
+
+    def test_images_decodees_une_fois_et_integrees_une_fois_par_document(self):
+        self.rendu()
+        with mock.patch('reportlab.lib.utils.ImageReader.__init__') as decodage:
+            pdf = self.rendu()
+        decodage.assert_not_called()
+        self.assertGreater(len(re.findall(rb'/Type /Page\b', pdf)), 1)
+        self.assertEqual(len(re.findall(rb'/Subtype /Image', pdf)), 2)
+        self.assertEqual(len(re.findall(rb'/Subtype /Form', pdf)), 1)
+
+
+#---------------------------INDEX-----------------------------------------------
+
+@skipUnless(connection.vendor == 'sqlite', "plans d'exécution propres à SQLite")
+class IndexAccesTests(TestCase):
+    """Les chemins d'accès principaux passent par les index composites (pas de tri en mémoire)"""
+
+    def test_historique_patient(self):
+        plan = Consultations.objects.filter(patient_id=1).order_by('-date_consultation').explain()
+        self.assertIn('consultation_patient_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_filtres_statut_et_type(self):
+        for champ, index in (('statut', 'consultation_statut_date_idx'), ('type', 'consultation_type_date_idx')):
+            plan = Consultations.objects.filter(**{champ: 'x'}).order_by('-date_consultation').explain()
+            self.assertIn(index, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_agenda(self):
+        debut, fin = bornes_jour(date(2025, 3, 10))
+        plan = (
+            Consultations.objects.filter(filtre_periode(debut, fin))
+            .order_by('date_consultation', 'statut', 'id').explain()
+        )
+        self.assertIn('consultation_date_statut_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_chevauchements(self):
+        debut = timezone.make_aware(datetime(2025, 3, 10, 10))
+        plan = occupations(debut, debut + timedelta(minutes=30)).explain()
+        self.assertIn('USING INDEX consultation_', plan)
+        self.assertIn('date_consultation>? AND date_consultation<?', plan)
+
+#---------------------------BENCHMARK-----------------------------------------------
+
+class BenchmarkTests(TestCase):
+    """Base synthétique et scénarios de la commande benchmark (à très petite échelle)"""
+
+    def test_base_synthetique_coherente(self):
+        peupler(30, consultations_par_patient=3, taille_lot=10)
+        self.assertEqual(Patient.objects.count(), 30)
+        for patient in Patient.objects.all():
+            self.assertEqual(patient.consultations.count(), patient.dernier_numero_consultation)
+            self.assertEqual(patient.ordonnances.count(), patient.dernier_numero_ordonnance)
+        self.assertFalse(Patient.objects.filter(nom_recherche='').exists())
+
+    def test_scenarios(self):
+        peupler(10, consultations_par_patient=2)
+        resultats = executer_scenarios(repetitions=2)
+        self.assertIn('detail_patient', resultats)
+        self.assertIn('rendu_pdf_ordonnance', resultats)
+        for mesures in resultats.values():
+            self.assertLessEqual(mesures['p50_ms'], mesures['p95_ms'])
+            self.assertGreaterEqual(mesures['requetes'], 1)
+
+
+#---------------------------MÉTRIQUES-----------------------------------------------
+
+class MetriquesTests(TestCase):
+    """MesuresMiddleware et endpoint /metrics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = User.objects.create_user('medecin', password='x')
+        cls.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        Patient.objects.create(nom='Benani', prenom='Sara')
+
+    def setUp(self):
+        registre.vider()
+        cache.clear()
+
+    def metriques(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('metriques'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def valeur(self, texte, ligne):
+        return float(re.search(re.escape(ligne) + r' (\S+)', texte).group(1))
+
+    def test_reserve_aux_administrateurs(self):
+        self.client.force_login(self.medecin)
+        self.assertEqual(self.client.get(reverse('metriques')).status_code, 302)
+
+    def test_mesures_par_vue(self):
+        self.client.force_login(self.medecin)
+        self.client.get(reverse('liste_patients'))
+        self.client.get(reverse('liste_patients'))
+        texte = self.metriques()
+
+        vue = '{vue="liste_patients"}'
+        self.assertEqual(self.valeur(texte, f'patient_app_requete_duree_secondes_count{vue}'), 2)
+        self.assertEqual(self.valeur(texte, 'patient_app_requete_duree_secondes_bucket{vue="liste_patients",le="+Inf"}'), 2)
+        self.assertGreater(self.valeur(texte, f'patient_app_requete_sql_requetes_sum{vue}'), 0)
+        self.assertGreater(self.valeur(texte, f'patient_app_requete_gabarit_duree_secondes_sum{vue}'), 0)
+        self.assertGreater(self.valeur(texte, f'patient_app_reponse_taille_octets_sum{vue}'), 0)
+        self.assertEqual(self.valeur(texte, 'patient_app_reponses_total{vue="liste_patients",statut="2xx"}'), 2)
+
+    @override_settings(METRIQUES_SEUIL_LENT=0)
+    def test_requete_lente_journalisee(self):
+        self.client.force_login(self.medecin)
+        with self.assertLogs('website.performances', 'WARNING') as journal:
+            self.client.get(reverse('liste_patients'))
+        self.assertIn('liste_patients', journal.output[0])
+        self.assertIn('SELECT', journal.output[0])
+
+
+#---------------------------STATISTIQUES-----------------------------------------------
+
+class StatistiquesTests(TestCase):
+    """Agrégats quotidiens tenus à jour par les signaux, identiques à une reconstruction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_user('medecin', password='x')
+        cls.patient = Patient.objects.create(nom='Benani', prenom='Sara')
+
+    def agregats(self):
+        return list(StatistiqueJour.objects.values_list('jour', 'type', 'statut', 'nombre', 'chiffre_affaires'))
+
+    def assertAgregatsExacts(self):
+        incrementaux = [ligne for ligne in self.agregats() if ligne[3]]  # lignes retombées à 0 conservées
+        reconstruire()
+        self.assertEqual(incrementaux, self.agregats())
+
+    def test_creation_modification_suppression(self):
+        hier = timezone.now() - timedelta(days=1)
+        consultations = [
+            Consultations.objects.create(patient=self.patient, type='consultation', statut='termine'),
+            Consultations.objects.create(patient=self.patient, type='consultation', statut='termine'),
+            Consultations.objects.create(patient=self.patient, type='seance_psycho', date_consultation=hier),
+        ]
+        self.assertEqual(StatistiqueJour.objects.get(type='consultation').chiffre_affaires, 800)
+        self.assertAgregatsExacts()
+
+        consultations[0].type = 'controle'
+        consultations[0].save()
+        consultations[1].date_consultation = hier
+        consultations[1].save()
+        consultations[2].delete()
+        self.assertAgregatsExacts()
+
+    def test_modification_sans_effet(self):
+        consultation = Consultations.objects.create(patient=self.patient, type='consultation')
+        consultation.diagnostic = 'Insomnie'
+        with CaptureQueriesContext(connection) as requetes:
+            consultation.save()
+        self.assertFalse([q for q in requetes if 'statistiquejour' in q['sql'].lower()])
+
+    def test_insertions_en_masse(self):
+        peupler(5, consultations_par_patient=4)
+        self.assertAgregatsExacts()
+
+    def test_tableau_de_bord(self):
+        maintenant = timezone.now()
+        Consultations.objects.create(patient=self.patient, type='consultation', statut='termine')
+        Consultations.objects.create(patient=self.patient, type='seance_psycho', statut='annule')
+
+        self.client.force_login(self.utilisateur)
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('tableau_de_bord'), {'annee': maintenant.year, 'mois': maintenant.month})
+        self.assertEqual(response.status_code, 200)
+        # Lecture des agrégats seulement, jamais de la table des consultations
+        self.assertFalse([q for q in requetes if 'website_consultations' in q['sql']])
+
+        statistiques = response.context['statistiques']
+        self.assertEqual(statistiques['totaux'], {'nombre': 2, 'chiffre_affaires': 400})
+        self.assertEqual(len(statistiques['serie']), 1)
+
+        annee = self.client.get(reverse('tableau_de_bord'), {'annee': maintenant.year, 'mois': ''})
+        self.assertIsNone(annee.context['mois'])
+        self.assertEqual(annee.context['statistiques']['totaux']['nombre'], 2)
+
+
+#---------------------------CACHE DES LISTES-----------------------------------------------
+
+class CacheEspion:
+    """Backend de cache qui note les versions écrites"""
+
+    def __init__(self, cache, ecrites):
+        self.cache = cache
+        self.ecrites = ecrites
+
+    def __getattr__(self, nom):
+        return getattr(self.cache, nom)
+
+    def set(self, cle, valeur, *args, **kwargs):
+        if ':version:' in cle:
+            self.ecrites.append(valeur)
+        return self.cache.set(cle, valeur, *args, **kwargs)
+
+    def incr(self, cle, delta=1, *args, **kwargs):
+        valeur = self.cache.incr(cle, delta, *args, **kwargs)
+        self.ecrites.append(valeur)
+        return valeur
+
+
+def invalider_en_boucle(depart, resultats, fois):
+    """Processus enfant : invalide le cache des patients `fois` fois, renvoie les versions écrites"""
+    ecrites = []
+    depart.wait()
+    with mock.patch('website.utils.cache_versionne.cache', CacheEspion(caches['default'], ecrites)):
+        for _ in range(fois):
+            invalider(Patient)
+    resultats.put(ecrites)
+
+
+class CacheListesTests(TestCase):
+    """Tableaux des listes en cache, invalidés par les signaux des modèles"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = Patient.objects.create(nom='Benani', prenom='Sara')
+        Consultations.objects.create(patient=cls.patient, type='controle', diagnostic='Migraine')
+
+    def setUp(self):
+        cache.clear()
+        registre.vider()
+
+    def lire(self, nom_url, **params):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse(nom_url), params)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode(), [q['sql'] for q in requetes]
+
+    def test_deuxieme_lecture_sans_sql(self):
+        premiere, requetes = self.lire('liste_patients', search='benani')
+        self.assertTrue(requetes)
+        seconde, requetes = self.lire('liste_patients', search='benani')
+        self.assertEqual(requetes, [])
+        self.assertIn('Benani', seconde)
+        self.assertEqual(registre.cache[('liste_patients', 'miss')], 1)
+        self.assertEqual(registre.cache[('liste_patients', 'hit')], 1)
+        # Autres filtres : autre entrée
+        self.lire('liste_patients', search='tazi')
+        self.assertEqual(registre.cache[('liste_patients', 'miss')], 2)
+
+    def test_invalidation_par_signaux(self):
+        self.lire('liste_patients')
+        self.lire('liste_consultations')
+
+        Patient.objects.create(nom='Tazi', prenom='Omar')
+        texte, requetes = self.lire('liste_patients')
+        self.assertIn('Tazi', texte)
+        self.assertTrue(requetes)
+
+        # Nom du patient affiché dans la liste des consultations
+        self.patient.nom = 'Berrada'
+        self.patient.save()
+        texte, _ = self.lire('liste_consultations')
+        self.assertIn('Berrada', texte)
+
+        Consultations.objects.filter(patient=self.patient).delete()
+        texte, _ = self.lire('liste_consultations')
+        self.assertNotIn('Berrada', texte)
+
+    def test_version_incrementee_par_un_autre_processus(self):
+        # Commande manage.py ou autre worker : sa propre instance du backend, sans signal ici
+        self.lire('liste_patients')
+        _, requetes = self.lire('liste_patients')
+        self.assertEqual(requetes, [])
+
+        Patient.objects.bulk_create([Patient(nom='Tazi', prenom='Omar')])  # aucun signal
+        autre = caches.create_connection('default')
+        self.assertIsNot(autre, caches['default'])
+        with mock.patch('website.utils.cache_versionne.cache', autre), self.captureOnCommitCallbacks(execute=True):
+            invalider(Patient)
+
+        texte, requetes = self.lire('liste_patients')
+        self.assertIn('Tazi', texte)
+        self.assertTrue(requetes)
+
+    @skipUnless('fork' in multiprocessing.get_all_start_methods(), "processus enfants par fork")
+    def test_invalidations_concurrentes(self):
+        # Deux processus invalident en même temps : chaque écriture est une version encore jamais vue,
+        # sinon une page mise en cache entre deux écritures identiques resterait servie
+        contexte = multiprocessing.get_context('fork')
+        depart, resultats = contexte.Event(), contexte.Queue()
+        processus = [contexte.Process(target=invalider_en_boucle, args=(depart, resultats, 200)) for _ in range(2)]
+        for enfant in processus:
+            enfant.start()
+        depart.set()
+        ecrites = [version for _ in processus for version in resultats.get(timeout=60)]
+        for enfant in processus:
+            enfant.join()
+            self.assertEqual(enfant.exitcode, 0)
+        self.assertEqual(len(ecrites), 400)
+        self.assertEqual(len(set(ecrites)), 400)
+
+    def test_cache_memoire_desactive(self):
+        # Cache propre au processus : les modifications des autres processus n'y seraient pas vues
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.lire('liste_patients')
+            _, requetes = self.lire('liste_patients')
+            self.assertTrue(requetes)
+            Patient.objects.bulk_create([Patient(nom='Tazi', prenom='Omar')])
+            texte, _ = self.lire('liste_patients')
+            self.assertIn('Tazi', texte)
+        self.assertEqual(registre.cache, {})
+
+    def test_jeton_csrf_de_la_requete(self):
+        self.lire('liste_patients')
+        client = self.client_class(enforce_csrf_checks=True)
+        texte = client.get(reverse('liste_patients')).content.decode()
+        self.assertNotIn(JETON_CSRF, texte)
+        jeton = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', texte).group(1)
+        response = client.post(reverse('supprimer_patient', args=[self.patient.id]), {'csrfmiddlewaretoken': jeton})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Patient.objects.filter(pk=self.patient.pk).exists())
+
+    def test_compteurs_exposes(self):
+        self.lire('liste_ordonnances')
+        self.lire('liste_ordonnances')
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+        texte = self.client.get(reverse('metriques')).content.decode()
+        self.assertIn('patient_app_cache_total{espace="liste_ordonnances",resultat="hit"} 1', texte)
+        self.assertIn('patient_app_cache_total{espace="liste_ordonnances",resultat="miss"} 1', texte)
+
+
+#---------------------------REQUÊTES CONDITIONNELLES-----------------------------------------------
+
+class RevalidationDetailTests(TestCase):
+    """ETag / Last-Modified des pages de détail : 304 en une requête si rien n'a changé"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = Patient.objects.create(nom='Benani', prenom='Sara', date_naissance=date(1990, 5, 1))
+        cls.consultation = Consultations.objects.create(patient=cls.patient, type='consultation', diagnostic='Migraine')
+        cls.ordonnance = Ordonnance.objects.create(
+            patient=cls.patient, consultation=cls.consultation, description='Paracétamol 1g'
+        )
+
+    def url(self, nom, objet):
+        return reverse(nom, args=[objet.pk])
+
+    def revisiter(self, url, premiere):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=premiere['ETag'])
+        return response, len(requetes)
+
+    def test_304_en_une_requete(self):
+        for nom, objet in [('detail_patient', self.patient), ('detail_consultation', self.consultation),
+                           ('detail_ordonnance', self.ordonnance)]:
+            url = self.url(nom, objet)
+            premiere = self.client.get(url)
+            self.assertEqual(premiere.status_code, 200)
+            self.assertIn('private', premiere['Cache-Control'])
+            self.assertIn('no-cache', premiere['Cache-Control'])
+
+            response, nombre = self.revisiter(url, premiere)
+            self.assertEqual(response.status_code, 304, nom)
+            self.assertEqual(nombre, 1, nom)
+            self.assertEqual(response.content, b'')
+
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=premiere['Last-Modified'])
+            self.assertEqual(response.status_code, 304, nom)
+
+    def test_modification_liee(self):
+        url = self.url('detail_patient', self.patient)
+        premiere = self.client.get(url)
+        self.consultation.diagnostic = 'Migraine chronique'
+        self.consultation.save()
+        response, _ = self.revisiter(url, premiere)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Benani')
+
+        # Suppression : aucune date n'avance, le nombre de lignes change
+        seconde = self.client.get(url)
+        Ordonnance.objects.filter(pk=self.ordonnance.pk).delete()
+        response, _ = self.revisiter(url, seconde)
+        self.assertEqual(response.status_code, 200)
+
+    def test_patient_modifie_dans_les_pages_liees(self):
+        url = self.url('detail_ordonnance', self.ordonnance)
+        premiere = self.client.get(url)
+        self.patient.telephone = '0612345678'
+        self.patient.save()
+        response, _ = self.revisiter(url, premiere)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '0612345678')
+
+    def test_introuvable(self):
+        response = self.client.get(reverse('detail_consultation', args=[0]), HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, 404)
+
+
+#---------------------------VUES ASYNCHRONES-----------------------------------------------
+
+class VuesAsynchronesTests(TestCase):
+    """Listes et recherche servies en vues asynchrones (ASGI)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = User.objects.create_user('medecin', password='x')
+        patient = Patient.objects.create(nom='Benani', prenom='Sara')
+        Patient.objects.create(nom='Benali', prenom='Youssef')
+        consultation = Consultations.objects.create(patient=patient, type='controle', diagnostic='Migraine')
+        Ordonnance.objects.create(patient=patient, consultation=consultation, description='Paracétamol 1g')
+
+    def setUp(self):
+        cache.clear()
+        registre.vider()
+
+    def test_vues_coroutines(self):
+        for vue in (views.liste_patients, views.liste_consultations, views.liste_ordonnances, views.suggestion_patients):
+            self.assertTrue(asyncio.iscoroutinefunction(vue), vue.__name__)
+
+    async def test_suggestion(self):
+        await self.async_client.aforce_login(self.medecin)
+        response = await self.async_client.get(reverse('suggestion_patients'), {'q': 'ben'})
+        noms = [p['fullName'] for p in response.json()['results']]
+        self.assertEqual(noms, ['Benali Youssef', 'Benani Sara'])
+
+    async def test_listes(self):
+        await self.async_client.aforce_login(self.medecin)
+        for nom_url, attendu in (
+            ('liste_patients', 'Benali'),
+            ('liste_consultations', 'Benani'),
+            ('liste_ordonnances', 'Benani'),
+        ):
+            response = await self.async_client.get(reverse(nom_url), {'search': 'ben'})
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, attendu)
+            self.assertNotContains(response, JETON_CSRF)
+            # Deuxième lecture : depuis le cache
+            await self.async_client.get(reverse(nom_url), {'search': 'ben'})
+            self.assertEqual(registre.cache[(nom_url, 'hit')], 1)
+
+    async def test_mesures_chemin_asynchrone(self):
+        await self.async_client.get(reverse('liste_patients'))
+        duree = registre.histogrammes[('patient_app_requete_duree_secondes', 'liste_patients')]
+        sql = registre.histogrammes[('patient_app_requete_sql_requetes', 'liste_patients')]
+        self.assertEqual(duree.nombre, 1)
+        self.assertGreater(sql.somme, 0)
+        self.assertEqual(registre.reponses[('liste_patients', '2xx')], 1)
+
+
+#---------------------------AGENDA-----------------------------------------------
+
+class AgendaTests(TestCase):
+    """Agenda jour / semaine sur des plages [début, fin[ et filtres de dates de la liste"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = User.objects.create_user('medecin', password='x')
+        cls.patient = Patient.objects.create(nom='Benani', prenom='Sara')
+        cls.lundi = date(2025, 3, 10)
+
+        def consultation(jour, heure, minute=0, statut='planifie'):
+            moment = timezone.make_aware(datetime.combine(jour, dt_time(heure, minute)))
+            return Consultations.objects.create(
+                patient=cls.patient, type='controle', statut=statut, date_consultation=moment
+            )
+
+        cls.veille = consultation(cls.lundi - timedelta(days=1), 23, 59)
+        cls.minuit = consultation(cls.lundi, 0)
+        cls.apres_midi = consultation(cls.lundi, 14, 30, statut='annule')
+        cls.matin = consultation(cls.lundi, 9)
+        cls.mercredi = consultation(cls.lundi + timedelta(days=2), 10)
+        cls.lundi_suivant = consultation(cls.lundi + timedelta(days=7), 0)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.medecin)
+
+    def api(self, **params):
+        response = self.client.get(reverse('api_agenda'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_jour_borne_et_ordonne(self):
+        donnees = self.api(date='2025-03-10').json()
+        self.assertEqual([c['id'] for c in donnees['creneaux']], [self.minuit.id, self.matin.id, self.apres_midi.id])
+        self.assertEqual(donnees['creneaux'][1]['heure'], '09:00')
+        self.assertEqual(donnees['par_statut']['planifie'], 2)
+        self.assertEqual(donnees['par_statut']['annule'], 1)
+
+    def test_semaine_et_statut(self):
+        donnees = self.api(date='2025-03-12', vue='semaine', statut='planifie').json()
+        self.assertEqual([c['id'] for c in donnees['creneaux']], [self.minuit.id, self.matin.id, self.mercredi.id])
+
+    def test_interrogation_reguliere(self):
+        etag = self.api(date='2025-03-10')['ETag']
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('api_agenda'), {'date': '2025-03-10'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in requetes if 'website_consultations' in q['sql']])
+
+        # Consultation modifiée : nouvelle version
+        self.matin.statut = 'en_cours'
+        self.matin.save()
+        response = self.client.get(reverse('api_agenda'), {'date': '2025-03-10'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_page(self):
+        response = self.client.get(reverse('agenda'), {'date': '2025-03-10', 'vue': 'semaine'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['jours']), 7)
+        self.assertEqual(len(response.context['jours'][2]['creneaux']), 1)
+        self.assertContains(response, 'Benani Sara')
+
+    def test_reserve_aux_utilisateurs_connectes(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_agenda')).status_code, 302)
+
+    def test_filtre_de_dates_de_la_liste(self):
+        with mock.patch('django.utils.timezone.localdate', return_value=self.lundi + timedelta(days=2)):
+            for date_filter, attendues in (
+                ('aujourd_hui', [self.mercredi]),
+                ('cette_semaine', [self.minuit, self.matin, self.apres_midi, self.mercredi]),
+                ('ce_mois', [self.minuit, self.matin, self.apres_midi, self.mercredi, self.lundi_suivant, self.veille]),
+            ):
+                consultations, _ = views.filtrer_consultations(Consultations.objects.all(), {'date_filter': date_filter})
+                sql = str(consultations.query)
+                self.assertNotIn('django_datetime_cast_date', sql)
+                self.assertNotIn('django_datetime_extract', sql)
+                self.assertCountEqual(consultations, attendues)
+
+
+#---------------------------RÉSERVATION-----------------------------------------------
+
+class ReservationTests(TestCase):
+    """Durées par type, chevauchements de créneaux et créneaux libres"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = User.objects.create_user('medecin', password='x')
+        cls.patient = Patient.objects.create(nom='Benani', prenom='Sara')
+        cls.autre = Patient.objects.create(nom='Tazi', prenom='Omar')
+        cls.lundi = date(2025, 3, 10)
+        # Séance de 9 h 30 à 10 h 30
+        cls.seance = Consultations.objects.create(
+            patient=cls.patient, type='seance_psycho', date_consultation=cls.moment(cls.lundi, 9, 30)
+        )
+
+    @staticmethod
+    def moment(jour, heure, minute=0):
+        return timezone.make_aware(datetime.combine(jour, dt_time(heure, minute)))
+
+    def formulaire(self, patient, heure, minute=0, type_='controle', statut='planifie', instance=None):
+        return ConsultationForm({
+            'patient': patient.pk, 'type': type_, 'statut': statut, 'diagnostic': '',
+            'date_consultation': self.moment(self.lundi, heure, minute).strftime('%Y-%m-%d %H:%M'),
+        }, instance=instance)
+
+    def test_fin_du_creneau_selon_le_type(self):
+        self.assertEqual(self.seance.date_fin, self.moment(self.lundi, 10, 30))
+        self.seance.type = 'controle'
+        self.seance.save()
+        self.assertEqual(self.seance.date_fin, self.moment(self.lundi, 9, 45))
+
+    def test_chevauchements(self):
+        # Commence pendant la séance (même patient, puis autre patient : un seul praticien)
+        formulaire = self.formulaire(self.patient, 10, 15)
+        self.assertFalse(formulaire.is_valid())
+        self.assertIn('déjà une consultation sur ce créneau', formulaire.non_field_errors()[0])
+        formulaire = self.formulaire(self.autre, 9)  # contrôle de 9 h à 9 h 15 : avant la séance
+        self.assertTrue(formulaire.is_valid())
+        formulaire = self.formulaire(self.autre, 9, 15, type_='consultation')
+        self.assertFalse(formulaire.is_valid())
+        self.assertIn('Créneau déjà occupé', formulaire.non_field_errors()[0])
+        # Juste après la fin de la séance
+        self.assertTrue(self.formulaire(self.autre, 10, 30).is_valid())
+
+    def test_creneaux_liberes_et_modification(self):
+        # La séance elle-même, modifiée sans changer de créneau
+        formulaire = ConsultationForm({
+            'patient': self.patient.pk, 'type': 'seance_psycho', 'statut': 'termine', 'diagnostic': 'Anxiété',
+            'date_consultation': timezone.localtime(self.seance.date_consultation).strftime('%Y-%m-%d %H:%M'),
+        }, instance=self.seance)
+        self.assertTrue(formulaire.is_valid(), formulaire.errors)
+
+        self.assertTrue(self.formulaire(self.autre, 10, statut='annule').is_valid())
+        self.seance.statut = 'rapporte'
+        self.seance.save()
+        self.assertTrue(self.formulaire(self.autre, 10).is_valid())
+
+    def test_creneaux_libres_en_un_passage(self):
+        occupes = [
+            (self.moment(self.lundi, 9), self.moment(self.lundi, 9, 45)),
+            (self.moment(self.lundi, 10), self.moment(self.lundi, 11)),
+            (self.moment(self.lundi, 10, 30), self.moment(self.lundi, 10, 45)),  # inclus dans le précédent
+        ]
+        debut, fin = bornes_jour(self.lundi)
+        libres = creneaux_libres(debut, fin, timedelta(minutes=30), occupes, limite=5)
+        self.assertEqual(
+            [timezone.localtime(d).strftime('%H:%M') for d, _ in libres],
+            ['11:00', '11:30', '12:00', '12:30', '14:00'],
+        )
+
+    def test_fermeture_du_dimanche(self):
+        samedi = self.lundi - timedelta(days=2)
+        libres = creneaux_libres(self.moment(samedi, 12, 40), self.moment(samedi, 12, 40) + timedelta(days=7),
+                                 timedelta(minutes=15), [], limite=2)
+        self.assertEqual(libres[0][0], self.moment(samedi, 12, 45))
+        self.assertEqual(libres[1][0], self.moment(self.lundi, 9))
+
+    def test_api(self):
+        self.client.force_login(self.medecin)
+        with mock.patch('django.utils.timezone.now', return_value=self.moment(self.lundi, 8)):
+            with CaptureQueriesContext(connection) as requetes:
+                response = self.client.get(reverse('api_creneaux_libres'), {'type': 'consultation', 'limite': 3})
+        donnees = response.json()
+        self.assertEqual(donnees['duree_minutes'], 30)
+        self.assertEqual([c['heure'] for c in donnees['creneaux']], ['09:00', '10:30', '11:00'])
+        self.assertEqual(len([q for q in requetes if 'website_consultations' in q['sql']]), 1)
+
+        response = self.client.get(reverse('api_creneaux_libres'), {'type': 'inconnu'})
+        self.assertEqual(response.status_code, 400)
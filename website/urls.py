@@ -11,9 +11,11 @@ urlpatterns = [
 #-----------------------Patient------------------------------------------
     path('liste_patients/', views.liste_patients, name='liste_patients'),
     path('patients/detail/<int:patient_id>/', views.detail_patient, name='detail_patient'),
+    path('patients/<int:patient_id>/consultations/', views.historique_consultations, name='historique_consultations'),
     path('patients/nouveau/', views.patient_form, name='ajouter_patient'),
     path('patients/<int:patient_id>/modifier/', views.patient_form, name='modifier_patient'),
     path('patients/supprimer/<int:patient_id>/', views.supprimer_patient, name='supprimer_patient'),
+    path('api/patients/suggest', views.suggestion_patients, name='suggestion_patients'),
 
 
 
@@ -36,6 +38,27 @@ urlpatterns = [
     path('ordonnances/<int:ordonnance_id>/supprimer/', views.supprimer_ordonnance, name='supprimer_ordonnance'),
     path('ordonnances/<int:pk>/', views.detail_ordonnance, name='detail_ordonnance'),
     path("ordonnance/<int:ordonnance_id>/", views.generer_ordonnance, name="generer_ordonnance"),
+    path('ordonnances/impression/', views.impression_ordonnances, name='impression_ordonnances'),
+    path('ordonnances/impression/rendu/', views.rendu_ordonnances_du_jour, name='rendu_ordonnances_du_jour'),
+    path('rendus/<int:tache_id>/', views.statut_rendu, name='statut_rendu'),
+    path('rendus/<int:tache_id>/telecharger/', views.telecharger_rendu, name='telecharger_rendu'),
+
+#-----------------------EXPORT -------------------------------------------------------------------
+
+    path('export/patients.csv', views.export_patients, name='export_patients'),
+    path('export/consultations.csv', views.export_consultations, name='export_consultations'),
+    path('export/ordonnances.csv', views.export_ordonnances, name='export_ordonnances'),
+
+#-----------------------TABLEAU DE BORD -------------------------------------------------------------------
+
+    path('statistiques/', views.tableau_de_bord, name='tableau_de_bord'),
+    path('agenda/', views.agenda, name='agenda'),
+    path('api/agenda', views.api_agenda, name='api_agenda'),
+    path('api/creneaux_libres', views.api_creneaux_libres, name='api_creneaux_libres'),
+
+#-----------------------MÉTRIQUES -------------------------------------------------------------------
+
+    path('metrics', views.metriques, name='metriques'),
 ]
 
 
@@ -0,0 +1,72 @@
+# utils/age.py
+"""
+Âge des patients, calculé en Python (affichage) ou en SQL (filtres, tri)
+- Les tranches d'âge se traduisent en plages sur date_naissance : la base utilise
+  l'index (date_naissance, id) au lieu de calculer l'âge de chaque patient
+- annoter_age() : âge calculé par la base, pour les requêtes qui en ont besoin
+"""
+
+from datetime import date
+
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
+
+
+# code : (libellé, âge minimum inclus, âge maximum exclu)
+TRANCHES_AGE = {
+    'moins_18': ("Moins de 18 ans", None, 18),
+    '18_64': ("18 à 64 ans", 18, 65),
+    '65_plus': ("65 ans et plus", 65, None),
+}
+
+
+def calculer_age(date_naissance, aujourd_hui=None):
+    """Âge en années révolues (None sans date de naissance)"""
+    if date_naissance is None:
+        return None
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    return aujourd_hui.year - date_naissance.year - (
+        (aujourd_hui.month, aujourd_hui.day) < (date_naissance.month, date_naissance.day)
+    )
+
+
+def naissance_au_plus_tard(annees, aujourd_hui=None):
+    """
+    Date de naissance la plus récente pour avoir au moins `annees` ans aujourd'hui
+    (un 29 février sans équivalent cette année-là devient le 28)
+    """
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    try:
+        return aujourd_hui.replace(year=aujourd_hui.year - annees)
+    except ValueError:
+        return date(aujourd_hui.year - annees, 2, 28)
+
+
+def filtre_tranche_age(tranche, aujourd_hui=None):
+    """
+    Condition Q sur date_naissance pour une tranche de TRANCHES_AGE (None si tranche inconnue)
+    Ex. 18 à 64 ans : né après la date des 65 ans et au plus tard à la date des 18 ans
+    """
+    if tranche not in TRANCHES_AGE:
+        return None
+    _, minimum, maximum = TRANCHES_AGE[tranche]
+    condition = Q(date_naissance__isnull=False)
+    if minimum is not None:
+        condition &= Q(date_naissance__lte=naissance_au_plus_tard(minimum, aujourd_hui))
+    if maximum is not None:
+        condition &= Q(date_naissance__gt=naissance_au_plus_tard(maximum, aujourd_hui))
+    return condition
+
+
+def annoter_age(queryset, aujourd_hui=None):
+    """Ajoute 'age_calcule' : même calcul que calculer_age(), fait par la base"""
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    anniversaire_a_venir = (
+        Q(date_naissance__month__gt=aujourd_hui.month) |
+        Q(date_naissance__month=aujourd_hui.month, date_naissance__day__gt=aujourd_hui.day)
+    )
+    return queryset.annotate(
+        age_calcule=Value(aujourd_hui.year) - ExtractYear('date_naissance')
+        - Case(When(anniversaire_a_venir, then=Value(1)), default=Value(0), output_field=IntegerField())
+    )
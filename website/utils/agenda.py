@@ -0,0 +1,110 @@
+# utils/agenda.py
+"""
+Agenda des consultations (jour / semaine) et périodes des filtres de dates
+- Une période est une plage semi-ouverte [début, fin[ de datetimes : la base compare
+  directement date_consultation aux bornes et parcourt l'index (date_consultation, statut),
+  là où date_consultation__date / __year / __month appliquent une fonction à chaque ligne
+- Bornes calculées à minuit heure locale (TIME_ZONE), ce qui gère les changements d'heure
+- acreneaux() : créneaux d'une période dans l'ordre chronologique, en cache (utils/cache_versionne.py)
+  avec une empreinte : l'accueil interroge l'API régulièrement et reçoit 304 sans requête SQL
+"""
+
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Consultations, Patient
+from .cache_versionne import aobtenir
+
+
+VUES_AGENDA = ('jour', 'semaine')
+
+
+# === PÉRIODES [DÉBUT, FIN[ ===
+
+def minuit(jour):
+    """Début du jour en heure locale (datetime avec fuseau)"""
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+def bornes_jour(jour):
+    return minuit(jour), minuit(jour + timedelta(days=1))
+
+
+def bornes_semaine(jour):
+    """Du lundi au lundi suivant"""
+    lundi = jour - timedelta(days=jour.weekday())
+    return minuit(lundi), minuit(lundi + timedelta(days=7))
+
+
+def bornes_mois(jour):
+    debut = jour.replace(day=1)
+    return minuit(debut), minuit(debut.replace(year=debut.year + (debut.month == 12), month=debut.month % 12 + 1))
+
+
+def filtre_periode(debut, fin, champ='date_consultation'):
+    """Condition Q utilisable par l'index : début <= champ < fin"""
+    return Q(**{f'{champ}__gte': debut, f'{champ}__lt': fin})
+
+
+# === CRÉNEAUX ===
+
+async def acreneaux(debut, fin, statuts=None):
+    """
+    Consultations de [début, fin[ dans l'ordre chronologique (une requête, ou aucune si en cache)
+
+    Args:
+        statuts: codes de statut à garder (tous si vide)
+
+    Returns:
+        dict : corps (JSON de l'API), etag (empreinte du corps), donnees (dict du JSON)
+    """
+    statuts = sorted(set(statuts or ()) & set(dict(Consultations.STATUT_CONSULTATION)))
+
+    async def calcul():
+        consultations = Consultations.objects.filter(filtre_periode(debut, fin))
+        if statuts:
+            consultations = consultations.filter(statut__in=statuts)
+        types = dict(Consultations.TYPE_CONSULTATION)
+        libelles_statuts = dict(Consultations.STATUT_CONSULTATION)
+        creneaux = []
+        par_statut = dict.fromkeys(libelles_statuts, 0)
+        async for cid, numero, date, type_, statut, patient_id, nom, prenom in (
+            consultations
+            .order_by('date_consultation', 'statut', 'id')  # ordre de l'index : ni tri ni ambiguïté
+            .values_list('id', 'numero', 'date_consultation', 'type', 'statut',
+                         'patient_id', 'patient__nom', 'patient__prenom')
+        ):
+            locale = timezone.localtime(date)
+            par_statut[statut] = par_statut.get(statut, 0) + 1
+            creneaux.append({
+                'id': cid,
+                'code': f"C{numero}" if numero is not None else None,
+                'debut': locale.isoformat(),
+                'jour': locale.date().isoformat(),
+                'heure': locale.strftime('%H:%M'),
+                'patient_id': patient_id,
+                'patient': f"{nom} {prenom or ''}".strip(),
+                'type': type_,
+                'type_libelle': types.get(type_, type_),
+                'statut': statut,
+                'statut_libelle': libelles_statuts.get(statut, statut),
+                'url': reverse('detail_consultation', args=[cid]),
+            })
+        donnees = {
+            'debut': timezone.localtime(debut).isoformat(),
+            'fin': timezone.localtime(fin).isoformat(),
+            'statuts': statuts,
+            'par_statut': par_statut,
+            'creneaux': creneaux,
+        }
+        corps = json.dumps(donnees, ensure_ascii=False)
+        return {'corps': corps, 'etag': hashlib.md5(corps.encode()).hexdigest(), 'donnees': donnees}
+
+    parametres = {'debut': debut.isoformat(), 'fin': fin.isoformat(), 'statuts': statuts}
+    # Nom et prénom du patient affichés : l'entrée dépend aussi des patients
+    return await aobtenir('agenda', [Consultations, Patient], parametres, calcul)
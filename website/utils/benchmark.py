@@ -0,0 +1,237 @@
+# utils/benchmark.py
+"""
+Benchmark de l'application : base synthétique + mesure des pages principales
+Utilisé par la commande `python manage.py benchmark` (voir son aide).
+- peupler() : patients, consultations et ordonnances réalistes, insérés par lots (bulk_create)
+- executer_scenarios() : latences p50 / p95 et nombre de requêtes SQL par scénario
+"""
+
+import math
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Consultations, Ordonnance, Patient
+from .cache_versionne import invalider
+from .pdf_generator import OrdonnancePDFGenerator
+from .statistiques import ajouter_consultations
+
+
+NOMS = [
+    'Alaoui', 'Benani', 'Benali', 'Berrada', 'Bennis', 'Chraibi', 'El Amrani', 'El Fassi', 'Filali', 'Hajji',
+    'Idrissi', 'Jettou', 'Kettani', 'Lahlou', 'Mansouri', 'Naciri', 'Ouazzani', 'Rami', 'Sqalli', 'Tazi',
+    'Tahiri', 'Zerouali', 'Bouzid', 'Cherkaoui', 'Daoudi', 'Essaidi', 'Guessous', 'Hassani', 'Jabri', 'Kabbaj',
+]
+PRENOMS = [
+    'Sara', 'Youssef', 'Omar', 'Nadia', 'Amina', 'Karim', 'Salma', 'Mehdi', 'Imane', 'Hicham',
+    'Khadija', 'Rachid', 'Meryem', 'Anas', 'Hind', 'Reda', 'Zineb', 'Yassine', 'Laila', 'Adil',
+]
+DIAGNOSTICS = [
+    'Trouble anxieux généralisé', 'Épisode dépressif modéré', 'Insomnie chronique', 'Trouble panique',
+    'Stress post-traumatique', 'Trouble bipolaire, suivi', 'Burn-out professionnel', 'Phobie sociale',
+    'Trouble obsessionnel compulsif', 'Anxiété de performance', '', '',
+]
+PRESCRIPTIONS = [
+    "Paroxétine 20 mg\n- 1 comprimé le matin pendant 3 mois",
+    "Sertraline 50 mg\n- 1 comprimé le soir\n- à augmenter à 100 mg après 2 semaines",
+    "Alprazolam 0,25 mg\n- 1 comprimé si anxiété, maximum 3 par jour",
+    "Zolpidem 10 mg\n- 1 comprimé au coucher pendant 14 jours",
+    "Escitalopram 10 mg\n- 1 comprimé par jour\nContrôle dans 1 mois",
+    "Hydroxyzine 25 mg\n- 1 comprimé le soir\nRepos, activité physique régulière",
+]
+
+
+# === BASE SYNTHÉTIQUE ===
+
+def peupler(nombre_patients, consultations_par_patient=5, taux_ordonnances=0.6, graine=42,
+            taille_lot=2000, progression=None):
+    """
+    Insère `nombre_patients` patients avec en moyenne `consultations_par_patient` consultations
+    chacun (0 à 2 × la moyenne) et une ordonnance pour `taux_ordonnances` des consultations.
+    Les numéros (C1, ORD #1, ...) et les compteurs des patients sont posés directement.
+
+    Args:
+        progression: fonction appelée avec le nombre de patients insérés après chaque lot
+    """
+    aleatoire = random.Random(graine)
+    types = [code for code, _ in Consultations.TYPE_CONSULTATION]
+    statuts = [code for code, _ in Consultations.STATUT_CONSULTATION]
+    maintenant = timezone.now()
+    inseres = 0
+
+    while inseres < nombre_patients:
+        taille = min(taille_lot, nombre_patients - inseres)
+        with transaction.atomic():
+            # 1. Patients, avec le plan de leurs consultations (pour poser les compteurs)
+            patients, plans = [], []
+            for i in range(inseres, inseres + taille):
+                nb_consultations = aleatoire.randint(0, 2 * consultations_par_patient)
+                avec_ordonnance = [aleatoire.random() < taux_ordonnances for _ in range(nb_consultations)]
+                patient = Patient(
+                    nom=aleatoire.choice(NOMS),
+                    prenom=aleatoire.choice(PRENOMS),
+                    date_naissance=date(1950, 1, 1) + timedelta(days=aleatoire.randint(0, 365 * 55)),
+                    sexe=aleatoire.choice('MF'),
+                    telephone=f"06{i:08d}",
+                    email=f"patient{i}@exemple.ma",
+                    profession=aleatoire.choice(['Enseignant', 'Ingénieur', 'Commerçant', 'Étudiant', '']),
+                    dernier_numero_consultation=nb_consultations,
+                    dernier_numero_ordonnance=sum(avec_ordonnance),
+                )
+                patient.mettre_a_jour_recherche()
+                patients.append(patient)
+                plans.append(avec_ordonnance)
+            Patient.objects.bulk_create(patients)
+
+            # 2. Consultations
+            consultations, avec_ordonnances = [], []
+            for patient, plan in zip(patients, plans):
+                for numero, avec_ordonnance in enumerate(plan, start=1):
+                    type_ = aleatoire.choice(types)
+                    consultation = Consultations(
+                        patient=patient,
+                        numero=numero,
+                        type=type_,
+                        prix=Consultations.PRIX_PAR_TYPE.get(type_, 0),
+                        statut=aleatoire.choice(statuts),
+                        diagnostic=aleatoire.choice(DIAGNOSTICS),
+                        date_consultation=maintenant - timedelta(minutes=aleatoire.randint(-60 * 24 * 30, 60 * 24 * 365 * 5)),
+                    )
+                    consultation.date_fin = consultation.date_consultation + consultation.duree
+                    consultations.append(consultation)
+                    avec_ordonnances.append(avec_ordonnance)
+            Consultations.objects.bulk_create(consultations, batch_size=taille_lot)
+            ajouter_consultations(consultations)  # bulk_create : pas de signaux
+
+            # 3. Ordonnances (numérotées par patient, dans l'ordre des consultations)
+            ordonnances, numeros = [], {}
+            for consultation, avec_ordonnance in zip(consultations, avec_ordonnances):
+                if avec_ordonnance:
+                    numeros[consultation.patient_id] = numeros.get(consultation.patient_id, 0) + 1
+                    ordonnances.append(Ordonnance(
+                        patient_id=consultation.patient_id,
+                        consultation=consultation,
+                        numero=numeros[consultation.patient_id],
+                        description=aleatoire.choice(PRESCRIPTIONS),
+                    ))
+            Ordonnance.objects.bulk_create(ordonnances, batch_size=taille_lot)
+
+        inseres += taille
+        if progression:
+            progression(inseres)
+
+    # bulk_create : pas de signaux, listes et totaux en cache invalidés ici
+    for modele in (Patient, Consultations, Ordonnance):
+        invalider(modele)
+
+
+# === MESURES ===
+
+def centile(valeurs, pourcentage):
+    """Centile par rang le plus proche (valeurs non vides)"""
+    valeurs = sorted(valeurs)
+    return valeurs[max(1, math.ceil(pourcentage / 100 * len(valeurs))) - 1]
+
+
+def mesurer(action, repetitions):
+    """
+    Exécute `action(i)` une fois pour chauffer (caches, imports), puis `repetitions` fois
+
+    Returns:
+        dict des latences (ms) et du nombre de requêtes SQL
+    """
+    action(-1)
+    durees, requetes = [], []
+    for i in range(repetitions):
+        with CaptureQueriesContext(connection) as capture:
+            debut = time.perf_counter()
+            action(i)
+            durees.append((time.perf_counter() - debut) * 1000)
+        requetes.append(len(capture))
+    return {
+        'p50_ms': round(statistics.median(durees), 2),
+        'p95_ms': round(centile(durees, 95), 2),
+        'moyenne_ms': round(statistics.mean(durees), 2),
+        'min_ms': round(min(durees), 2),
+        'max_ms': round(max(durees), 2),
+        'requetes': max(requetes),
+        'repetitions': repetitions,
+    }
+
+
+class Scenarios:
+    """Pages et rendus mesurés, avec un utilisateur connecté"""
+
+    # Nombre d'identifiants tirés au hasard d'avance (hors mesure) pour les pages de détail
+    ECHANTILLON = 200
+
+    def __init__(self, graine=42):
+        self.aleatoire = random.Random(graine)
+        utilisateur, _ = User.objects.get_or_create(username='benchmark')
+        self.client = Client()
+        self.client.force_login(utilisateur)
+        self.patients = self.echantillon(Patient)
+        self.ordonnances = self.echantillon(Ordonnance)
+
+    def echantillon(self, modele):
+        """Ids existants tirés au hasard : id tiré entre les bornes, puis première ligne à partir de cet id"""
+        ids = modele.objects.order_by('id').values_list('id', flat=True)
+        premier, dernier = ids.first(), ids.last()
+        if premier is None:
+            return []
+        return [
+            ids.filter(id__gte=self.aleatoire.randint(premier, dernier)).first()
+            for _ in range(self.ECHANTILLON)
+        ]
+
+    def page(self, nom, params=None, ids=None):
+        def action(i):
+            args = [ids[i % len(ids)]] if ids else None
+            response = self.client.get(reverse(nom, args=args), params or {})
+            if response.status_code != 200:
+                raise RuntimeError(f"{nom} : réponse HTTP {response.status_code}")
+        return action
+
+    def rendu_pdf(self, i):
+        ordonnance = Ordonnance.objects.select_related('patient').get(id=self.ordonnances[i % len(self.ordonnances)])
+        OrdonnancePDFGenerator(ordonnance).create_pdf(BytesIO())
+
+    def liste(self):
+        """(nom du scénario, action) ; certains scénarios n'ont de sens qu'avec des données"""
+        scenarios = [
+            ('liste_patients', self.page('liste_patients')),
+            ('liste_patients_recherche', self.page('liste_patients', {'search': 'ben'})),
+            ('liste_consultations', self.page('liste_consultations')),
+            ('liste_consultations_recherche', self.page('liste_consultations', {'search': 'anxieux'})),
+            ('liste_ordonnances', self.page('liste_ordonnances')),
+            ('consultation_form', self.page('ajouter_consultation')),
+        ]
+        if self.patients:
+            scenarios.append(('detail_patient', self.page('detail_patient', ids=self.patients)))
+        if self.ordonnances:
+            scenarios.append(('rendu_pdf_ordonnance', self.rendu_pdf))
+        return scenarios
+
+
+def executer_scenarios(repetitions=30, filtre=None, progression=None):
+    """
+    Returns:
+        dict {scénario: mesures}
+    """
+    resultats = {}
+    for nom, action in Scenarios().liste():
+        if filtre and filtre not in nom:
+            continue
+        resultats[nom] = mesurer(action, repetitions)
+        if progression:
+            progression(nom, resultats[nom])
+    return resultats
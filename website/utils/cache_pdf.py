@@ -0,0 +1,196 @@
+# utils/cache_pdf.py
+"""
+Cache disque des PDF d'ordonnance, adressé par contenu
+La clé est un hash de tout ce qui apparaît dans le PDF (description, numéro,
+nom / âge du patient, date imprimée, images header / footer) : une réimpression
+identique coûte une lecture de fichier au lieu d'un rendu ReportLab.
+- Taille bornée : les fichiers les moins récemment servis sont supprimés (LRU).
+  Le parcours du dossier coûte O(n) : il n'a lieu qu'après l'écriture de PART_AVANT_EVICTION
+  de la taille maximale par le processus, et une seule éviction à la fois (fichier verrou)
+- Invalidation : suppression des fichiers d'une ordonnance modifiée ou supprimée (signals.py)
+- ETag / Last-Modified : le navigateur peut revalider sans retélécharger (304)
+"""
+
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .pdf_generator import OrdonnancePDFGenerator, mtime
+
+
+# À incrémenter quand la mise en page change : les anciens fichiers ne sont plus utilisés
+VERSION_RENDU = 1
+
+# Part de CACHE_PDF_TAILLE_MAX écrite par le processus avant de parcourir le dossier
+PART_AVANT_EVICTION = 0.1
+
+# Verrou d'éviction plus ancien : laissé par un processus interrompu, ignoré
+DUREE_MAX_VERROU = 60
+
+NOM_VERROU = 'eviction.verrou'
+
+_octets_ecrits = 0
+_verrou_compteur = threading.Lock()
+
+
+def dossier_cache():
+    return str(settings.DOSSIER_CACHE_PDF)
+
+
+def cle_pdf(generateur):
+    """Hash des éléments affichés dans le PDF de l'ordonnance"""
+    ordonnance, patient = generateur.ordonnance, generateur.patient
+    elements = [
+        VERSION_RENDU,
+        ordonnance.description,
+        ordonnance.numero,
+        patient.nom,
+        patient.prenom,
+        patient.age,
+        datetime.now().strftime("%d/%m/%Y"),  # date imprimée ("Casablanca le : ...")
+        mtime(generateur.HEADER_IMAGE),
+        mtime(generateur.FOOTER_IMAGE),
+    ]
+    return hashlib.sha256(json.dumps(elements, default=str).encode()).hexdigest()
+
+
+def chemin_cache(ordonnance_id, cle):
+    # L'id en préfixe permet d'invalider tous les fichiers d'une ordonnance
+    return os.path.join(dossier_cache(), f"{ordonnance_id}-{cle}.pdf")
+
+
+def invalider(ordonnance_id):
+    """Supprime les PDF en cache d'une ordonnance"""
+    for chemin in glob.glob(os.path.join(glob.escape(dossier_cache()), f"{ordonnance_id}-*.pdf")):
+        try:
+            os.remove(chemin)
+        except FileNotFoundError:
+            pass
+
+
+def ecrire(generateur, chemin):
+    """Rendu dans un fichier temporaire puis renommage : jamais de fichier à moitié écrit dans le cache"""
+    os.makedirs(dossier_cache(), exist_ok=True)
+    descripteur, temporaire = tempfile.mkstemp(dir=dossier_cache(), suffix='.partiel')
+    try:
+        with os.fdopen(descripteur, 'wb') as fichier:
+            generateur.create_pdf(fichier)
+        os.replace(temporaire, chemin)
+    except BaseException:
+        os.remove(temporaire)
+        raise
+    compter_ecriture(os.path.getsize(chemin))
+
+
+def compter_ecriture(taille):
+    """Éviction seulement quand le processus a écrit PART_AVANT_EVICTION de la taille maximale"""
+    global _octets_ecrits
+    with _verrou_compteur:
+        _octets_ecrits += taille
+        if _octets_ecrits < settings.CACHE_PDF_TAILLE_MAX * PART_AVANT_EVICTION:
+            return
+        _octets_ecrits = 0
+    evincer()
+
+
+def prendre_verrou():
+    """Fichier verrou créé de façon exclusive (portable) ; False si une autre éviction est en cours"""
+    chemin = os.path.join(dossier_cache(), NOM_VERROU)
+    for _ in range(2):
+        try:
+            os.close(os.open(chemin, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            age = time.time() - (mtime(chemin) or time.time())
+            if age < DUREE_MAX_VERROU:
+                return False
+            try:
+                os.remove(chemin)  # verrou abandonné
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def evincer():
+    """
+    Au-delà de settings.CACHE_PDF_TAILLE_MAX, supprime les fichiers les moins récemment servis
+    Sans effet si un autre processus évince déjà
+    """
+    if not prendre_verrou():
+        return
+    try:
+        fichiers = []
+        for entree in os.scandir(dossier_cache()):
+            if entree.name.endswith('.pdf'):
+                infos = entree.stat()
+                fichiers.append((infos.st_atime, infos.st_size, entree.path))
+
+        taille_max = settings.CACHE_PDF_TAILLE_MAX
+        total = sum(taille for _, taille, _ in fichiers)
+        if total <= taille_max:
+            return
+        # On descend à 90 % de la limite pour ne pas évincer à chaque nouveau fichier
+        for _, taille, chemin in sorted(fichiers):
+            if total <= taille_max * 0.9:
+                break
+            try:
+                os.remove(chemin)
+            except FileNotFoundError:
+                pass
+            total -= taille
+    finally:
+        try:
+            os.remove(os.path.join(dossier_cache(), NOM_VERROU))
+        except FileNotFoundError:
+            pass
+
+
+def reponse_pdf(request, ordonnance):
+    """
+    Réponse HTTP du PDF d'une ordonnance, servie depuis le cache (rendu au premier appel)
+    304 si le navigateur a déjà cette version (If-None-Match / If-Modified-Since)
+    """
+    generateur = OrdonnancePDFGenerator(ordonnance)
+    cle = cle_pdf(generateur)
+    chemin = chemin_cache(ordonnance.pk, cle)
+    etag = quote_etag(cle)
+
+    derniere_modification = mtime(chemin)
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(derniere_modification) if derniere_modification else None,
+    )
+
+    if response is None:
+        fichier = None
+        if derniere_modification is not None:
+            try:
+                # Accès explicite (l'atime du système de fichiers n'est pas fiable) : ordre LRU
+                os.utime(chemin, (time.time(), derniere_modification))
+                fichier = open(chemin, 'rb')
+            except FileNotFoundError:
+                pass  # évincé entre-temps
+        if fichier is None:
+            ecrire(generateur, chemin)
+            fichier = open(chemin, 'rb')
+            derniere_modification = mtime(chemin)
+        filename = f"Ordonnance_{generateur.patient.nom}_{ordonnance.numero}.pdf"
+        response = FileResponse(fichier, as_attachment=True, filename=filename, content_type='application/pdf')
+
+    response['ETag'] = etag
+    if derniere_modification:
+        response['Last-Modified'] = http_date(derniere_modification)
+    # Données patient : pas de cache partagé ; le navigateur revalide à chaque impression
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,151 @@
+# utils/cache_versionne.py
+"""
+Cache applicatif à clés versionnées (backend : settings.CACHES)
+- Chaque modèle a un numéro de version en cache ; la clé d'une entrée contient les versions
+  des modèles dont elle dépend (ex. liste des consultations : Consultations et Patient)
+- post_save / post_delete (signals.py) renouvellent la version du modèle : les entrées
+  qui en dépendent ne sont plus jamais lues et expirent d'elles-mêmes, sans recherche
+  des clés à supprimer
+- afragment() : HTML du tableau d'une liste (lignes + pagination) et total, par paramètres d'URL
+- Compteurs hits / misses par espace, exposés sur /metrics (utils/metriques.py)
+- Les versions doivent être partagées par tous les processus (workers, commandes
+  manage.py) : avec un cache mémoire (LocMemCache), propre au processus, une modification
+  faite ailleurs ne serait jamais vue ; le cache applicatif est alors désactivé
+- Clés préfixées par la base de données : la base de benchmark ou de test partage le
+  même backend sans jamais servir les entrées de la base réelle
+Lecture asynchrone (API aget / aset du cache) : les listes sont des vues asynchrones ;
+l'invalidation reste synchrone (signaux).
+"""
+
+import hashlib
+import json
+import uuid
+from functools import partial
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .metriques import registre
+
+
+# Durée de vie (secondes) d'une entrée : l'invalidation passe par les versions,
+# l'expiration ne fait que libérer la place des entrées périmées
+DUREE_CACHE = 3600
+
+# Rendu une fois pour tous les utilisateurs : le jeton CSRF de la requête est substitué à la lecture
+JETON_CSRF = '__jeton_csrf__'
+
+# À incrémenter quand le contenu d'une entrée de afragment() change : les anciennes ne sont plus lues
+VERSION_FRAGMENT = 2
+
+_ABSENT = object()
+
+
+# === VERSIONS ===
+
+def actif():
+    """Cache partagé par tous les processus ? (sinon lecture directe en base)"""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def prefixe():
+    """Base de données courante (la base de test ou de benchmark remplace la base réelle)"""
+    return hashlib.md5(str(connection.settings_dict['NAME']).encode()).hexdigest()[:8]
+
+
+def cle_version(modele):
+    return f'{prefixe()}:version:{modele._meta.label_lower}'
+
+
+def nouvelle_version():
+    # Jeton aléatoire plutôt que compteur : cache.incr lit puis réécrit la valeur sans verrou
+    # (FileBasedCache), deux processus qui invalident en même temps écriraient le même numéro.
+    # Une version évincée du cache ne revient pas non plus à une valeur déjà utilisée
+    return uuid.uuid4().hex
+
+
+async def aversions(modeles):
+    """Versions courantes des modèles, dans l'ordre donné (créées au besoin)"""
+    noms = [cle_version(modele) for modele in modeles]
+    trouvees = await cache.aget_many(noms)
+    manquantes = {nom: nouvelle_version() for nom in noms if nom not in trouvees}
+    if manquantes:
+        await cache.aset_many(manquantes, None)
+        trouvees.update(manquantes)
+    return [trouvees[nom] for nom in noms]
+
+
+def renouveler(modele):
+    if actif():
+        cache.set(cle_version(modele), nouvelle_version(), None)
+
+
+def invalider(modele):
+    """
+    Toutes les entrées qui dépendent de ce modèle deviennent inaccessibles
+    Une seconde fois après le commit : une page lue par une autre requête pendant
+    la transaction (données encore anciennes) ne reste pas en cache
+    """
+    renouveler(modele)
+    transaction.on_commit(partial(renouveler, modele))
+
+
+# === LECTURE ===
+
+async def acle(espace, dependances, parametres):
+    """espace:versions:hash des paramètres (JSON trié : même clé quel que soit l'ordre)"""
+    empreinte = hashlib.md5(json.dumps(parametres, sort_keys=True, default=str).encode()).hexdigest()
+    return f"{prefixe()}:{espace}:{'.'.join(map(str, await aversions(dependances)))}:{empreinte}"
+
+
+async def aobtenir(espace, dependances, parametres, calcul, duree=DUREE_CACHE):
+    """
+    Valeur en cache, ou calcul() (coroutine) mis en cache
+
+    Args:
+        espace: nom de l'entrée (étiquette des compteurs hits / misses)
+        dependances: modèles dont la valeur dépend
+        parametres: tout ce qui fait varier la valeur (sérialisable en JSON)
+    """
+    if not actif():
+        return await calcul()
+    cle_entree = await acle(espace, dependances, parametres)
+    valeur = await cache.aget(cle_entree, _ABSENT)
+    if valeur is not _ABSENT:
+        registre.compter_cache(espace, 'hit')
+        return valeur
+    registre.compter_cache(espace, 'miss')
+    valeur = await calcul()
+    await cache.aset(cle_entree, valeur, duree)
+    return valeur
+
+
+async def afragment(request, espace, dependances, gabarit, nom_page, contexte, preparer):
+    """
+    Tableau d'une liste rendu depuis le cache, par paramètres d'URL et date du jour
+    (âges, filtre "aujourd'hui")
+
+    Args:
+        nom_page: nom de la page de résultats dans le gabarit (ex. 'patients')
+        contexte: reste du contexte du gabarit (filtres)
+        preparer: coroutine () → (page, total) ; attendue seulement si l'entrée manque
+
+    Returns:
+        dict : html (jeton CSRF de la requête en place), total, precision (page.precision_total)
+    """
+    async def calcul():
+        page, total = await preparer()
+        return {
+            'html': render_to_string(gabarit, {**contexte, nom_page: page, 'csrf_token': JETON_CSRF}),
+            'total': total,
+            'precision': page.precision_total,
+        }
+
+    parametres = {'get': sorted(request.GET.lists()), 'jour': timezone.localdate(), 'format': VERSION_FRAGMENT}
+    entree = await aobtenir(espace, dependances, parametres, calcul)
+    return {**entree, 'html': mark_safe(entree['html'].replace(JETON_CSRF, get_token(request)))}
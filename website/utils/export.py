@@ -0,0 +1,55 @@
+# utils/export.py
+"""
+Export CSV en flux (StreamingHttpResponse)
+Chaque ligne est écrite vers le client dès qu'elle est produite :
+la mémoire utilisée ne dépend pas du nombre de lignes exportées.
+"""
+
+import csv
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+# Nombre de lignes lues en base à chaque aller-retour (curseur côté serveur / fetchmany)
+TAILLE_LOT_EXPORT = 2000
+
+
+class Echo:
+    """Pseudo-fichier pour csv.writer : write() renvoie la ligne au lieu de la stocker"""
+
+    def write(self, value):
+        return value
+
+
+def formater_date(valeur):
+    """datetime → "JJ/MM/AAAA HH:MM" (heure locale), date → "JJ/MM/AAAA" """
+    if valeur is None:
+        return ''
+    if hasattr(valeur, 'hour'):
+        return timezone.localtime(valeur).strftime('%d/%m/%Y %H:%M')
+    return valeur.strftime('%d/%m/%Y')
+
+
+def reponse_csv(nom_fichier, entetes, lignes, excel=False):
+    """
+    Construit la réponse HTTP d'un export CSV
+
+    Args:
+        nom_fichier: nom proposé au téléchargement (sans extension)
+        entetes: liste des titres de colonnes
+        lignes: itérable de tuples (idéalement un .iterator() de values_list)
+        excel: True = séparateur ';' et BOM UTF-8, pour une ouverture directe dans Excel (réglages français)
+    """
+    writer = csv.writer(Echo(), delimiter=';' if excel else ',')
+
+    def contenu():
+        if excel:
+            yield '\ufeff'
+        yield writer.writerow(entetes)
+        for ligne in lignes:
+            yield writer.writerow(ligne)
+
+    response = StreamingHttpResponse(contenu(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}.csv"'
+    return response
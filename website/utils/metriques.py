@@ -0,0 +1,121 @@
+# utils/metriques.py
+"""
+Métriques de performance par vue, exposées au format texte Prometheus (/metrics)
+Alimentées par website.middleware.MesuresMiddleware (et utils/cache_versionne.py pour le cache).
+- Histogrammes cumulés depuis le démarrage du processus : Prometheus calcule lui-même
+  les fenêtres glissantes (rate(..._sum[5m]) / rate(..._count[5m]), histogram_quantile)
+- Un registre par processus : avec plusieurs workers, Prometheus doit interroger chacun
+  (ou agréger par instance)
+"""
+
+import threading
+from bisect import bisect_left
+
+
+# Bornes des histogrammes (le seuil +Inf est ajouté à l'export)
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BORNES_REQUETES = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BORNES_TAILLE = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+
+# nom : (description, bornes)
+HISTOGRAMMES = {
+    'patient_app_requete_duree_secondes': ("Durée totale de la requête", BORNES_DUREE),
+    'patient_app_requete_sql_duree_secondes': ("Temps passé en base de données", BORNES_DUREE),
+    'patient_app_requete_sql_requetes': ("Nombre de requêtes SQL", BORNES_REQUETES),
+    'patient_app_requete_gabarit_duree_secondes': ("Temps de rendu des gabarits", BORNES_DUREE),
+    'patient_app_reponse_taille_octets': ("Taille de la réponse (hors réponses en flux)", BORNES_TAILLE),
+}
+
+
+class Histogramme:
+    def __init__(self, bornes):
+        self.bornes = bornes
+        self.compteurs = [0] * (len(bornes) + 1)  # dernier : au-delà de la plus grande borne
+        self.somme = 0
+        self.nombre = 0
+
+    def observer(self, valeur):
+        self.compteurs[bisect_left(self.bornes, valeur)] += 1
+        self.somme += valeur
+        self.nombre += 1
+
+
+class Registre:
+    """
+    Histogrammes par (métrique, vue), compteur des réponses par (vue, classe de statut)
+    et compteur des lectures du cache applicatif par (espace, hit / miss)
+    """
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.vider()
+
+    def vider(self):
+        self.histogrammes = {}
+        self.reponses = {}
+        self.cache = {}
+
+    def enregistrer(self, vue, statut, observations):
+        """
+        Args:
+            vue: nom de la vue (étiquette 'vue')
+            statut: code HTTP de la réponse
+            observations: {nom de l'histogramme: valeur} ; les valeurs None sont ignorées
+        """
+        with self.verrou:
+            for nom, valeur in observations.items():
+                if valeur is None:
+                    continue
+                cle = (nom, vue)
+                if cle not in self.histogrammes:
+                    self.histogrammes[cle] = Histogramme(HISTOGRAMMES[nom][1])
+                self.histogrammes[cle].observer(valeur)
+            cle = (vue, f"{statut // 100}xx")
+            self.reponses[cle] = self.reponses.get(cle, 0) + 1
+
+    def compter_cache(self, espace, resultat):
+        with self.verrou:
+            cle = (espace, resultat)
+            self.cache[cle] = self.cache.get(cle, 0) + 1
+
+    def exporter(self):
+        """Texte au format d'exposition Prometheus (version 0.0.4)"""
+        lignes = []
+        with self.verrou:
+            for nom, (description, bornes) in HISTOGRAMMES.items():
+                lignes.append(f"# HELP {nom} {description}")
+                lignes.append(f"# TYPE {nom} histogram")
+                for (metrique, vue), histogramme in sorted(self.histogrammes.items()):
+                    if metrique != nom:
+                        continue
+                    etiquette = f'vue="{echapper(vue)}"'
+                    cumul = 0
+                    for borne, compteur in zip(bornes + (float('inf'),), histogramme.compteurs):
+                        cumul += compteur
+                        le = '+Inf' if borne == float('inf') else format_nombre(borne)
+                        lignes.append(f'{nom}_bucket{{{etiquette},le="{le}"}} {cumul}')
+                    lignes.append(f'{nom}_sum{{{etiquette}}} {format_nombre(histogramme.somme)}')
+                    lignes.append(f'{nom}_count{{{etiquette}}} {histogramme.nombre}')
+
+            lignes.append("# HELP patient_app_reponses_total Réponses par vue et classe de statut HTTP")
+            lignes.append("# TYPE patient_app_reponses_total counter")
+            for (vue, statut), nombre in sorted(self.reponses.items()):
+                lignes.append(f'patient_app_reponses_total{{vue="{echapper(vue)}",statut="{statut}"}} {nombre}')
+
+            lignes.append("# HELP patient_app_cache_total Lectures du cache applicatif par espace (hit / miss)")
+            lignes.append("# TYPE patient_app_cache_total counter")
+            for (espace, resultat), nombre in sorted(self.cache.items()):
+                lignes.append(f'patient_app_cache_total{{espace="{echapper(espace)}",resultat="{resultat}"}} {nombre}')
+        return '\n'.join(lignes) + '\n'
+
+
+def echapper(valeur):
+    """Échappement d'une valeur d'étiquette Prometheus"""
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_nombre(valeur):
+    return repr(float(valeur)) if isinstance(valeur, float) else str(valeur)
+
+
+registre = Registre()
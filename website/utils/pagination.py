@@ -0,0 +1,225 @@
+# utils/pagination.py
+"""
+Pagination par curseur (keyset / "seek")
+Au lieu de OFFSET N (de plus en plus lent sur les pages lointaines) + COUNT(*) à chaque page,
+on repart de la dernière ligne affichée : WHERE (date, id) < (date_derniere, id_dernier).
+Le total affiché est un COUNT(*) exact mais plafonné à LIMITE_COMPTAGE lignes (affiché "N+"), mis en cache ;
+seul PostgreSQL sans filtre donne une estimation (statistiques du planner, affichée "≈ N").
+Les listes sont des vues asynchrones : aget_page() et apaginer() lisent par l'ORM asynchrone.
+"""
+
+import base64
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+
+from .cache_versionne import aobtenir
+
+
+# Au-delà, le total n'est plus compté : une recherche large ne parcourt pas toute la table
+LIMITE_COMPTAGE = 10000
+
+# Précision du total renvoyé par apaginer() (page.precision_total)
+TOTAL_EXACT = 'exact'
+TOTAL_PLAFONNE = 'plafonne'   # au moins LIMITE_COMPTAGE lignes
+TOTAL_ESTIME = 'estime'       # statistiques du planner PostgreSQL
+
+
+def encoder_curseur(sens, valeur, pk):
+    """('suivant', datetime, 42) → jeton opaque pour l'URL"""
+    brut = json.dumps([sens, valeur.isoformat(), pk])
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(jeton):
+    """Jeton opaque → (sens, valeur_texte, pk), ou None si le jeton est invalide"""
+    try:
+        brut = base64.urlsafe_b64decode(jeton + '=' * (-len(jeton) % 4))
+        sens, valeur, pk = json.loads(brut)
+    except (ValueError, TypeError):
+        return None
+    # pk hors des entiers SQL 64 bits : erreur de la base à l'exécution
+    if sens not in ('suivant', 'precedent') or not isinstance(pk, int) or not 0 <= pk < 2 ** 63:
+        return None
+    return sens, valeur, pk
+
+
+class PageCurseur:
+    """
+    Une page de résultats paginée par curseur
+    S'utilise dans les templates comme une Page classique (itération, has_next, has_previous)
+    """
+    est_curseur = True
+
+    def __init__(self, object_list, has_next, has_previous, curseur_suivant, curseur_precedent):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.curseur_suivant = curseur_suivant
+        self.curseur_precedent = curseur_precedent
+        self.parametres = ''  # autres paramètres de l'URL (recherche, filtres) à conserver
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class PaginatorCurseur:
+    """
+    Pagine un queryset trié sur (champ, id)
+
+    Args:
+        queryset: queryset déjà filtré (l'ordre est imposé par le paginator)
+        par_page: nombre de lignes par page
+        champ: champ de tri, ex. 'date_creation' (index (champ, id) conseillé)
+        descendant: True = du plus récent au plus ancien
+    """
+
+    def __init__(self, queryset, par_page, champ, descendant=True):
+        self.queryset = queryset
+        self.par_page = par_page
+        self.champ = champ
+        self.descendant = descendant
+
+    def _ordre(self, inverse=False):
+        desc = self.descendant != inverse
+        signe = '-' if desc else ''
+        return [f'{signe}{self.champ}', f'{signe}id']
+
+    def _apres(self, valeur, pk, inverse=False):
+        """Lignes situées après (valeur, pk) dans l'ordre de lecture"""
+        comparaison = 'lt' if self.descendant != inverse else 'gt'
+        return (
+            Q(**{f'{self.champ}__{comparaison}': valeur}) |
+            Q(**{self.champ: valeur, f'id__{comparaison}': pk})
+        )
+
+    def _jeton(self, sens, objet):
+        return encoder_curseur(sens, getattr(objet, self.champ), objet.pk)
+
+    def _requete(self, jeton):
+        """(queryset de la page + 1 ligne, curseur décodé, sens de lecture)"""
+        curseur = decoder_curseur(jeton) if jeton else None
+        sens = 'suivant'
+        queryset = self.queryset.order_by(*self._ordre())
+
+        if curseur:
+            sens, valeur, pk = curseur
+            try:
+                valeur = self.queryset.model._meta.get_field(self.champ).to_python(valeur)
+            except (ValidationError, ValueError, TypeError):
+                valeur = None
+            if valeur is None:
+                # Jeton bien formé mais valeur inutilisable (lien modifié) : première page
+                return queryset[:self.par_page + 1], None, 'suivant'
+            if sens == 'precedent':
+                # On lit à l'envers à partir du curseur, puis on remet dans l'ordre
+                queryset = self.queryset.order_by(*self._ordre(inverse=True))
+                queryset = queryset.filter(self._apres(valeur, pk, inverse=True))
+            else:
+                queryset = queryset.filter(self._apres(valeur, pk))
+
+        # Une ligne de plus pour savoir s'il existe une page après celle-ci
+        return queryset[:self.par_page + 1], curseur, sens
+
+    def _page(self, lignes, curseur, sens):
+        encore = len(lignes) > self.par_page
+        lignes = lignes[:self.par_page]
+
+        if sens == 'precedent':
+            lignes.reverse()
+            has_previous, has_next = encore, True
+        else:
+            has_previous, has_next = curseur is not None, encore
+
+        return PageCurseur(
+            lignes,
+            has_next=has_next,
+            has_previous=has_previous,
+            curseur_suivant=self._jeton('suivant', lignes[-1]) if has_next and lignes else None,
+            curseur_precedent=self._jeton('precedent', lignes[0]) if has_previous and lignes else None,
+        )
+
+    def get_page(self, jeton=None):
+        queryset, curseur, sens = self._requete(jeton)
+        return self._page(list(queryset), curseur, sens)
+
+    async def aget_page(self, jeton=None):
+        """get_page() pour les vues asynchrones (itération asynchrone de l'ORM)"""
+        queryset, curseur, sens = self._requete(jeton)
+        return self._page([ligne async for ligne in queryset], curseur, sens)
+
+
+def reltuples(table):
+    """PostgreSQL : nombre de lignes estimé par le planner, sans parcourir la table (None si inconnu)"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        ligne = cursor.fetchone()
+    return ligne[0] if ligne and ligne[0] >= 0 else None
+
+
+async def aestimer_total(queryset, dependances=None):
+    """
+    Nombre de lignes du queryset, sans jamais compter plus de LIMITE_COMPTAGE lignes
+    - PostgreSQL sans filtre : statistiques du planner (pg_class.reltuples), sans parcourir la table
+    - Sinon : COUNT(*) exact sur au plus LIMITE_COMPTAGE + 1 lignes, mis en cache par requête SQL
+      jusqu'à la prochaine modification du modèle ou des dépendances (ex. Patient pour une
+      recherche de consultations par nom)
+
+    Returns:
+        (total, précision) : TOTAL_EXACT, TOTAL_PLAFONNE (total = LIMITE_COMPTAGE) ou TOTAL_ESTIME
+    """
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        total = await sync_to_async(reltuples)(queryset.model._meta.db_table)
+        if total is not None:
+            return total, TOTAL_ESTIME
+
+    queryset = queryset.order_by()
+    sql, params = queryset.query.sql_with_params()
+    dependances = dependances or [queryset.model]
+    total = await aobtenir('total', dependances, [sql, params, LIMITE_COMPTAGE], queryset[:LIMITE_COMPTAGE + 1].acount)
+    if total > LIMITE_COMPTAGE:
+        return LIMITE_COMPTAGE, TOTAL_PLAFONNE
+    return total, TOTAL_EXACT
+
+
+async def apaginer(request, queryset, par_page, champ, descendant=True, curseur_possible=True, dependances=None):
+    """
+    Pagine une liste pour une vue (asynchrone)
+    - par défaut : pagination par curseur (?curseur=...) + total plafonné (aestimer_total)
+    - ?page=N (anciens liens) ou tri non compatible (ex. par pertinence) : Paginator classique + total exact
+    dependances : modèles dont dépend le total en cache (par défaut : celui du queryset)
+    La précision du total est dans page.precision_total
+
+    Returns:
+        (page, total)
+    """
+    if curseur_possible and not request.GET.get('page'):
+        page = await PaginatorCurseur(queryset, par_page, champ, descendant).aget_page(request.GET.get('curseur'))
+        parametres = request.GET.copy()
+        parametres.pop('curseur', None)
+        page.parametres = parametres.urlencode()
+        total, page.precision_total = await aestimer_total(queryset, dependances)
+        return page, total
+
+    paginator = Paginator(queryset, par_page)
+    paginator.count = await queryset.acount()  # remplace la propriété, qui compterait en synchrone
+    page = paginator.get_page(request.GET.get('page'))
+    page.object_list = [ligne async for ligne in page.object_list]
+    page.precision_total = TOTAL_EXACT
+    return page, paginator.count
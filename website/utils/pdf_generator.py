@@ -5,11 +5,13 @@ Utilise ReportLab pour créer des PDFs selon les spécifications exactes
 """
 
 import os
+import tempfile
+import threading
+import zipfile
 from datetime import datetime
-from io import BytesIO
 
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.lib.colors import black
@@ -19,48 +21,28 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.pdfgen import canvas
 from reportlab.platypus import PageBreak
+from reportlab.platypus.doctemplate import ActionFlowable
 from reportlab.lib.utils import ImageReader
 
 
-class OrdonnancePDFGenerator:
+# Nom du form XObject (header, footer, lignes) : dessiné une fois par document, réutilisé sur chaque page
+NOM_CADRE = 'cadreOrdonnance'
+
+
+def mtime(chemin):
+    try:
+        return os.path.getmtime(chemin)
+    except OSError:
+        return None
+
+
+class RessourcesPDF:
     """
-    Classe principale pour générer les PDFs d'ordonnance
-    Respecte exactement les spécifications fournies
+    Styles de texte et images d'en-tête / pied de page, préparés UNE fois
+    puis partagés par tous les rendus (voir ressources_partagees)
     """
-    
-    def __init__(self, ordonnance):
-        """
-        Initialise le générateur avec une ordonnance
-        
-        Args:
-            ordonnance: Instance du modèle Ordonnance
-        """
-        self.ordonnance = ordonnance
-        self.patient = ordonnance.patient
-        
-        # === CONSTANTES DE MISE EN PAGE (selon spécifications) ===
-        self.PAGE_WIDTH = 210 * mm   # A4 largeur
-        self.PAGE_HEIGHT = 297 * mm  # A4 hauteur
-        
-        # Marges (spécifications exactes)
-        self.MARGE_GAUCHE = 15 * mm
-        self.MARGE_DROITE = 15 * mm  
-        self.MARGE_HAUTE = 12 * mm
-        self.MARGE_BASSE = 12 * mm
-        
-        # Largeur utile calculée
-        self.LARGEUR_UTILE = self.PAGE_WIDTH - 30 * mm
-        
-        # Dimensions des zones (selon spécifications)
-        self.HAUTEUR_HEADER = 30 * mm
-        self.HAUTEUR_FOOTER = 20 * mm
-        self.ESPACEMENT_LIGNES = 3 * mm
-        
-        # Chemins des images (à adapter selon votre structure)
-        self.HEADER_IMAGE = os.path.join(settings.STATIC_ROOT or settings.STATICFILES_DIRS[0], 'images', 'entete.png')
-        self.FOOTER_IMAGE = os.path.join(settings.STATIC_ROOT or settings.STATICFILES_DIRS[0], 'images', 'bas.png')
-    
-    def create_styles(self):
+
+    def __init__(self, header_path, footer_path):
         """
         Crée les styles de texte selon les spécifications
         Police: Helvetica 11pt, interligne 14pt
@@ -82,6 +64,13 @@ class OrdonnancePDFGenerator:
             textColor=black
         )
         
+        # Sous-ligne indentée de 6mm (selon spécifications)
+        self.style_sous_ligne = ParagraphStyle(
+            'SousLigne',
+            parent=self.style_description,
+            leftIndent=6 * mm
+        )
+        
         # Style pour les informations patient (centré)
         self.style_info_centree = ParagraphStyle(
             'InfoCentree',
@@ -103,21 +92,121 @@ class OrdonnancePDFGenerator:
             alignment=TA_LEFT,
             textColor=black
         )
+        
+        # Images décodées une seule fois (au lieu d'un accès disque à chaque page).
+        # API publique de ReportLab seulement : drawImage les encode une fois par document
+        # (même image → même objet PDF) et le cadre (form XObject) ne les dessine qu'une fois
+        self.header_image, self.header_erreur = self.charger_image(header_path)
+        self.footer_image, self.footer_erreur = self.charger_image(footer_path)
+    
+    @staticmethod
+    def charger_image(chemin):
+        """
+        Returns:
+            (ImageReader décodé ou None, erreur éventuelle)
+        """
+        if not os.path.exists(chemin):
+            return None, None
+        try:
+            image = ImageReader(chemin)
+            image.getRGBData()  # forcer le décodage maintenant
+            return image, None
+        except Exception as e:
+            return None, e
+
+
+# === REGISTRE DU PROCESSUS ===
+# Une seule instance de RessourcesPDF par processus, partagée par tous les rendus
+# (reconstruite uniquement si une image header / footer change sur le disque)
+
+_ressources = {}
+_verrou_ressources = threading.Lock()
+
+
+def ressources_partagees(header_path, footer_path):
+    cle = (header_path, mtime(header_path), footer_path, mtime(footer_path))
+    ressources = _ressources.get(cle)
+    if ressources is None:
+        with _verrou_ressources:
+            ressources = _ressources.get(cle)
+            if ressources is None:
+                _ressources.clear()
+                ressources = _ressources[cle] = RessourcesPDF(header_path, footer_path)
+    return ressources
+
+
+class OrdonnancePDFGenerator:
+    """
+    Classe principale pour générer les PDFs d'ordonnance
+    Respecte exactement les spécifications fournies
+    """
+    
+    # === CONSTANTES DE MISE EN PAGE (selon spécifications) ===
+    # Calculées une fois à l'import, communes à toutes les instances
+    PAGE_WIDTH = 210 * mm   # A4 largeur
+    PAGE_HEIGHT = 297 * mm  # A4 hauteur
+    
+    # Marges (spécifications exactes)
+    MARGE_GAUCHE = 15 * mm
+    MARGE_DROITE = 15 * mm
+    MARGE_HAUTE = 12 * mm
+    MARGE_BASSE = 12 * mm
+    
+    # Largeur utile calculée
+    LARGEUR_UTILE = PAGE_WIDTH - 30 * mm
+    
+    # Dimensions des zones (selon spécifications)
+    HAUTEUR_HEADER = 30 * mm
+    HAUTEUR_FOOTER = 20 * mm
+    ESPACEMENT_LIGNES = 3 * mm
+    
+    # Coordonnées des éléments fixes
+    Y_HEADER_BOTTOM = PAGE_HEIGHT - MARGE_HAUTE - HAUTEUR_HEADER
+    Y_HEADER_SEP = Y_HEADER_BOTTOM - ESPACEMENT_LIGNES
+    Y_FOOTER_SEP = MARGE_BASSE + HAUTEUR_FOOTER + ESPACEMENT_LIGNES
+    
+    # Espace réservé en haut de la première page : header + ligne + infos patient
+    ESPACE_APRES_HEADER = HAUTEUR_HEADER + ESPACEMENT_LIGNES + 8 * mm + 7 * mm + 6 * mm + 6 * mm
+    
+    def __init__(self, ordonnance, ressources=None):
+        """
+        Initialise le générateur avec une ordonnance
+        
+        Args:
+            ordonnance: Instance du modèle Ordonnance
+            ressources: RessourcesPDF à utiliser (optionnel, sinon celles du processus)
+        """
+        self.ordonnance = ordonnance
+        self.patient = ordonnance.patient
+        self.ressources = ressources
+        
+        # Chemins des images (à adapter selon votre structure)
+        self.HEADER_IMAGE = os.path.join(settings.STATIC_ROOT or settings.STATICFILES_DIRS[0], 'images', 'entete.png')
+        self.FOOTER_IMAGE = os.path.join(settings.STATIC_ROOT or settings.STATICFILES_DIRS[0], 'images', 'bas.png')
+    
+    def create_styles(self):
+        """
+        Récupère les styles de texte (et les images) depuis les ressources partagées
+        Police: Helvetica 11pt, interligne 14pt
+        """
+        if self.ressources is None:
+            self.ressources = ressources_partagees(self.HEADER_IMAGE, self.FOOTER_IMAGE)
+        
+        self.style_description = self.ressources.style_description
+        self.style_sous_ligne = self.ressources.style_sous_ligne
+        self.style_info_centree = self.ressources.style_info_centree
+        self.style_info_gauche = self.ressources.style_info_gauche
     
     def generate_pdf_response(self):
         """
         Génère le PDF et retourne une HttpResponse
         Méthode principale à appeler depuis la vue
         """
-        # Créer un buffer en mémoire
-        buffer = BytesIO()
-        
-        # Générer le PDF dans le buffer
-        self.create_pdf(buffer)
-        
-        # Préparer la réponse HTTP
-        buffer.seek(0)
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+        # ReportLab écrit le document en une fois dans la réponse (objet fichier) :
+        # pas de buffer intermédiaire ni de copie via getvalue()
+        response = HttpResponse(content_type='application/pdf')
+        self.create_pdf(response)
+        response['Content-Length'] = len(response.content)
         
         # Nom du fichier (pour le téléchargement)
         filename = f"Ordonnance_{self.patient.nom}_{self.ordonnance.numero}.pdf"
@@ -157,12 +246,8 @@ class OrdonnancePDFGenerator:
         """
         story = []
         
-        # === ESPACEMENTS CALCULÉS (selon spécifications) ===
-        # Espace après header + ligne + infos patient
-        espace_apres_header = self.HAUTEUR_HEADER + self.ESPACEMENT_LIGNES + 8 * mm + 7 * mm + 6 * mm + 6 * mm
-        
-        # Ajouter l'espacement initial
-        story.append(Spacer(1, espace_apres_header))
+        # Ajouter l'espacement initial (header + ligne + infos patient)
+        story.append(Spacer(1, self.ESPACE_APRES_HEADER))
         
         # === TRAITEMENT DE LA DESCRIPTION ===
         description_lines = self.format_description()
@@ -176,11 +261,7 @@ class OrdonnancePDFGenerator:
                 # Style avec indentation pour les sous-lignes
                 if line.startswith('- '):
                     # Sous-ligne indentée de 6mm (selon spécifications)
-                    style = ParagraphStyle(
-                        'SousLigne',
-                        parent=self.style_description,
-                        leftIndent=6 * mm
-                    )
+                    style = self.style_sous_ligne
                 else:
                     style = self.style_description
                 
@@ -220,61 +301,67 @@ class OrdonnancePDFGenerator:
         Dessine les éléments fixes de chaque page (header, footer, lignes)
         Cette méthode est appelée pour chaque page
         """
-        # === COORDONNÉES CALCULÉES ===
-        y_header_top = self.PAGE_HEIGHT - self.MARGE_HAUTE
-        y_header_bottom = y_header_top - self.HAUTEUR_HEADER
-        y_header_sep = y_header_bottom - self.ESPACEMENT_LIGNES
-        
-        y_footer_top = self.MARGE_BASSE + self.HAUTEUR_FOOTER
-        y_footer_sep = y_footer_top + self.ESPACEMENT_LIGNES
+        self.dessiner_page(canvas_obj, premiere_page=canvas_obj.getPageNumber() == 1)
+    
+    def dessiner_page(self, canvas_obj, premiere_page):
+        """
+        Header, footer et lignes séparatrices ; infos patient si c'est la première page de l'ordonnance
+        """
+        # Éléments fixes : form XObject créé à la première page du document, puis simplement référencé
+        if not canvas_obj.hasForm(NOM_CADRE):
+            canvas_obj.beginForm(NOM_CADRE)
+            self.dessiner_cadre(canvas_obj)
+            canvas_obj.endForm()
+        canvas_obj.doForm(NOM_CADRE)
         
+        # === INFORMATIONS PATIENT (uniquement sur la première page) ===
+        if premiere_page:
+            self.draw_patient_info(canvas_obj, self.Y_HEADER_SEP)
+    
+    def dessiner_cadre(self, canvas_obj):
+        """
+        Header, footer et lignes séparatrices (identiques sur toutes les pages)
+        """
         # === DESSINER LE HEADER ===
-        if os.path.exists(self.HEADER_IMAGE):
-            try:
-                canvas_obj.drawImage(
-                    self.HEADER_IMAGE,
-                    self.MARGE_GAUCHE,
-                    y_header_bottom,
-                    width=self.LARGEUR_UTILE,
-                    height=self.HAUTEUR_HEADER,
-                    preserveAspectRatio=True,
-                    anchor='sw'
-                )
-            except Exception as e:
-                # Si l'image ne peut pas être chargée, dessiner un rectangle
-                canvas_obj.setFillColor(black)
-                canvas_obj.rect(self.MARGE_GAUCHE, y_header_bottom, self.LARGEUR_UTILE, self.HAUTEUR_HEADER)
-                canvas_obj.drawString(self.MARGE_GAUCHE + 10, y_header_bottom + 10, f"Header manquant: {e}")
+        self.dessiner_image(
+            canvas_obj, self.ressources.header_image, self.ressources.header_erreur,
+            self.Y_HEADER_BOTTOM, self.HAUTEUR_HEADER, "Header manquant"
+        )
         
         # === LIGNE SÉPARATRICE HEADER ===
         canvas_obj.setStrokeColor(black)
         canvas_obj.setLineWidth(1)
-        canvas_obj.line(self.MARGE_GAUCHE, y_header_sep, self.PAGE_WIDTH - self.MARGE_DROITE, y_header_sep)
-        
-        # === INFORMATIONS PATIENT (uniquement sur la première page) ===
-        if canvas_obj.getPageNumber() == 1:
-            self.draw_patient_info(canvas_obj, y_header_sep)
+        canvas_obj.line(self.MARGE_GAUCHE, self.Y_HEADER_SEP, self.PAGE_WIDTH - self.MARGE_DROITE, self.Y_HEADER_SEP)
         
         # === DESSINER LE FOOTER ===
-        if os.path.exists(self.FOOTER_IMAGE):
+        self.dessiner_image(
+            canvas_obj, self.ressources.footer_image, self.ressources.footer_erreur,
+            self.MARGE_BASSE, self.HAUTEUR_FOOTER, "Footer manquant"
+        )
+        
+        # === LIGNE SÉPARATRICE FOOTER ===
+        canvas_obj.line(self.MARGE_GAUCHE, self.Y_FOOTER_SEP, self.PAGE_WIDTH - self.MARGE_DROITE, self.Y_FOOTER_SEP)
+    
+    def dessiner_image(self, canvas_obj, image, erreur, y, hauteur, message):
+        """Image header / footer sur toute la largeur utile ; rectangle + message si elle n'a pas pu être chargée"""
+        if image is not None:
             try:
                 canvas_obj.drawImage(
-                    self.FOOTER_IMAGE,
+                    image,
                     self.MARGE_GAUCHE,
-                    self.MARGE_BASSE,
+                    y,
                     width=self.LARGEUR_UTILE,
-                    height=self.HAUTEUR_FOOTER,
+                    height=hauteur,
                     preserveAspectRatio=True,
                     anchor='sw'
                 )
+                return
             except Exception as e:
-                # Si l'image ne peut pas être chargée
-                canvas_obj.setFillColor(black)
-                canvas_obj.rect(self.MARGE_GAUCHE, self.MARGE_BASSE, self.LARGEUR_UTILE, self.HAUTEUR_FOOTER)
-                canvas_obj.drawString(self.MARGE_GAUCHE + 10, self.MARGE_BASSE + 10, f"Footer manquant: {e}")
-        
-        # === LIGNE SÉPARATRICE FOOTER ===
-        canvas_obj.line(self.MARGE_GAUCHE, y_footer_sep, self.PAGE_WIDTH - self.MARGE_DROITE, y_footer_sep)
+                erreur = e
+        if erreur is not None:
+            canvas_obj.setFillColor(black)
+            canvas_obj.rect(self.MARGE_GAUCHE, y, self.LARGEUR_UTILE, hauteur)
+            canvas_obj.drawString(self.MARGE_GAUCHE + 10, y + 10, f"{message}: {erreur}")
     
     def draw_patient_info(self, canvas_obj, y_header_sep):
         """
@@ -309,4 +396,148 @@ class OrdonnancePDFGenerator:
         
         # === LIGNE SÉPARATRICE DES INFOS ===
         y_ligne_sep = y_ligne2 - 6 * mm
-        canvas_obj.line(self.MARGE_GAUCHE, y_ligne_sep, self.PAGE_WIDTH - self.MARGE_DROITE, y_ligne_sep)
\ No newline at end of file
+        canvas_obj.line(self.MARGE_GAUCHE, y_ligne_sep, self.PAGE_WIDTH - self.MARGE_DROITE, y_ligne_sep)
+
+
+#-----------------------IMPRESSION PAR LOT--------------------------------------------------------------------------------
+
+# Au-delà de cette taille, le PDF fusionné passe de la mémoire à un fichier temporaire
+TAILLE_MAX_MEMOIRE_LOT = 10 * 1024 * 1024
+
+
+class DebutOrdonnance(ActionFlowable):
+    """
+    Marqueur placé dans le contenu d'un lot, juste avant le saut de page :
+    la page suivante appartient à une nouvelle ordonnance (header, infos patient)
+    """
+
+    def __init__(self, generateur):
+        super().__init__()
+        self.generateur = generateur
+
+    def apply(self, doc):
+        doc.generateur_courant = self.generateur
+        doc.nouvelle_ordonnance = True
+
+
+class FluxZip:
+    """
+    Pseudo-fichier (non positionnable) pour zipfile.ZipFile :
+    les octets écrits sont récupérés par vider() et envoyés au client au fur et à mesure,
+    sans être recopiés dans un buffer
+    """
+
+    def __init__(self):
+        self.morceaux = []
+
+    def write(self, donnees):
+        self.morceaux.append(donnees if isinstance(donnees, bytes) else bytes(donnees))
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        morceaux, self.morceaux = self.morceaux, []
+        return morceaux
+
+
+class OrdonnancesLotPDFGenerator:
+    """
+    Impression de plusieurs ordonnances en une seule requête
+    (ex. toutes les ordonnances de la journée)
+    Styles et images header/footer sont préparés une seule fois pour tout le lot.
+    """
+
+    def __init__(self, ordonnances, nom_fichier="Ordonnances"):
+        """
+        Args:
+            ordonnances: queryset d'ordonnances (select_related('patient') conseillé) ou liste déjà chargée
+            nom_fichier: nom proposé au téléchargement (sans extension)
+        """
+        self.ordonnances = ordonnances
+        self.nom_fichier = nom_fichier
+
+    def generateurs(self):
+        """Un OrdonnancePDFGenerator par ordonnance (ressources du processus)"""
+        ordonnances = self.ordonnances
+        if hasattr(ordonnances, 'iterator'):
+            ordonnances = ordonnances.iterator(chunk_size=100)
+        for ordonnance in ordonnances:
+            generateur = OrdonnancePDFGenerator(ordonnance)
+            generateur.create_styles()
+            yield generateur
+
+    # === PDF FUSIONNÉ ===
+
+    def create_pdf(self, buffer):
+        """
+        Écrit toutes les ordonnances dans un seul PDF : chacune commence sur une nouvelle page
+        
+        Returns:
+            nombre d'ordonnances imprimées
+        """
+        story = []
+        premier = None
+        nombre = 0
+        for generateur in self.generateurs():
+            nombre += 1
+            if premier is None:
+                premier = generateur
+            else:
+                story.append(DebutOrdonnance(generateur))
+                story.append(PageBreak())
+            story.extend(generateur.build_content())
+
+        if premier is None:
+            return 0
+
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            leftMargin=premier.MARGE_GAUCHE,
+            rightMargin=premier.MARGE_DROITE,
+            topMargin=premier.MARGE_HAUTE,
+            bottomMargin=premier.MARGE_BASSE
+        )
+        doc.generateur_courant = premier
+        doc.nouvelle_ordonnance = True
+        doc.build(story, onFirstPage=self.draw_page, onLaterPages=self.draw_page)
+        return nombre
+
+    def draw_page(self, canvas_obj, doc):
+        """Header / footer de chaque page ; infos patient sur la première page de chaque ordonnance"""
+        doc.generateur_courant.dessiner_page(canvas_obj, premiere_page=doc.nouvelle_ordonnance)
+        doc.nouvelle_ordonnance = False
+
+    def pdf_response(self):
+        """
+        PDF fusionné, envoyé par morceaux depuis un fichier temporaire
+        (en mémoire pour les petits lots, sur disque au-delà de TAILLE_MAX_MEMOIRE_LOT)
+        """
+        fichier = tempfile.SpooledTemporaryFile(max_size=TAILLE_MAX_MEMOIRE_LOT)
+        self.create_pdf(fichier)
+        fichier.seek(0)
+        return FileResponse(
+            fichier, as_attachment=True, filename=f"{self.nom_fichier}.pdf", content_type='application/pdf'
+        )
+
+    # === ARCHIVE ZIP (un PDF par ordonnance) ===
+
+    def contenu_zip(self):
+        """Octets de l'archive, produits ordonnance par ordonnance"""
+        flux = FluxZip()
+        # Les PDF sont déjà compressés : pas de recompression
+        with zipfile.ZipFile(flux, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for generateur in self.generateurs():
+                nom = f"Ordonnance_{generateur.patient.nom}_{generateur.ordonnance.numero}_{generateur.ordonnance.pk}.pdf"
+                # ReportLab écrit directement dans l'entrée de l'archive
+                with archive.open(nom, 'w') as entree:
+                    generateur.create_pdf(entree)
+                yield from flux.vider()
+        yield from flux.vider()
+
+    def zip_response(self):
+        response = StreamingHttpResponse(self.contenu_zip(), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{self.nom_fichier}.zip"'
+        return response
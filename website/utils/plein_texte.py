@@ -0,0 +1,150 @@
+# utils/plein_texte.py
+"""
+Recherche plein texte sur les champs libres (diagnostic des consultations,
+description des ordonnances)
+- SQLite : table virtuelle FTS5 tenue à jour par des triggers (migration 0013)
+- PostgreSQL : index GIN sur to_tsvector('french', ...)
+- Autres moteurs : repli sur icontains
+Les résultats sont annotés avec une 'pertinence' (plus grand = plus pertinent).
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q, FloatField, Value
+from django.db.models.expressions import RawSQL
+
+
+# Configuration linguistique PostgreSQL (accents et pluriels français)
+CONFIG_POSTGRES = 'french'
+
+# Champs indexés en plein texte : (table, champ)
+CHAMPS_INDEXES = [
+    ('website_consultations', 'diagnostic'),
+    ('website_ordonnance', 'description'),
+]
+
+
+def nom_table_fts(table, champ):
+    """website_consultations + diagnostic → website_consultations_diagnostic_fts"""
+    return f'{table}_{champ}_fts'
+
+
+def extraire_mots(texte):
+    """Mots de la saisie, sans ponctuation ni opérateurs"""
+    return re.findall(r'\w+', texte or '')
+
+
+def requete_fts5(mots):
+    """
+    ["hyper", "arterielle"] → '"hyper"* "arterielle"*'
+    Chaque mot est une recherche par préfixe, tous les mots doivent être présents.
+    """
+    return ' '.join('"{}"*'.format(mot.replace('"', '""')) for mot in mots)
+
+
+def recherche_plein_texte(queryset, champ, texte):
+    """
+    Prépare une recherche plein texte sur `champ`.
+
+    Args:
+        queryset: queryset du modèle à filtrer
+        champ: nom du champ texte indexé (ex. 'diagnostic')
+        texte: saisie de l'utilisateur
+
+    Returns:
+        (queryset annoté avec 'pertinence', condition Q des lignes correspondantes)
+        La condition est à combiner par l'appelant (ex. avec une recherche sur le patient).
+    """
+    mots = extraire_mots(texte)
+    if not mots:
+        return queryset.annotate(pertinence=Value(None, output_field=FloatField())), Q(pk__in=[])
+
+    table = queryset.model._meta.db_table
+
+    if connection.vendor == 'sqlite':
+        fts = connection.ops.quote_name(nom_table_fts(table, champ))
+        expression = requete_fts5(mots)
+        # rank = score bm25 (négatif : plus petit = plus pertinent)
+        # La sous-requête dérivée (LIMIT -1 : non aplatie) évalue le MATCH une seule fois, avec un
+        # index automatique sur rowid ; un MATCH corrélé par ligne coûte ~0,15 ms par résultat.
+        pertinence = RawSQL(
+            f'SELECT -r.rank FROM (SELECT rowid, rank FROM {fts} WHERE {fts} MATCH %s LIMIT -1) r '
+            f'WHERE r.rowid = {connection.ops.quote_name(table)}.id',
+            [expression],
+            output_field=FloatField(),
+        )
+        correspondances = RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [expression])
+        return queryset.annotate(pertinence=pertinence), Q(pk__in=correspondances)
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        # Même expression que l'index GIN de la migration 0013
+        vecteur = SearchVector(champ, config=CONFIG_POSTGRES)
+        requete = SearchQuery(' & '.join(f'{mot}:*' for mot in mots), config=CONFIG_POSTGRES, search_type='raw')
+        queryset = queryset.annotate(document=vecteur, pertinence=SearchRank(vecteur, requete))
+        return queryset, Q(document=requete)
+
+    # Repli : pas d'index plein texte disponible
+    condition = Q()
+    for mot in mots:
+        condition &= Q(**{f'{champ}__icontains': mot})
+    return queryset.annotate(pertinence=Value(None, output_field=FloatField())), condition
+
+
+# === CRÉATION DES INDEX (utilisé par la migration 0013) ===
+# SQLite : à relancer (supprimer puis créer) après toute migration qui reconstruit une table
+# indexée, ex. ajout d'une colonne auto_now (migration 0020) : les triggers sont perdus
+
+def creer_index_plein_texte(schema_editor):
+    vendor = schema_editor.connection.vendor
+    quote = schema_editor.quote_name
+
+    for table, champ in CHAMPS_INDEXES:
+        fts = nom_table_fts(table, champ)
+
+        if vendor == 'sqlite':
+            # Table FTS5 "external content" : elle ne stocke que l'index, le texte reste dans la table d'origine
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {quote(fts)} USING fts5("
+                f"{quote(champ)}, content={quote(table)}, content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER {quote(fts + '_ai')} AFTER INSERT ON {quote(table)} BEGIN "
+                f"INSERT INTO {quote(fts)}(rowid, {quote(champ)}) VALUES (new.id, new.{quote(champ)}); END"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER {quote(fts + '_ad')} AFTER DELETE ON {quote(table)} BEGIN "
+                f"INSERT INTO {quote(fts)}({quote(fts)}, rowid, {quote(champ)}) VALUES ('delete', old.id, old.{quote(champ)}); END"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER {quote(fts + '_au')} AFTER UPDATE OF {quote(champ)} ON {quote(table)} BEGIN "
+                f"INSERT INTO {quote(fts)}({quote(fts)}, rowid, {quote(champ)}) VALUES ('delete', old.id, old.{quote(champ)}); "
+                f"INSERT INTO {quote(fts)}(rowid, {quote(champ)}) VALUES (new.id, new.{quote(champ)}); END"
+            )
+            # Indexer les lignes déjà présentes
+            schema_editor.execute(f"INSERT INTO {quote(fts)}({quote(fts)}) VALUES ('rebuild')")
+
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f"CREATE INDEX {quote(fts)} ON {quote(table)} USING GIN "
+                f"(to_tsvector('{CONFIG_POSTGRES}'::regconfig, COALESCE({quote(champ)}, '')))"
+            )
+
+
+def supprimer_index_plein_texte(schema_editor):
+    vendor = schema_editor.connection.vendor
+    quote = schema_editor.quote_name
+
+    for table, champ in CHAMPS_INDEXES:
+        fts = nom_table_fts(table, champ)
+
+        if vendor == 'sqlite':
+            for suffixe in ('_ai', '_ad', '_au'):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {quote(fts + suffixe)}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {quote(fts)}")
+
+        elif vendor == 'postgresql':
+            schema_editor.execute(f"DROP INDEX IF EXISTS {quote(fts)}")
@@ -0,0 +1,86 @@
+# utils/recherche.py
+"""
+Outils de recherche des patients
+Normalise les textes (minuscules, sans accents) et les téléphones (chiffres uniquement)
+pour pouvoir chercher par préfixe sur des colonnes indexées au lieu de faire des
+LIKE '%...%' sur plusieurs colonnes.
+"""
+
+import re
+import unicodedata
+
+from django.db.models import Q
+
+
+# Borne haute d'une recherche par préfixe : plus grand point de code Unicode
+# → "ben" <= valeur < "ben\U0010ffff" équivaut à "commence par ben"
+FIN_PREFIXE = '\U0010ffff'
+
+
+def normaliser_texte(valeur):
+    """
+    "  Bénani   SARA " → "benani sara"
+    Minuscules, accents supprimés, espaces multiples réduits.
+    """
+    if not valeur:
+        return ''
+    decompose = unicodedata.normalize('NFKD', str(valeur))
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(sans_accents.lower().split())
+
+
+def normaliser_telephone(valeur):
+    """
+    "06 12-34.56 78" → "0612345678"
+    On ne garde que les chiffres.
+    """
+    if not valeur:
+        return ''
+    return re.sub(r'\D', '', str(valeur))
+
+
+def prefixe(champ, valeur):
+    """
+    Condition "champ commence par valeur" écrite comme un intervalle
+    (champ >= valeur AND champ < valeur + FIN_PREFIXE) :
+    utilisable par l'index du champ sur tous les moteurs (SQLite, PostgreSQL, ...).
+    """
+    return Q(**{f'{champ}__gte': valeur, f'{champ}__lt': valeur + FIN_PREFIXE})
+
+
+def filtre_patients(query, chemin=''):
+    """
+    Construit le filtre de recherche des patients à partir du texte saisi.
+    - chaque mot doit être le début du nom, du prénom, de l'email ou du téléphone
+    - un mot composé uniquement de chiffres cherche dans le téléphone
+    - la saisie complète peut aussi être le début d'un nom composé ("el amrani")
+
+    Args:
+        query: texte tapé par l'utilisateur
+        chemin: préfixe de relation, ex. 'patient__' pour filtrer des consultations
+
+    Returns:
+        Un objet Q, ou None si la saisie est vide
+    """
+    texte = normaliser_texte(query)
+    if not texte:
+        return None
+
+    # Téléphone saisi avec des séparateurs : "06 12 34"
+    chiffres = normaliser_telephone(texte)
+    if chiffres and not re.sub(r'[\d\s.+\-/()]', '', texte):
+        return prefixe(f'{chemin}telephone_recherche', chiffres)
+
+    filtre = Q()
+    for mot in texte.split():
+        condition = (
+            prefixe(f'{chemin}nom_recherche', mot) |
+            prefixe(f'{chemin}prenom_recherche', mot) |
+            prefixe(f'{chemin}email_recherche', mot)
+        )
+        filtre &= condition
+
+    if ' ' in texte:
+        filtre |= prefixe(f'{chemin}nom_recherche', texte) | prefixe(f'{chemin}prenom_recherche', texte)
+
+    return filtre
@@ -0,0 +1,201 @@
+# utils/rendu_pdf.py
+"""
+Rendu PDF en arrière-plan, sans broker externe
+- La file d'attente est la table TacheRendu : la vue enregistre la tâche (identifiants des
+  ordonnances) et répond aussitôt ; le client interroge son statut puis télécharge le fichier produit.
+- Le rendu est fait par la commande `manage.py rendu_pdf`, lancée à côté du serveur web :
+  elle réclame les tâches en attente et confie le travail ReportLab (CPU) à son
+  ProcessPoolExecutor. Un seul pool par machine quel que soit le nombre de workers web :
+  les cœurs ne sont pas réservés plusieurs fois, et les workers web ne font aucun rendu.
+- Réclamation : select_for_update(skip_locked=True) là où la base le permet, puis UPDATE
+  conditionnel sur le statut (seule protection sous SQLite) : une tâche n'est rendue qu'une
+  fois, même avec plusieurs commandes rendu_pdf (plusieurs machines).
+- Les tâches survivent au redémarrage du serveur web. Une tâche 'en_cours' dont la commande
+  s'est arrêtée en plein rendu est réclamée à nouveau après DUREE_MAX_RENDU (au plus TENTATIVES_MAX fois).
+- Les processus du pool n'accèdent pas à la base : ils reçoivent les ordonnances déjà
+  chargées (avec leur patient) et écrivent un fichier ; la commande enregistre le résultat.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models import Ordonnance, TacheRendu
+from .rendu_processus import initialiser_processus, rendre_fichier
+
+
+# Une tâche en cours depuis plus longtemps a perdu sa commande rendu_pdf (arrêt, redémarrage) : elle est reprise
+DUREE_MAX_RENDU = timedelta(minutes=15)
+TENTATIVES_MAX = 3
+
+# Tâche jamais réclamée après ce délai : aucune commande rendu_pdf ne tourne
+DUREE_MAX_ATTENTE = timedelta(hours=1)
+
+_executeur = None
+_verrou = threading.Lock()
+
+
+def nombre_processus():
+    """Taille du pool : un cœur reste libre pour les requêtes interactives"""
+    return getattr(settings, 'RENDU_PDF_PROCESSUS', None) or max(1, (os.cpu_count() or 2) - 1)
+
+
+def executeur(recreer=False):
+    """Pool de la commande rendu_pdf, créé à la première demande"""
+    global _executeur
+    with _verrou:
+        if recreer and _executeur is not None:
+            _executeur.shutdown(wait=False, cancel_futures=True)
+            _executeur = None
+        if _executeur is None:
+            _executeur = ProcessPoolExecutor(
+                max_workers=nombre_processus(),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=initialiser_processus,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'gestion_patients.settings'),),
+            )
+        return _executeur
+
+
+def fermer_executeur():
+    global _executeur
+    with _verrou:
+        if _executeur is not None:
+            _executeur.shutdown(wait=False, cancel_futures=True)
+            _executeur = None
+
+
+# === CÔTÉ PROCESSUS WEB ===
+
+def soumettre_rendu(ordonnances, format_sortie='pdf', nom_fichier='Ordonnances', utilisateur=None):
+    """
+    Enregistre la tâche dans la file (rendue par la commande rendu_pdf)
+
+    Args:
+        ordonnances: queryset d'ordonnances, dans l'ordre du document
+        format_sortie: 'pdf' (un seul document) ou 'zip' (un PDF par ordonnance)
+
+    Returns:
+        TacheRendu (statut 'en_attente', ou déjà terminé en mode synchrone)
+    """
+    nettoyer_rendus()
+    identifiants = list(ordonnances.values_list('pk', flat=True))
+    tache = TacheRendu.objects.create(
+        utilisateur=utilisateur,
+        format=format_sortie,
+        nom_fichier=nom_fichier,
+        ordonnances=identifiants,
+        nombre_ordonnances=len(identifiants),
+    )
+
+    if getattr(settings, 'RENDU_PDF_SYNCHRONE', False):
+        try:
+            taille = rendre_tache(tache)
+        except Exception as e:
+            enregistrer_resultat(tache.pk, erreur=e)
+        else:
+            enregistrer_resultat(tache.pk, taille=taille)
+        tache.refresh_from_db()
+    return tache
+
+
+def verifier_tache(tache):
+    """Tâche jamais réclamée (aucune commande rendu_pdf en service) → erreur"""
+    if tache.statut == 'en_attente' and tache.date_creation < timezone.now() - DUREE_MAX_ATTENTE:
+        # Conditionnel : la commande peut réclamer la tâche au même moment
+        TacheRendu.objects.filter(pk=tache.pk, statut='en_attente').update(
+            statut='erreur',
+            erreur="Rendu non démarré, veuillez relancer l'impression.",
+            date_fin=timezone.now(),
+        )
+        tache.refresh_from_db()
+    return tache
+
+
+def nettoyer_rendus():
+    """Supprime les tâches (et leurs fichiers) plus anciennes que settings.RENDU_PDF_CONSERVATION"""
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'RENDU_PDF_CONSERVATION', 24 * 3600))
+    anciennes = TacheRendu.objects.filter(date_creation__lt=limite)
+    for tache in anciennes:
+        for chemin in (tache.chemin_fichier, f"{tache.chemin_fichier}.partiel"):
+            try:
+                os.remove(chemin)
+            except FileNotFoundError:
+                pass
+    anciennes.delete()
+
+
+# === CÔTÉ COMMANDE rendu_pdf ===
+
+def reclamer_tache():
+    """
+    Prochaine tâche à rendre, passée 'en_cours' pour cette commande seulement, ou None
+    Les plus anciennes d'abord ; une tâche abandonnée en cours de rendu est reprise.
+    """
+    while True:
+        maintenant = timezone.now()
+        with transaction.atomic():
+            tache = (
+                TacheRendu.objects
+                .filter(Q(statut='en_attente') | Q(statut='en_cours', date_debut__lt=maintenant - DUREE_MAX_RENDU))
+                .order_by('date_creation', 'pk')
+                .select_for_update(skip_locked=True)
+                .first()
+            )
+            if tache is None:
+                return None
+            if tache.tentatives >= TENTATIVES_MAX:
+                enregistrer_resultat(tache.pk, erreur="Rendu interrompu à plusieurs reprises, veuillez relancer l'impression.")
+                continue
+            # Sans verrou de ligne (SQLite), seule la première commande voit encore l'ancien statut
+            reclamee = TacheRendu.objects.filter(pk=tache.pk, statut=tache.statut, tentatives=tache.tentatives).update(
+                statut='en_cours',
+                date_debut=maintenant,
+                tentatives=F('tentatives') + 1,
+            )
+        if reclamee:
+            tache.refresh_from_db()
+            return tache
+
+
+def liberer_taches(identifiants):
+    """Arrêt de la commande : les tâches en cours retournent dans la file, sans compter de tentative"""
+    TacheRendu.objects.filter(pk__in=identifiants, statut='en_cours').update(
+        statut='en_attente',
+        date_debut=None,
+        tentatives=F('tentatives') - 1,
+    )
+
+
+def charger_ordonnances(tache):
+    """Ordonnances de la tâche avec leur patient, dans l'ordre demandé (supprimées depuis : ignorées)"""
+    par_id = Ordonnance.objects.select_related('patient').in_bulk(tache.ordonnances)
+    return [par_id[pk] for pk in tache.ordonnances if pk in par_id]
+
+
+def rendre_tache(tache):
+    """Rendu dans le processus courant (mode synchrone)"""
+    os.makedirs(settings.DOSSIER_RENDUS_PDF, exist_ok=True)
+    return rendre_fichier(charger_ordonnances(tache), tache.format, tache.chemin_fichier)
+
+
+def lancer_rendu(pool, tache):
+    """Rendu de la tâche dans le pool (future : taille du fichier)"""
+    os.makedirs(settings.DOSSIER_RENDUS_PDF, exist_ok=True)
+    return pool.submit(rendre_fichier, charger_ordonnances(tache), tache.format, tache.chemin_fichier)
+
+
+def enregistrer_resultat(tache_id, taille=None, erreur=None):
+    TacheRendu.objects.filter(pk=tache_id).update(
+        statut='erreur' if erreur else 'termine',
+        taille=taille,
+        erreur=str(erreur or ''),
+        date_fin=timezone.now(),
+    )
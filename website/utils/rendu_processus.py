@@ -0,0 +1,37 @@
+# utils/rendu_processus.py
+"""
+Code exécuté dans les processus du pool de rendu (voir utils/rendu_pdf.py)
+Ce module est importé par les processus avant le chargement de Django :
+il ne doit pas importer les modèles.
+"""
+
+import os
+
+from .pdf_generator import OrdonnancesLotPDFGenerator
+
+
+def initialiser_processus(module_settings):
+    """Démarrage d'un processus du pool ('spawn' : Django doit être chargé à nouveau)"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', module_settings)
+    import django
+    django.setup()
+
+
+def rendre_fichier(ordonnances, format_sortie, chemin):
+    """
+    Écrit le PDF fusionné (ou l'archive ZIP) des ordonnances dans `chemin`
+    Le fichier n'apparaît qu'une fois complet (écriture dans un fichier temporaire puis renommage).
+
+    Returns:
+        taille du fichier (octets)
+    """
+    temporaire = f"{chemin}.partiel"
+    generateur = OrdonnancesLotPDFGenerator(ordonnances)
+    with open(temporaire, 'wb') as fichier:
+        if format_sortie == 'zip':
+            for morceau in generateur.contenu_zip():
+                fichier.write(morceau)
+        else:
+            generateur.create_pdf(fichier)
+    os.replace(temporaire, chemin)
+    return os.path.getsize(chemin)
@@ -0,0 +1,158 @@
+# utils/reservation.py
+"""
+Prise de rendez-vous : chevauchements de créneaux et créneaux libres
+- Un créneau occupe [date_consultation, date_fin[ ; la durée dépend du type
+  (Consultations.DUREE_PAR_TYPE). Consultations annulées ou reportées : créneau libéré
+- Un seul praticien (le cabinet) : deux consultations ne se chevauchent jamais,
+  quel que soit le patient
+- occupations() : deux créneaux se chevauchent si début < fin de l'autre et fin > début de l'autre.
+  Une durée ne dépassant jamais DUREE_MAX, le début est borné des deux côtés :
+  la base parcourt une petite plage de l'index sur date_consultation, quelle que soit la taille de la table
+- creneaux_libres() : disponibilités d'une semaine en un seul passage sur les horaires
+  d'ouverture et les occupations triées (une requête pour toute la semaine)
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from ..models import Consultations
+from .agenda import minuit
+
+
+# Consultations qui ne bloquent plus leur créneau
+STATUTS_LIBERANT_CRENEAU = ('annule', 'rapporte')
+
+# Plus longue durée possible : borne basse de la plage parcourue dans l'index
+DUREE_MAX = timedelta(minutes=max(*Consultations.DUREE_PAR_TYPE.values(), Consultations.DUREE_DEFAUT))
+
+# Horaires d'ouverture par jour de la semaine (0 = lundi) : plages [ouverture, fermeture[
+HORAIRES = {
+    0: ((time(9), time(13)), (time(14), time(18))),
+    1: ((time(9), time(13)), (time(14), time(18))),
+    2: ((time(9), time(13)), (time(14), time(18))),
+    3: ((time(9), time(13)), (time(14), time(18))),
+    4: ((time(9), time(13)), (time(14), time(18))),
+    5: ((time(9), time(13)),),
+}
+
+# Grille des débuts de créneaux proposés (minutes après l'ouverture)
+PAS_CRENEAUX = timedelta(minutes=15)
+
+
+def duree_type(type_):
+    return timedelta(minutes=Consultations.DUREE_PAR_TYPE.get(type_, Consultations.DUREE_DEFAUT))
+
+
+# === CHEVAUCHEMENTS ===
+
+def occupations(debut, fin, exclure=None):
+    """
+    Consultations dont le créneau chevauche [début, fin[ (créneaux libérés exclus)
+
+    Args:
+        exclure: id de la consultation en cours de modification
+    """
+    consultations = Consultations.objects.filter(
+        date_consultation__lt=fin,
+        date_consultation__gt=debut - DUREE_MAX,  # commencée plus tôt : terminée avant début
+        date_fin__gt=debut,
+    ).exclude(statut__in=STATUTS_LIBERANT_CRENEAU)
+    if exclure is not None:
+        consultations = consultations.exclude(pk=exclure)
+    return consultations
+
+
+def conflit(debut, type_, exclure=None):
+    """Première consultation qui occupe déjà une partie du créneau, ou None"""
+    return (
+        occupations(debut, debut + duree_type(type_), exclure)
+        .select_related('patient')
+        .order_by('date_consultation', 'id')
+        .first()
+    )
+
+
+# === CRÉNEAUX LIBRES ===
+
+def plages_ouverture(debut, fin):
+    """Plages d'ouverture [ouverture, fermeture[ comprises dans [début, fin[, dans l'ordre"""
+    jour = timezone.localtime(debut).date()
+    while minuit(jour) < fin:
+        for ouverture, fermeture in HORAIRES.get(jour.weekday(), ()):
+            ouverture = timezone.make_aware(datetime.combine(jour, ouverture))
+            fermeture = min(timezone.make_aware(datetime.combine(jour, fermeture)), fin)
+            if ouverture < fermeture and fermeture > debut:
+                yield ouverture, fermeture
+        jour += timedelta(days=1)
+
+
+def fusionner(occupes):
+    """Intervalles (début, fin) triés par début → intervalles disjoints"""
+    fusionnes = []
+    for debut, fin in occupes:
+        if fusionnes and debut <= fusionnes[-1][1]:
+            fusionnes[-1][1] = max(fusionnes[-1][1], fin)
+        else:
+            fusionnes.append([debut, fin])
+    return fusionnes
+
+
+def creneaux_libres(debut, fin, duree, occupes, limite=None):
+    """
+    Débuts de créneaux libres de [début, fin[ pour une durée donnée, dans l'ordre
+
+    Un seul passage : les plages d'ouverture et les occupations sont parcourues ensemble,
+    chaque occupation n'est examinée qu'une fois.
+    Les créneaux proposés ne se chevauchent pas entre eux ; après une occupation,
+    le suivant reprend sur la grille PAS_CRENEAUX.
+
+    Args:
+        occupes: [(début, fin)] triés par début (occupations() de la période)
+
+    Returns:
+        liste de (début, fin)
+    """
+    occupes = fusionner(occupes)
+    libres = []
+    i = 0
+    for ouverture, fermeture in plages_ouverture(debut, fin):
+        candidat = ouverture
+        while True:
+            if candidat < debut:
+                candidat = sur_la_grille(ouverture, debut)
+            while i < len(occupes) and occupes[i][1] <= candidat:
+                i += 1
+            if candidat + duree > fermeture:
+                break
+            if i < len(occupes) and occupes[i][0] < candidat + duree:
+                candidat = sur_la_grille(ouverture, occupes[i][1])
+                continue
+            libres.append((candidat, candidat + duree))
+            if limite is not None and len(libres) >= limite:
+                return libres
+            candidat = sur_la_grille(ouverture, candidat + duree)
+    return libres
+
+
+def sur_la_grille(ouverture, moment):
+    """Premier début de la grille (ouverture + n × PAS_CRENEAUX) à partir de moment"""
+    pas = -(-(moment - ouverture) // PAS_CRENEAUX)  # arrondi supérieur
+    return ouverture + pas * PAS_CRENEAUX
+
+
+def requete_occupes(debut, fin):
+    return occupations(debut, fin).order_by('date_consultation').values_list('date_consultation', 'date_fin')
+
+
+def prochains_creneaux(debut, type_, limite=3, jours=7):
+    """Prochains créneaux libres pour ce type, sur `jours` jours à partir de début (une requête)"""
+    fin = debut + timedelta(days=jours)
+    return creneaux_libres(debut, fin, duree_type(type_), list(requete_occupes(debut, fin)), limite)
+
+
+async def aprochains_creneaux(debut, type_, limite=None, jours=7):
+    """prochains_creneaux() pour les vues asynchrones"""
+    fin = debut + timedelta(days=jours)
+    occupes = [occupe async for occupe in requete_occupes(debut, fin)]
+    return creneaux_libres(debut, fin, duree_type(type_), occupes, limite)
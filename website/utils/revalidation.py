@@ -0,0 +1,122 @@
+# utils/revalidation.py
+"""
+Requêtes conditionnelles (ETag / Last-Modified) des pages de détail
+Une seule requête SQL lit les dates de modification (date_modification) de la fiche et des
+lignes affichées avec elle, et le nombre de ces lignes (une suppression ne fait avancer aucune date).
+Si le navigateur a déjà cette version : 304 (django.views.decorators.http.condition),
+sans les requêtes de la page ni le rendu du gabarit.
+L'ETag couvre aussi ce qui change sans modification en base : utilisateur, jeton CSRF de la page,
+date du jour (âge affiché). Avec des messages en attente, la page est toujours rendue.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.contrib import messages
+from django.db.models import DateTimeField, F, Func, IntegerField, OuterRef, Subquery
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from ..models import Consultations, Ordonnance, Patient
+
+
+# À incrémenter quand les gabarits des pages de détail changent : les anciennes versions ne sont plus valides
+VERSION_PAGES = 1
+
+
+# === ÉTAT DES PAGES (une requête chacune) ===
+
+def derniere_modification(queryset):
+    """Sous-requête : MAX(date_modification) des lignes (sans GROUP BY)"""
+    return Subquery(queryset.order_by().annotate(
+        valeur=Func(F('date_modification'), function='MAX', output_field=DateTimeField())
+    ).values('valeur'))
+
+
+def nombre(queryset):
+    """Sous-requête : COUNT(*) des lignes (sans GROUP BY)"""
+    return Subquery(queryset.order_by().annotate(
+        valeur=Func(F('id'), function='COUNT', output_field=IntegerField())
+    ).values('valeur'))
+
+
+def etat_patient(patient_id):
+    """Fiche patient : le patient, ses consultations (historique, statistiques) et leurs ordonnances"""
+    consultations = Consultations.objects.filter(patient=OuterRef('pk'))
+    ordonnances = Ordonnance.objects.filter(patient=OuterRef('pk'))
+    return Patient.objects.filter(pk=patient_id).annotate(
+        consultations_modifiees=derniere_modification(consultations),
+        nombre_consultations=nombre(consultations),
+        # "Dernière visite" avance avec le temps, sans modification
+        nombre_passees=nombre(consultations.filter(date_consultation__lte=timezone.now())),
+        ordonnances_modifiees=derniere_modification(ordonnances),
+        nombre_ordonnances=nombre(ordonnances),
+    ).values_list(
+        'date_modification', 'consultations_modifiees', 'nombre_consultations',
+        'nombre_passees', 'ordonnances_modifiees', 'nombre_ordonnances',
+    ).first()
+
+
+def etat_consultation(consultation_id):
+    return Consultations.objects.filter(pk=consultation_id).values_list(
+        'date_modification', 'patient__date_modification',
+    ).first()
+
+
+def etat_ordonnance(ordonnance_id):
+    # consultation_id : la consultation supprimée met la liaison à NULL sans save() de l'ordonnance
+    return Ordonnance.objects.filter(pk=ordonnance_id).values_list(
+        'date_modification', 'patient__date_modification', 'consultation_id', 'consultation__date_modification',
+    ).first()
+
+
+# === DÉCORATEUR ===
+
+def validateurs(request, etat):
+    """(ETag, Last-Modified) de la page, ou (None, None) : page rendue sans condition"""
+    if etat is None or len(messages.get_messages(request)):
+        return None, None  # fiche introuvable (la vue répond 404) ou messages à afficher
+    get_token(request)  # secret CSRF créé dès la première visite : le même à la suivante (cookie)
+    elements = (
+        VERSION_PAGES,
+        etat,
+        request.user.pk,
+        request.META.get('CSRF_COOKIE'),
+        timezone.localdate(),
+    )
+    etag = hashlib.sha256(repr(elements).encode()).hexdigest()[:32]
+    # Last-Modified (navigateurs sans If-None-Match) : au plus tôt le début du jour, pour l'âge affiché
+    debut_du_jour = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    dates = [valeur for valeur in etat if hasattr(valeur, 'utctimetuple')]
+    return etag, max(dates + [debut_du_jour])
+
+
+def revalidation(calculer_etat):
+    """
+    Décorateur des vues de détail : 304 si la page n'a pas changé depuis la dernière visite
+
+    Args:
+        calculer_etat: (arguments de la vue) → tuple des valeurs dont dépend la page, ou None
+    """
+    def decorateur(vue):
+        def lire(request, *args, **kwargs):
+            # condition() demande l'ETag et le Last-Modified séparément : une seule requête
+            if not hasattr(request, '_validateurs'):
+                request._validateurs = validateurs(request, calculer_etat(*args, **kwargs))
+            return request._validateurs
+
+        vue_conditionnelle = condition(
+            etag_func=lambda request, *args, **kwargs: lire(request, *args, **kwargs)[0],
+            last_modified_func=lambda request, *args, **kwargs: lire(request, *args, **kwargs)[1],
+        )(vue)
+
+        @wraps(vue)
+        def enveloppe(request, *args, **kwargs):
+            response = vue_conditionnelle(request, *args, **kwargs)
+            # Données patient : pas de cache partagé ; le navigateur revalide à chaque visite
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return enveloppe
+    return decorateur
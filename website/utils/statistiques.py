@@ -0,0 +1,158 @@
+# utils/statistiques.py
+"""
+Statistiques d'activité et de chiffre d'affaires, lues dans des agrégats quotidiens
+- StatistiqueJour : une ligne par (jour, type, statut), tenue à jour de façon incrémentale
+  (signaux de Consultations ; import en masse et benchmark, qui passent par bulk_create)
+- reconstruire() : recalcul complet depuis les consultations (commande reconstruire_statistiques)
+- statistiques_periode() : totaux et séries d'un mois ou d'une année, en lisant quelques
+  centaines de lignes d'agrégats au lieu de toutes les consultations
+"""
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from ..models import Consultations, StatistiqueJour
+
+
+# Consultations comptées dans l'activité mais pas dans le chiffre d'affaires
+STATUTS_HORS_CHIFFRE_AFFAIRES = ('annule', 'rapporte')
+
+
+# === MISE À JOUR INCRÉMENTALE ===
+
+def cle_statistique(consultation):
+    """(jour local, type, statut) d'une consultation"""
+    date_consultation = consultation.date_consultation
+    if timezone.is_naive(date_consultation):
+        date_consultation = timezone.make_aware(date_consultation)
+    return timezone.localdate(date_consultation), consultation.type, consultation.statut
+
+
+def variations(consultations, signe=1):
+    """{(jour, type, statut): [nombre, montant]} pour une liste de consultations (signe -1 : retrait)"""
+    resultat = defaultdict(lambda: [0, Decimal(0)])
+    for consultation in consultations:
+        ligne = resultat[cle_statistique(consultation)]
+        ligne[0] += signe
+        ligne[1] += signe * Decimal(consultation.prix or 0)
+    return resultat
+
+
+def ajuster(variations_par_cle):
+    """
+    Applique des variations aux agrégats : UPDATE nombre = nombre + n (pas de lecture préalable),
+    création de la ligne si le jour / type / statut n'existe pas encore
+    """
+    with transaction.atomic():
+        for (jour, type_, statut), (nombre, montant) in variations_par_cle.items():
+            if not nombre and not montant:
+                continue
+            lignes = StatistiqueJour.objects.filter(jour=jour, type=type_, statut=statut)
+            increment = {'nombre': F('nombre') + nombre, 'chiffre_affaires': F('chiffre_affaires') + montant}
+            if lignes.update(**increment):
+                continue
+            try:
+                with transaction.atomic():
+                    StatistiqueJour.objects.create(
+                        jour=jour, type=type_, statut=statut, nombre=nombre, chiffre_affaires=montant
+                    )
+            except IntegrityError:
+                # Ligne créée entre-temps par une autre transaction
+                lignes.update(**increment)
+
+
+def ajouter_consultations(consultations):
+    """Consultations insérées sans save() (bulk_create) : pas de signal, ajout explicite"""
+    ajuster(variations(consultations))
+
+
+def remplacer_consultation(avant, apres):
+    """
+    Consultation modifiée : retrait de l'ancienne version, ajout de la nouvelle
+    avant / apres : instances (ou None pour une création / suppression)
+    """
+    total = variations([avant], -1) if avant is not None else defaultdict(lambda: [0, Decimal(0)])
+    if apres is not None:
+        for cle, (nombre, montant) in variations([apres]).items():
+            total[cle][0] += nombre
+            total[cle][1] += montant
+    ajuster(total)
+
+
+# === RECONSTRUCTION ===
+
+def reconstruire():
+    """
+    Recalcule tous les agrégats depuis les consultations (une requête GROUP BY)
+
+    Returns:
+        nombre de lignes d'agrégats
+    """
+    agregats = (
+        Consultations.objects
+        .annotate(jour=TruncDate('date_consultation'))
+        .values('jour', 'type', 'statut')
+        .annotate(nombre=Count('id'), chiffre_affaires=Sum('prix'))
+        .order_by()  # sans l'ordre par défaut du modèle, qui s'ajouterait au GROUP BY
+    )
+    with transaction.atomic():
+        StatistiqueJour.objects.all().delete()
+        lignes = StatistiqueJour.objects.bulk_create(
+            (StatistiqueJour(**agregat) for agregat in agregats.iterator()),
+            batch_size=1000,
+        )
+    return len(lignes)
+
+
+# === LECTURE (TABLEAU DE BORD) ===
+
+def periode(annee, mois=None):
+    """Bornes [début, fin[ d'un mois, ou de l'année si mois est None"""
+    if mois is None:
+        return date(annee, 1, 1), date(annee + 1, 1, 1)
+    debut = date(annee, mois, 1)
+    return debut, date(annee + (mois == 12), mois % 12 + 1, 1)
+
+
+def statistiques_periode(annee, mois=None):
+    """
+    Activité et chiffre d'affaires d'un mois (série par jour) ou d'une année (série par mois)
+
+    Returns:
+        dict : totaux, répartition par type et par statut, série chronologique
+    """
+    debut, fin = periode(annee, mois)
+    lignes = StatistiqueJour.objects.filter(jour__gte=debut, jour__lt=fin).order_by()
+    factures = ~Q(statut__in=STATUTS_HORS_CHIFFRE_AFFAIRES)
+    mesures = {
+        'nombre': Sum('nombre', default=0),
+        'chiffre_affaires': Sum('chiffre_affaires', filter=factures, default=Decimal(0)),
+    }
+
+    par_type = {ligne['type']: ligne for ligne in lignes.values('type').annotate(**mesures)}
+    par_statut = {ligne['statut']: ligne for ligne in lignes.values('statut').annotate(**mesures)}
+    if mois is None:
+        serie = lignes.annotate(periode=TruncMonth('jour')).values('periode').annotate(**mesures).order_by('periode')
+    else:
+        serie = lignes.values(periode=F('jour')).annotate(**mesures).order_by('periode')
+
+    return {
+        'debut': debut,
+        'fin': fin,
+        'totaux': lignes.aggregate(**mesures),
+        'par_type': [
+            {'code': code, 'libelle': libelle, **par_type.get(code, {'nombre': 0, 'chiffre_affaires': Decimal(0)})}
+            for code, libelle in Consultations.TYPE_CONSULTATION
+        ],
+        'par_statut': [
+            {'code': code, 'libelle': libelle, **par_statut.get(code, {'nombre': 0, 'chiffre_affaires': Decimal(0)})}
+            for code, libelle in Consultations.STATUT_CONSULTATION
+        ],
+        'serie': list(serie),
+    }
@@ -56,65 +56,208 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.db.models import Q
 from django.core.paginator import Paginator
+from django.http import JsonResponse
 from .models import Patient,Consultations
 from .forms import PatientForm
+from .utils.pagination import apaginer
+from .utils.cache_versionne import afragment
+from functools import partial
+from asgiref.sync import sync_to_async
+from .utils.revalidation import etat_consultation, etat_ordonnance, etat_patient, revalidation
+from django.db.models import Count, Max, Sum
+from django.urls import reverse
+from .models import Ordonnance
+from .utils.age import TRANCHES_AGE, annoter_age, filtre_tranche_age
+from .utils.pagination import PaginatorCurseur
+from .utils.statistiques import STATUTS_HORS_CHIFFRE_AFFAIRES
+from .utils.recherche import filtre_patients
+
+# Colonnes lues par la liste des patients (le reste de la fiche n'est chargé que sur la page détail)
+CHAMPS_LISTE_PATIENTS = ('id', 'nom', 'prenom', 'date_naissance', 'telephone', 'email', 'date_creation')
+
+# Historique des consultations de la fiche patient
+TAILLE_PAGE_HISTORIQUE = 20
+CHAMPS_HISTORIQUE = (
+    'id', 'patient_id', 'numero', 'type', 'statut', 'date_consultation', 'prix',
+    'ordonnance__id', 'ordonnance__numero',
+)
+
+
+def filtrer_patients(patients, params):
+    """
+    Applique la recherche et la tranche d'âge (partagé par la liste et l'export CSV)
+
+    Returns:
+        (queryset filtré, dict des filtres pour le template)
+    """
+    search_query = params.get('search', '')
+    filtre = filtre_patients(search_query)
+    if filtre is not None:  # Si il y a quelque chose à chercher
+        # Recherche par préfixe sur les champs normalisés et indexés
+        # ("benani" → nom/prénom/email, "0612" → téléphone)
+        patients = patients.filter(filtre)
+
+    # Tranche d'âge : plage de dates de naissance (index), pas de calcul d'âge par patient
+    age_filter = params.get('age_filter', '')
+    filtre_age = filtre_tranche_age(age_filter)
+    if filtre_age is not None:
+        patients = patients.filter(filtre_age)
+    else:
+        age_filter = ''
+
+    return patients, {'search_query': search_query, 'age_filter': age_filter}
+
+
+async def rendre(request, gabarit, context):
+    """
+    render() pour les vues asynchrones : le gabarit de base lit l'utilisateur, la session
+    et les messages, chargés à la demande par l'ORM synchrone (exécuté dans un thread)
+    """
+    return await sync_to_async(render)(request, gabarit, context)
+
 
-def liste_patients(request):
+async def liste_patients(request):
     """
     Vue pour afficher la liste de tous les patients
+    Asynchrone (ORM asynchrone) : pas de thread occupé pendant les accès à la base
     """
     
     # 1. Récupérer tous les patients de la base de données
-    # order_by('-date_creation') = trier par date de création (le plus récent en premier)
-    patients = Patient.objects.all().order_by('-date_creation')
+    # only() = ne lire que les colonnes affichées dans la liste
+    # annoter_age() = âge calculé par la base (lu par patient.age dans le template)
+    patients = annoter_age(Patient.objects.only(*CHAMPS_LISTE_PATIENTS))
     
-    # 2. RECHERCHE - si l'utilisateur tape quelque chose dans la barre de recherche
-    search_query = request.GET.get('search', '')  # Récupérer ce qui est tapé dans ?search=...
-    if search_query:  # Si il y a quelque chose à chercher
-        # Q() permet de faire des recherches complexes avec OU (|)
-        # icontains = contient (insensible à la casse)
-        patients = patients.filter(
-            Q(nom__icontains=search_query) |        # Chercher dans le nom OU
-            Q(prenom__icontains=search_query) |     # Chercher dans le prénom OU
-            Q(telephone__icontains=search_query) |  # Chercher dans le téléphone OU
-            Q(email__icontains=search_query)        # Chercher dans l'email
-        )
+    # 2. RECHERCHE et TRANCHE D'ÂGE (?search=...&age_filter=18_64)
+    patients, filtres = filtrer_patients(patients, request.GET)
     
     # 3. PAGINATION - diviser la liste en pages de 10 patients
-    paginator = Paginator(patients, 10)  # 10 patients par page
-    page_number = request.GET.get('page')  # Quelle page l'utilisateur veut voir
-    page_obj = paginator.get_page(page_number)  # Récupérer les patients de cette page
+    # Par curseur sur (date_creation, id) ou (date_naissance, id) : pas d'OFFSET, total plafonné
+    # (voir utils/pagination.py)
+    tri = request.GET.get('tri', '')
+    if tri in ('age', '-age'):
+        # Tri par âge = tri par date de naissance (index) ; patients sans date de naissance exclus
+        ordre = '-' if tri == 'age' else ''  # âge croissant = naissance la plus récente d'abord
+        patients = patients.filter(date_naissance__isnull=False).order_by(f'{ordre}date_naissance', f'{ordre}id')
+        pagination = partial(apaginer, request, patients, 10, 'date_naissance', descendant=(tri == 'age'))
+    else:
+        tri = ''
+        patients = patients.order_by('-date_creation', '-id')
+        pagination = partial(apaginer, request, patients, 10, 'date_creation')
+
+    # 4. Tableau rendu depuis le cache tant qu'aucun patient n'est modifié (utils/cache_versionne.py)
+    # La requête SQL n'est exécutée qu'en cas d'absence du cache
+    tableau = await afragment(request, 'liste_patients', [Patient], 'patient/tableau_patients.html',
+                              'patients', filtres, pagination)
     
     # 5. Envoyer les données au template
     context = {
-        'patients': page_obj,              # Les patients à afficher
-        'search_query': search_query,      # Pour garder le texte dans la barre de recherche
-        'total_patients': patients.count() # Nombre total de patients trouvés
+        'tableau': tableau['html'],                      # Lignes + pagination
+        'total_patients': tableau['total'],              # Nombre total de patients trouvés
+        'total_precision': tableau['precision'],         # exact, plafonne (N+) ou estime (≈ N)
+        'tri': tri,
+        'tranches_age': TRANCHES_AGE,
+        **filtres,                         # search_query, age_filter : pour garder les filtres dans la page
     }
     
-    return render(request, 'patient/liste_patient.html', context)
+    return await rendre(request, 'patient/liste_patient.html', context)
 
 
 
+@revalidation(etat_patient)  # 304 si rien n'a changé depuis la dernière visite
 def detail_patient(request, patient_id):
     """
     Vue pour afficher les détails d'UN patient spécifique
+    L'historique est paginé : première page ici, la suite via historique_consultations
     """
     
     # Récupérer le patient avec cet ID, ou erreur 404 si il n'existe pas
     patient = get_object_or_404(Patient, id=patient_id)
-    consultations = patient.consultations.all()  # déjà trié par Meta (récent → ancien)
 
+    # En-tête de l'historique : nombre, total facturé, dernière visite, en une requête
+    statistiques = patient.consultations.aggregate(
+        nombre=Count('id'),
+        total_facture=Sum('prix', filter=~Q(statut__in=STATUTS_HORS_CHIFFRE_AFFAIRES), default=0),
+        derniere_visite=Max('date_consultation', filter=Q(date_consultation__lte=timezone.now())),
+    )
+    page = page_historique(patient, None)
     
     # Envoyer le patient au template
     context = {
         'patient': patient,
-        'consultations': consultations,
+        'statistiques': statistiques,
+        'consultations': page,
+        'suivant': url_historique_suivant(patient, page),
     }
     
     return render(request, 'patient/detail_patient.html', context)
 
 
+def page_historique(patient, curseur):
+    """
+    Une page de l'historique des consultations (les plus récentes d'abord)
+    Index (patient, date_consultation) ; l'ordonnance liée vient de la même requête (JOIN)
+    """
+    consultations = (
+        patient.consultations
+        .select_related('ordonnance')
+        .only(*CHAMPS_HISTORIQUE)
+    )
+    return PaginatorCurseur(consultations, TAILLE_PAGE_HISTORIQUE, 'date_consultation').get_page(curseur)
+
+
+def url_historique_suivant(patient, page):
+    if not page.has_next():
+        return None
+    return f"{reverse('historique_consultations', args=[patient.id])}?curseur={page.curseur_suivant}"
+
+
+@login_required
+def historique_consultations(request, patient_id):
+    """
+    Suite de l'historique d'un patient (défilement / bouton "Charger plus")
+    - par défaut : fragment HTML (lignes du tableau), URL de la page suivante dans l'en-tête X-Suivant
+    - ?format=json : consultations + URL suivante
+    """
+    patient = get_object_or_404(Patient.objects.only('id', 'nom', 'prenom'), id=patient_id)
+    page = page_historique(patient, request.GET.get('curseur'))
+    suivant = url_historique_suivant(patient, page)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'consultations': [
+                {
+                    'id': c.id,
+                    'code': c.code,
+                    'type': c.type,
+                    'type_display': c.get_type_display(),
+                    'statut': c.statut,
+                    'date_consultation': c.date_consultation.isoformat(),
+                    'prix': str(c.prix),
+                    'ordonnance': ordonnance_historique(c),
+                }
+                for c in page
+            ],
+            'suivant': suivant,
+        })
+
+    response = render(request, 'patient/historique_consultations.html', {'patient': patient, 'consultations': page})
+    if suivant:
+        response['X-Suivant'] = suivant
+    return response
+
+
+def ordonnance_historique(consultation):
+    try:
+        ordonnance = consultation.ordonnance
+    except Ordonnance.DoesNotExist:
+        return None
+    return {
+        'id': ordonnance.id,
+        'numero': ordonnance.numero,
+        'url': reverse('detail_ordonnance', args=[ordonnance.id]),
+    }
+
+
 
 
 @login_required  # optionnel
@@ -181,6 +324,81 @@ def supprimer_patient(request, patient_id):
     return render(request, 'patients/confirmer_suppression.html', context)
 
 
+# Nombre de suggestions renvoyées par défaut / au maximum par l'API d'autocomplétion
+SUGGESTIONS_PAR_PAGE = 10
+SUGGESTIONS_MAX = 25
+
+
+@login_required
+async def suggestion_patients(request):
+    """
+    API d'autocomplétion des patients : /api/patients/suggest?q=<texte>&page=<n>
+    - Asynchrone : une requête par frappe n'immobilise pas un thread ; sous ASGI, une requête
+      abandonnée par le navigateur (AbortController, frappe suivante) est annulée
+    - Recherche par PRÉFIXE sur le nom, le prénom, l'email ou le téléphone (champs indexés)
+    - Nombre de résultats borné (jamais toute la table)
+    - Pagination sans COUNT(*) : on lit une ligne de plus pour savoir s'il reste des résultats
+    """
+    query = request.GET.get('q', '').strip()
+
+    try:
+        limite = min(max(int(request.GET.get('limit', SUGGESTIONS_PAR_PAGE)), 1), SUGGESTIONS_MAX)
+    except ValueError:
+        limite = SUGGESTIONS_PAR_PAGE
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    # Recherche par préfixe sur les champs normalisés et indexés ("bénani sa" → nom + prénom)
+    filtre = filtre_patients(query)
+    if filtre is None:
+        return JsonResponse({'results': [], 'page': page, 'has_more': False})
+
+    debut = (page - 1) * limite
+    lignes = [
+        ligne async for ligne in
+        Patient.objects
+        .filter(filtre)
+        .order_by('nom', 'prenom', 'id')
+        .values_list('id', 'nom', 'prenom')[debut:debut + limite + 1]
+    ]
+
+    results = [
+        {
+            'id': pid,
+            'nom': nom,
+            'prenom': prenom or '',
+            'fullName': f"{nom} {prenom or ''}".strip(),
+        }
+        for pid, nom, prenom in lignes[:limite]
+    ]
+
+    return JsonResponse({'results': results, 'page': page, 'has_more': len(lignes) > limite})
+
+
+def patients_correspondants(search_query):
+    """
+    Sous-requête des ids de patients correspondant à la saisie
+    (pour filtrer consultations / ordonnances par patient via l'index patient_id)
+    """
+    filtre = filtre_patients(search_query)
+    if filtre is None:
+        return Patient.objects.none().values('id')
+    return Patient.objects.filter(filtre).values('id')
+
+
+def patient_initial(request):
+    """
+    Patient présélectionné via ?patient=<id> (ou None) — évite d'envoyer toute la liste
+    des patients au template juste pour retrouver son nom.
+    """
+    patient_id = request.GET.get('patient', '')
+    if not patient_id.isdigit():
+        return None
+    return Patient.objects.filter(id=patient_id).only('id', 'nom', 'prenom').first()
+
+
 
 
 
@@ -199,65 +417,96 @@ from django.http import JsonResponse
 from django.contrib import messages
 from django.db.models import Q
 from django.utils import timezone
+from django.db.models import F
 from .models import Consultations, Patient  # CORRECTION: Consultations au lieu de Consultation
 from .forms import ConsultationForm
+from .utils.plein_texte import recherche_plein_texte
+from .utils.agenda import bornes_jour, bornes_mois, bornes_semaine, filtre_periode
 
 
-def liste_consultations(request):
-    consultations = Consultations.objects.all().order_by('date_consultation')  # CORRECTION: Consultations
+# Colonnes lues par la liste des consultations : le patient est chargé dans la même requête (JOIN)
+CHAMPS_LISTE_CONSULTATIONS = (
+    'id', 'type', 'date_consultation', 'statut',
+    'patient', 'patient__nom', 'patient__prenom',
+)
 
-    search_query = request.GET.get('search', '')
+
+def filtrer_consultations(consultations, params):
+    """
+    Applique les filtres de la liste des consultations (recherche, type, statut, date)
+    Partagé par la liste et l'export CSV pour qu'ils renvoient les mêmes lignes.
+
+    Returns:
+        (queryset filtré, dict des filtres pour le template)
+    """
+    search_query = params.get('search', '')
     if search_query:
+        # Diagnostic : index plein texte (FTS5 / tsvector), patient : champs de recherche indexés
+        consultations, condition = recherche_plein_texte(consultations, 'diagnostic', search_query)
         consultations = consultations.filter(
-            Q(patient__nom__icontains=search_query) |
-            Q(patient__prenom__icontains=search_query) |
-            Q(diagnostic__icontains=search_query)
-            # SUPPRIMÉ: notes_medecin (n'existe pas dans le nouveau modèle)
+            condition | Q(patient__in=patients_correspondants(search_query))
         )
 
-    type_filter = request.GET.get('type_filter', '')
+    type_filter = params.get('type_filter', '')
     if type_filter:
         consultations = consultations.filter(type=type_filter)
 
-    statut_filter = request.GET.get('statut_filter', '')
+    statut_filter = params.get('statut_filter', '')
     if statut_filter:
         consultations = consultations.filter(statut=statut_filter)
 
-    date_filter = request.GET.get('date_filter', '')
-    if date_filter:
-        today = timezone.now().date()
-        if date_filter == 'aujourd_hui':
-            consultations = consultations.filter(date_consultation__date=today)
-        elif date_filter == 'cette_semaine':
-            start_week = today - timezone.timedelta(days=today.weekday())
-            consultations = consultations.filter(date_consultation__date__gte=start_week)
-        elif date_filter == 'ce_mois':
-            consultations = consultations.filter(
-                date_consultation__year=today.year,
-                date_consultation__month=today.month
-            )
-
-    paginator = Paginator(consultations, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Plages [début, fin[ sur date_consultation (index), pas de fonction appliquée à la colonne
+    date_filter = params.get('date_filter', '')
+    periodes = {'aujourd_hui': bornes_jour, 'cette_semaine': bornes_semaine, 'ce_mois': bornes_mois}
+    if date_filter in periodes:
+        consultations = consultations.filter(filtre_periode(*periodes[date_filter](timezone.localdate())))
+
+    filtres = {
+        'search_query': search_query,
+        'type_filter': type_filter,
+        'statut_filter': statut_filter,
+        'date_filter': date_filter,
+    }
+    return consultations, filtres
+
+
+async def liste_consultations(request):
+    consultations = (
+        Consultations.objects
+        .select_related('patient')  # évite une requête par ligne pour consult.patient
+        .only(*CHAMPS_LISTE_CONSULTATIONS)
+        .order_by('date_consultation')
+    )
+
+    consultations, filtres = filtrer_consultations(consultations, request.GET)
+    search_query = filtres['search_query']
+    if search_query:
+        # Les plus pertinentes d'abord
+        consultations = consultations.order_by(F('pertinence').desc(nulls_last=True), 'date_consultation')
+
+    # Pagination par curseur sur (date_consultation, id), sauf tri par pertinence (recherche)
+    # La recherche porte aussi sur les noms des patients : le cache dépend des deux modèles
+    tableau = await afragment(
+        request, 'liste_consultations', [Consultations, Patient], 'consultation/tableau_consultations.html',
+        'consultations', filtres,
+        lambda: apaginer(request, consultations, 10, 'date_consultation', descendant=False,
+                         curseur_possible=not search_query, dependances=[Consultations, Patient]),
+    )
 
     # CORRECTION: Référencer le bon modèle
     type_choices = Consultations.TYPE_CONSULTATION
     statut_choices = Consultations.STATUT_CONSULTATION
 
     context = {
-        'consultations': page_obj,
-        'search_query': search_query,
-        'type_filter': type_filter,
-        'statut_filter': statut_filter,
-        'date_filter': date_filter,
+        'tableau': tableau['html'],
+        **filtres,  # search_query, type_filter, statut_filter, date_filter
         'type_choices': type_choices,
         'statut_choices': statut_choices,
-        'total_consultations': consultations.count(),
-        'patients': Patient.objects.all().order_by('nom', 'prenom'),
+        'total_consultations': tableau['total'],
+        'total_precision': tableau['precision'],
     }
 
-    return render(request, 'consultation/liste_consultation.html', context)
+    return await rendre(request, 'consultation/liste_consultation.html', context)
 
 
 def consultation_form(request, consultation_id=None):
@@ -351,11 +600,12 @@ def consultation_form(request, consultation_id=None):
         'consultation': consultation,  # None pour ajout, objet pour modification
         'type_choices': type_choices,
         'statut_choices': statut_choices,
-        'patients': Patient.objects.all().order_by('nom', 'prenom'),
+        'patient_initial': patient_initial(request),  # les autres patients sont chargés via l'API de suggestion
     }
     
     return render(request, 'consultation/form_consultation.html', context)
 
+@revalidation(etat_consultation)
 def detail_consultation(request, consultation_id):
     """Voir les détails d'une consultation"""
     consultation = get_object_or_404(Consultations, id=consultation_id)  # CORRECTION: Consultations
@@ -388,8 +638,34 @@ from django.db.models import Q
 from django.core.paginator import Paginator
 from .models import Ordonnance, Patient, Consultations
 from .forms import OrdonnanceForm
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .utils.cache_pdf import reponse_pdf
+from .utils.pdf_generator import OrdonnancesLotPDFGenerator
+
+# Colonnes lues par la liste des ordonnances (la description n'est pas affichée)
+CHAMPS_LISTE_ORDONNANCES = (
+    'id', 'numero', 'date_creation',
+    'patient', 'patient__nom', 'patient__prenom',
+    'consultation', 'consultation__type', 'consultation__date_consultation',
+)
+
+
+def rechercher_ordonnances(ordonnances, search_query):
+    """
+    Recherche dans les ordonnances (partagée par la liste et l'export CSV)
+    Annote chaque ordonnance avec sa 'pertinence'.
+    """
+    # Q() permet de faire des recherches complexes avec OU (|)
+    ordonnances, condition = recherche_plein_texte(ordonnances, 'description', search_query)
+    condition |= Q(patient__in=patients_correspondants(search_query))  # Chercher dans le nom du patient OU
+    if search_query.strip().isdigit():
+        condition |= Q(numero=int(search_query))                      # Chercher le numéro
+    return ordonnances.filter(condition)
 
-def liste_ordonnances(request):
+
+async def liste_ordonnances(request):
     """
     Vue pour afficher la liste de toutes les ordonnances
     Avec recherche et pagination
@@ -397,35 +673,45 @@ def liste_ordonnances(request):
     
     # 1. Récupérer toutes les ordonnances de la base de données
     # order_by('-date_creation') = trier par date de création (le plus récent en premier)
-    ordonnances = Ordonnance.objects.select_related('patient', 'consultation').all().order_by('-date_creation')
+    # select_related = patient et consultation chargés dans la même requête (JOIN)
+    ordonnances = (
+        Ordonnance.objects
+        .select_related('patient', 'consultation')
+        .only(*CHAMPS_LISTE_ORDONNANCES)
+        .order_by('-date_creation')
+    )
     
     # 2. RECHERCHE - si l'utilisateur tape quelque chose dans la barre de recherche
     search_query = request.GET.get('search', '')  # Récupérer ce qui est tapé dans ?search=...
     if search_query:  # Si il y a quelque chose à chercher
-        # Q() permet de faire des recherches complexes avec OU (|)
-        # icontains = contient (insensible à la casse)
-        ordonnances = ordonnances.filter(
-            Q(patient__nom__icontains=search_query) |        # Chercher dans le nom du patient OU
-            Q(patient__prenom__icontains=search_query) |     # Chercher dans le prénom du patient OU
-            Q(description__icontains=search_query) |         # Chercher dans la description OU
-            Q(numero__icontains=search_query)                # Chercher dans le numéro
+        # La description passe par l'index plein texte, classée par pertinence
+        ordonnances = rechercher_ordonnances(ordonnances, search_query).order_by(
+            F('pertinence').desc(nulls_last=True), '-date_creation'
         )
     
     # 3. PAGINATION - diviser la liste en pages de 15 ordonnances
-    paginator = Paginator(ordonnances, 15)  # 15 ordonnances par page
-    page_number = request.GET.get('page')  # Quelle page l'utilisateur veut voir
-    page_obj = paginator.get_page(page_number)  # Récupérer les ordonnances de cette page
+    # Par curseur sur (date_creation, id), sauf tri par pertinence (recherche)
+    # Tableau en cache tant qu'aucune ordonnance / consultation / patient affiché ne change
+    dependances = [Ordonnance, Consultations, Patient]
+    tableau = await afragment(
+        request, 'liste_ordonnances', dependances, 'ordonnance/tableau_ordonnances.html',
+        'ordonnances', {'search_query': search_query},
+        lambda: apaginer(request, ordonnances, 15, 'date_creation', curseur_possible=not search_query,
+                         dependances=dependances),
+    )
     
     # 4. Envoyer les données au template
     context = {
-        'ordonnances': page_obj,              # Les ordonnances à afficher
-        'search_query': search_query,         # Pour garder le texte dans la barre de recherche
-        'total_ordonnances': ordonnances.count() # Nombre total d'ordonnances trouvées
+        'tableau': tableau['html'],                     # Lignes + pagination
+        'search_query': search_query,                   # Pour garder le texte dans la barre de recherche
+        'total_ordonnances': tableau['total'],          # Nombre total d'ordonnances trouvées
+        'total_precision': tableau['precision'],        # exact, plafonne (N+) ou estime (≈ N)
     }
     
-    return render(request, 'ordonnance/liste_ordonnance.html', context)
+    return await rendre(request, 'ordonnance/liste_ordonnance.html', context)
 
 
+@revalidation(etat_ordonnance)
 def detail_ordonnance(request, ordonnance_id):
     """
     Vue pour afficher les détails d'UNE ordonnance spécifique
@@ -533,8 +819,8 @@ def ordonnance_form(request, ordonnance_id=None):
     
     context = {
         'ordonnance': ordonnance,  # None pour ajout, objet pour modification
-        'patients': Patient.objects.all().order_by('nom', 'prenom'),
-        'consultations': Consultations.objects.all().order_by('-date_consultation')[:50],  # Limiter aux 50 dernières
+        'patient_initial': patient_initial(request),  # les autres patients sont chargés via l'API de suggestion
+        'consultations': Consultations.objects.select_related('patient').order_by('-date_consultation')[:50],  # Limiter aux 50 dernières
     }
     
     return render(request, 'ordonnance/form_ordonnance.html', context)
@@ -551,6 +837,357 @@ def supprimer_ordonnance(request, ordonnance_id):
     
     return redirect('liste_ordonnances')
 
+
+@login_required
+def generer_ordonnance(request, ordonnance_id):
+    """Télécharger l'ordonnance au format PDF (servie depuis le cache disque, voir utils/cache_pdf.py)"""
+    ordonnance = get_object_or_404(Ordonnance.objects.select_related('patient'), id=ordonnance_id)
+    return reponse_pdf(request, ordonnance)
+
+
+def ordonnances_du_jour(request):
+    """
+    Ordonnances d'une journée (?date=AAAA-MM-JJ, défaut : aujourd'hui) : créées ce jour-là
+    ou liées à une consultation de ce jour-là
+
+    Returns:
+        (jour, queryset)
+    """
+    jour = parse_date(request.GET.get('date', '')) or timezone.localdate()
+    debut = timezone.make_aware(datetime.combine(jour, time.min))
+    fin = timezone.make_aware(datetime.combine(jour + timedelta(days=1), time.min))
+
+    ordonnances = (
+        Ordonnance.objects.select_related('patient')
+        .filter(
+            Q(date_creation__gte=debut, date_creation__lt=fin) |
+            Q(consultation__date_consultation__gte=debut, consultation__date_consultation__lt=fin)
+        )
+        .order_by('date_creation', 'id')
+    )
+    return jour, ordonnances
+
+
+@login_required
+def impression_ordonnances(request):
+    """
+    Imprimer toutes les ordonnances d'une journée en une seule requête
+    ?date=AAAA-MM-JJ (défaut : aujourd'hui) ; ?format=zip → un PDF par ordonnance dans une archive
+    """
+    jour, ordonnances = ordonnances_du_jour(request)
+    if not ordonnances.exists():
+        messages.warning(request, f"Aucune ordonnance le {jour.strftime('%d/%m/%Y')}.")
+        return redirect('liste_ordonnances')
+
+    generateur = OrdonnancesLotPDFGenerator(ordonnances, nom_fichier=f"Ordonnances_{jour.isoformat()}")
+    if request.GET.get('format') == 'zip':
+        return generateur.zip_response()
+    return generateur.pdf_response()
+
+
+#---------------------------RENDU PDF EN ARRIÈRE-PLAN-----------------------------------------------
+# Le rendu tourne dans un pool de processus (utils/rendu_pdf.py) :
+# POST → tâche créée (202), puis polling du statut, puis téléchargement
+
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+from .models import TacheRendu
+from .utils.rendu_pdf import soumettre_rendu, verifier_tache
+
+
+def statut_tache(tache):
+    donnees = {
+        'id': tache.pk,
+        'statut': tache.statut,
+        'nombre_ordonnances': tache.nombre_ordonnances,
+        'url_statut': reverse('statut_rendu', args=[tache.pk]),
+    }
+    if tache.statut == 'termine':
+        donnees['taille'] = tache.taille
+        donnees['url_telechargement'] = reverse('telecharger_rendu', args=[tache.pk])
+    elif tache.statut == 'erreur':
+        donnees['erreur'] = tache.erreur
+    return donnees
+
+
+@login_required
+@require_POST
+def rendu_ordonnances_du_jour(request):
+    """Lancer l'impression des ordonnances d'une journée en arrière-plan (mêmes paramètres que impression_ordonnances)"""
+    jour, ordonnances = ordonnances_du_jour(request)
+    if not ordonnances.exists():
+        return JsonResponse({'erreur': f"Aucune ordonnance le {jour.strftime('%d/%m/%Y')}."}, status=404)
+
+    tache = soumettre_rendu(
+        ordonnances,
+        format_sortie='zip' if request.GET.get('format') == 'zip' else 'pdf',
+        nom_fichier=f"Ordonnances_{jour.isoformat()}",
+        utilisateur=request.user,
+    )
+    return JsonResponse(statut_tache(tache), status=202)
+
+
+@login_required
+def statut_rendu(request, tache_id):
+    tache = get_object_or_404(TacheRendu, pk=tache_id, utilisateur=request.user)
+    return JsonResponse(statut_tache(verifier_tache(tache)))
+
+
+@login_required
+def telecharger_rendu(request, tache_id):
+    tache = get_object_or_404(TacheRendu, pk=tache_id, utilisateur=request.user, statut='termine')
+    try:
+        fichier = open(tache.chemin_fichier, 'rb')
+    except FileNotFoundError:
+        raise Http404("Fichier expiré, veuillez relancer l'impression.")
+    content_type = 'application/zip' if tache.format == 'zip' else 'application/pdf'
+    return FileResponse(fichier, as_attachment=True, filename=f"{tache.nom_fichier}.{tache.format}", content_type=content_type)
+
+#---------------------------EXPORT CSV-----------------------------------------------
+# Exports en flux : .iterator() + values_list(), mémoire constante quel que soit le nombre de lignes
+# ?format=excel → séparateur ';' + BOM UTF-8 (ouverture directe dans Excel)
+
+from .utils.export import TAILLE_LOT_EXPORT, formater_date, reponse_csv
+
+
+def format_excel(request):
+    return request.GET.get('format') == 'excel'
+
+
+@login_required
+def export_patients(request):
+    """Exporter les patients (mêmes filtres que la liste)"""
+    patients, _ = filtrer_patients(Patient.objects.order_by('nom', 'prenom', 'id'), request.GET)
+
+    sexes = dict(Patient.SEXE_CHOICES)
+    lignes = (
+        (pid, nom, prenom or '', formater_date(naissance), sexes.get(sexe, ''), telephone or '', email or '',
+         adresse or '', profession or '', formater_date(creation))
+        for pid, nom, prenom, naissance, sexe, telephone, email, adresse, profession, creation in
+        patients.values_list(
+            'id', 'nom', 'prenom', 'date_naissance', 'sexe', 'telephone', 'email', 'adresse', 'profession', 'date_creation'
+        ).iterator(chunk_size=TAILLE_LOT_EXPORT)
+    )
+    entetes = ['ID', 'Nom', 'Prénom', 'Date de naissance', 'Sexe', 'Téléphone', 'Email', 'Adresse', 'Profession', 'Créé le']
+    return reponse_csv('patients', entetes, lignes, excel=format_excel(request))
+
+
+@login_required
+def export_consultations(request):
+    """Exporter les consultations avec prix, type et statut (mêmes filtres que la liste)"""
+    consultations, _ = filtrer_consultations(Consultations.objects.all(), request.GET)
+    consultations = consultations.order_by('date_consultation', 'id')
+
+    types = dict(Consultations.TYPE_CONSULTATION)
+    statuts = dict(Consultations.STATUT_CONSULTATION)
+    lignes = (
+        (cid, f"C{numero}" if numero is not None else '', formater_date(date), nom, prenom or '',
+         types.get(type_, type_), statuts.get(statut, statut), prix, diagnostic or '')
+        for cid, numero, date, nom, prenom, type_, statut, prix, diagnostic in
+        consultations.values_list(
+            'id', 'numero', 'date_consultation', 'patient__nom', 'patient__prenom', 'type', 'statut', 'prix', 'diagnostic'
+        ).iterator(chunk_size=TAILLE_LOT_EXPORT)
+    )
+    entetes = ['ID', 'Code', 'Date', 'Nom', 'Prénom', 'Type', 'Statut', 'Prix (DH)', 'Diagnostic']
+    return reponse_csv('consultations', entetes, lignes, excel=format_excel(request))
+
+
+@login_required
+def export_ordonnances(request):
+    """Exporter les ordonnances (même recherche que la liste)"""
+    ordonnances = Ordonnance.objects.all()
+    search_query = request.GET.get('search', '')
+    if search_query:
+        ordonnances = rechercher_ordonnances(ordonnances, search_query)
+    ordonnances = ordonnances.order_by('date_creation', 'id')
+
+    lignes = (
+        (oid, numero, formater_date(creation), nom, prenom or '', consultation_id or '', description)
+        for oid, numero, creation, nom, prenom, consultation_id, description in
+        ordonnances.values_list(
+            'id', 'numero', 'date_creation', 'patient__nom', 'patient__prenom', 'consultation_id', 'description'
+        ).iterator(chunk_size=TAILLE_LOT_EXPORT)
+    )
+    entetes = ['ID', 'N° ordonnance', 'Date', 'Nom', 'Prénom', 'Consultation', 'Prescription']
+    return reponse_csv('ordonnances', entetes, lignes, excel=format_excel(request))
+
+#---------------------------TABLEAU DE BORD-----------------------------------------------
+# Lu dans les agrégats quotidiens (StatistiqueJour), jamais dans la table des consultations
+
+from .utils.statistiques import statistiques_periode
+
+MOIS = ['janvier', 'février', 'mars', 'avril', 'mai', 'juin', 'juillet', 'août',
+        'septembre', 'octobre', 'novembre', 'décembre']
+
+
+@login_required
+def tableau_de_bord(request):
+    """Activité et chiffre d'affaires du mois (?annee=2025&mois=3) ou de l'année (?annee=2025&mois=)"""
+    aujourd_hui = timezone.localdate()
+    try:
+        annee = int(request.GET.get('annee', aujourd_hui.year))
+        mois = request.GET.get('mois', str(aujourd_hui.month))
+        mois = int(mois) if mois else None
+        if not 1900 <= annee <= 9998 or (mois is not None and not 1 <= mois <= 12):
+            raise ValueError
+    except ValueError:
+        annee, mois = aujourd_hui.year, aujourd_hui.month
+
+    statistiques = statistiques_periode(annee, mois)
+    maximum = max((point['nombre'] for point in statistiques['serie']), default=0)
+    for point in statistiques['serie']:
+        point['pourcentage'] = round(100 * point['nombre'] / maximum) if maximum else 0
+
+    if mois is None:
+        precedent, suivant = {'annee': annee - 1, 'mois': ''}, {'annee': annee + 1, 'mois': ''}
+    else:
+        precedent = {'annee': annee - (mois == 1), 'mois': (mois - 2) % 12 + 1}
+        suivant = {'annee': annee + (mois == 12), 'mois': mois % 12 + 1}
+
+    context = {
+        'annee': annee,
+        'mois': mois,
+        'libelle_periode': f"{MOIS[mois - 1]} {annee}" if mois else str(annee),
+        'statistiques': statistiques,
+        'precedent': precedent,
+        'suivant': suivant,
+    }
+    return render(request, 'statistiques/tableau_de_bord.html', context)
+
+#---------------------------AGENDA-----------------------------------------------
+# Consultations d'un jour ou d'une semaine (utils/agenda.py) ; l'API est interrogée
+# régulièrement par l'accueil : 304 tant que rien n'a changé, sans requête SQL
+
+from datetime import timedelta
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from .utils.agenda import VUES_AGENDA, acreneaux, minuit
+
+JOURS = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche']
+
+
+def periode_agenda(params):
+    """(jour, vue, début, fin) depuis ?date=AAAA-MM-JJ&vue=jour|semaine (aujourd'hui par défaut)"""
+    try:
+        jour = parse_date(params.get('date', '')) or timezone.localdate()
+    except ValueError:  # format valide mais date impossible (ex. 2025-02-30)
+        jour = timezone.localdate()
+    vue = params.get('vue', 'jour')
+    if vue not in VUES_AGENDA:
+        vue = 'jour'
+    debut, fin = (bornes_semaine if vue == 'semaine' else bornes_jour)(jour)
+    return jour, vue, debut, fin
+
+
+@login_required
+async def agenda(request):
+    """Agenda du jour ou de la semaine : créneaux dans l'ordre, par jour"""
+    jour, vue, debut, fin = periode_agenda(request.GET)
+    statuts = request.GET.getlist('statut')
+    entree = await acreneaux(debut, fin, statuts)
+
+    jours = [debut.date() + timedelta(days=i) for i in range((fin.date() - debut.date()).days)]
+    par_jour = {j: [] for j in jours}
+    for creneau in entree['donnees']['creneaux']:
+        par_jour[parse_date(creneau['jour'])].append(creneau)
+    ecart = timedelta(days=7 if vue == 'semaine' else 1)
+
+    context = {
+        'vue': vue,
+        'jour': jour,
+        'jours': [
+            {'date': j, 'libelle': f"{JOURS[j.weekday()]} {j.day} {MOIS[j.month - 1]}", 'creneaux': creneaux}
+            for j, creneaux in par_jour.items()
+        ],
+        'precedent': (jour - ecart).isoformat(),
+        'suivant': (jour + ecart).isoformat(),
+        'statuts': entree['donnees']['statuts'],
+        'statut_choices': Consultations.STATUT_CONSULTATION,
+        'par_statut': [
+            (libelle, entree['donnees']['par_statut'].get(code, 0))
+            for code, libelle in Consultations.STATUT_CONSULTATION
+        ],
+        'total': len(entree['donnees']['creneaux']),
+        'version': entree['etag'],
+    }
+    return await rendre(request, 'consultation/agenda.html', context)
+
+
+@login_required
+async def api_agenda(request):
+    """
+    API de l'agenda : /api/agenda?date=AAAA-MM-JJ&vue=jour|semaine&statut=planifie
+    - Créneaux dans l'ordre chronologique, et nombre par statut
+    - ETag : empreinte du contenu, lue dans le cache avec lui ; If-None-Match → 304
+    """
+    _, _, debut, fin = periode_agenda(request.GET)
+    entree = await acreneaux(debut, fin, request.GET.getlist('statut'))
+    etag = f'"{entree["etag"]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(entree['corps'], content_type='application/json')
+    response['ETag'] = etag
+    # Données patient : pas de cache partagé ; le navigateur revalide à chaque appel
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+#---------------------------RÉSERVATION-----------------------------------------------
+# Créneaux libres pour la prise de rendez-vous (utils/reservation.py)
+
+from .utils.reservation import aprochains_creneaux, duree_type
+
+CRENEAUX_MAX = 50
+
+
+@login_required
+async def api_creneaux_libres(request):
+    """
+    API des prochains créneaux libres : /api/creneaux_libres?type=seance_psycho&date=AAAA-MM-JJ&limite=10
+    - Durée selon le type ; disponibilités de la semaine qui suit la date (ou maintenant),
+      calculées en un passage à partir d'une seule requête
+    """
+    type_ = request.GET.get('type', '')
+    if type_ not in dict(Consultations.TYPE_CONSULTATION):
+        return JsonResponse({'erreur': "Type de consultation inconnu."}, status=400)
+    try:
+        limite = min(max(int(request.GET.get('limite', 10)), 1), CRENEAUX_MAX)
+    except ValueError:
+        limite = 10
+    try:
+        jour = parse_date(request.GET.get('date', ''))
+    except ValueError:
+        jour = None
+    debut = max(minuit(jour), timezone.now()) if jour else timezone.now()
+
+    creneaux = await aprochains_creneaux(debut, type_, limite)
+    return JsonResponse({
+        'type': type_,
+        'duree_minutes': int(duree_type(type_).total_seconds() // 60),
+        'creneaux': [
+            {
+                'debut': timezone.localtime(debut_creneau).isoformat(),
+                'fin': timezone.localtime(fin_creneau).isoformat(),
+                'jour': timezone.localtime(debut_creneau).date().isoformat(),
+                'heure': f"{timezone.localtime(debut_creneau):%H:%M}",
+            }
+            for debut_creneau, fin_creneau in creneaux
+        ],
+    })
+
+#---------------------------MÉTRIQUES-----------------------------------------------
+# Histogrammes de MesuresMiddleware (website/middleware.py), format texte Prometheus
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
+from .utils.metriques import registre
+
+
+@staff_member_required
+def metriques(request):
+    return HttpResponse(registre.exporter(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 #------imprimer ordonnace -----
 # views.py
 